@@ -11,20 +11,38 @@
 # ANY KIND, either express or implied. See the License for the specific
 # language governing permissions and limitations under the License.
 import argparse
+import hashlib
+import json
 import os
 import shlex
+import shutil
 import subprocess
 import tempfile
 
+from boto3.s3.transfer import TransferConfig, create_transfer_manager
+import botocore
 import numpy as np
-import tensorflow as tf
 
-import sagemaker
-from sagemaker.estimator import Estimator
+from trainer.dataset import DEFAULT_SHARD_ROWS, FORMAT_VERSION, write_records, write_shards
 
 NUM_CLASSES = 10
 
-sagemaker_session = sagemaker.Session()
+KEY_PREFIX = 'data/DEMO-keras-cifar10'
+# Written after a channel's last file, outside the channel prefix so it never ends up in the channel
+UPLOADED_MARKER_PREFIX = KEY_PREFIX + '/_uploaded'
+DEFAULT_PART_SIZE_MB = 64
+DEFAULT_MAX_CONCURRENCY = 10
+
+_sagemaker_session = None
+
+
+def get_sagemaker_session():
+    # Created on first use, so uploading with an explicit client and bucket never touches AWS defaults
+    global _sagemaker_session
+    if _sagemaker_session is None:
+        import sagemaker
+        _sagemaker_session = sagemaker.Session()
+    return _sagemaker_session
 
 
 def build_image(name, version):
@@ -51,32 +69,143 @@ def get_image_name(ecr_repository, tensorflow_version_tag):
     return '%s:tensorflow-%s' % (ecr_repository, tensorflow_version_tag)
 
 
-def upload_channel(channel_name, x, y):
-    y = tf.keras.utils.to_categorical(y, NUM_CLASSES)
+def content_hash(arrays, input_mode):
+    """sha256 of the arrays and of the layout they're written in, which identifies a channel's upload.
+
+    Args:
+        arrays: dict of name -> np.ndarray, as given to write_shards / write_records.
+        input_mode: 'File' or 'Pipe', which decides the layout.
+
+    Returns:
+        (str) hex digest.
+    """
+    digest = hashlib.sha256()
+    digest.update(('%s %d %d' % (input_mode, FORMAT_VERSION, DEFAULT_SHARD_ROWS)).encode())
+    for name, array in sorted(arrays.items()):
+        array = np.ascontiguousarray(array)
+        digest.update(('%s %s %s' % (name, array.dtype.str, array.shape)).encode())
+        digest.update(array.data)
+    return digest.hexdigest()
+
+
+def one_hot(labels, num_classes=NUM_CLASSES):
+    """float32 one-hot rows for integer class labels of shape (n,) or (n, 1), like keras' to_categorical."""
+    return np.eye(num_classes, dtype=np.float32)[np.ravel(labels)]
+
+
+def s3_object_exists(s3, bucket, key):
+    try:
+        s3.head_object(Bucket=bucket, Key=key)
+        return True
+    except botocore.exceptions.ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return False
+        raise
+
+
+def upload_directory(s3, directory, bucket, key_prefix, transfer_config):
+    """Uploads every file under a directory. Files go up concurrently, and files larger than the
+    part size in parallel multipart chunks, sharing transfer_config's max_concurrency.
+
+    Returns:
+        (list) the uploaded keys.
+    """
+    uploads = []
+    for root, _, files in os.walk(directory):
+        for file_name in files:
+            path = os.path.join(root, file_name)
+            uploads.append((path, '%s/%s' % (key_prefix, os.path.relpath(path, directory).replace(os.sep, '/'))))
+
+    with create_transfer_manager(s3, transfer_config) as manager:
+        futures = [manager.upload(path, bucket, key) for path, key in uploads]
+        for future in futures:
+            future.result()
+    return [key for _, key in uploads]
+
+
+def upload_channel(channel_name, x, y, input_mode='File', s3=None, bucket=None, transfer_config=None, force=False):
+    """Writes a channel and uploads it to s3://<bucket>/<KEY_PREFIX>/<mode>/<channel>/<content hash>/,
+    unless an earlier run already uploaded the same content there.
+
+    Returns:
+        (str) the S3 URI of the channel.
+    """
+    s3 = s3 or get_sagemaker_session().boto_session.client('s3')
+    bucket = bucket or get_sagemaker_session().default_bucket()
+    transfer_config = transfer_config or make_transfer_config()
+    y = one_hot(y)
+    arrays = {'x': x, 'y': y}
+
+    digest = content_hash(arrays, input_mode)
+    key_prefix = '%s/%s/%s/%s' % (KEY_PREFIX, input_mode.lower(), channel_name, digest[:16])
+    marker_key = '%s/%s/%s/%s' % (UPLOADED_MARKER_PREFIX, input_mode.lower(), channel_name, digest)
+    s3_uri = 's3://%s/%s/' % (bucket, key_prefix)
+    if not force and s3_object_exists(s3, bucket, marker_key):
+        print('%s channel is unchanged, already uploaded to %s' % (channel_name, s3_uri))
+        return s3_uri
 
     file_path = tempfile.mkdtemp()
-    np.savez_compressed(os.path.join(file_path, 'cifar-10-npz-compressed.npz'), x=x, y=y)
+    try:
+        if input_mode == 'Pipe':
+            # Headerless fixed-size records, streamed by trainer.pipe.PipeModeReader
+            write_records(file_path, arrays)
+        else:
+            # Uncompressed .npy shards + manifest, which the trainer memory-maps instead of decompressing
+            write_shards(file_path, arrays)
+        keys = upload_directory(s3, file_path, bucket, key_prefix, transfer_config)
+    finally:
+        shutil.rmtree(file_path)
+    s3.put_object(Bucket=bucket, Key=marker_key, Body=json.dumps({'sha256': digest, 'keys': keys}).encode())
+    print('Uploaded %d files of the %s channel to %s' % (len(keys), channel_name, s3_uri))
+    return s3_uri
+
+
+def make_transfer_config(part_size_mb=DEFAULT_PART_SIZE_MB, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+    part_size = part_size_mb * 1024 * 1024
+    return TransferConfig(multipart_threshold=part_size, multipart_chunksize=part_size,
+                          max_concurrency=max_concurrency)
+
+
+def upload_training_data(input_mode='File', s3=None, bucket=None, transfer_config=None, force=False):
+    import tensorflow as tf
 
-    return sagemaker_session.upload_data(path=file_path, key_prefix='data/DEMO-keras-cifar10/%s' % channel_name)
-
-
-def upload_training_data():
     # The data, split between train and test sets:
     (x_train, y_train), (x_test, y_test) = tf.keras.datasets.cifar10.load_data()
 
-    train_data_location = upload_channel('train', x_train, y_train)
-    test_data_location = upload_channel('test', x_test, y_test)
+    train_data_location = upload_channel('train', x_train, y_train, input_mode, s3, bucket, transfer_config, force)
+    test_data_location = upload_channel('test', x_test, y_test, input_mode, s3, bucket, transfer_config, force)
 
-    return {'train': train_data_location, 'test': test_data_location}
+    channels = {'train': train_data_location, 'test': test_data_location}
+    records = {'train': len(x_train), 'test': len(x_test)}
+    return channels, records
 
 
-if __name__ == '__main__':
+def parse_args(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument('--ecr-repository', help='ECR repo where images will be pushed',
                         default='add-ecr-repo-here', required=True)
     parser.add_argument('--tf-version', default='latest')
     parser.add_argument('--instance-type', default='local', choices=['local', 'ml.c5.xlarge', 'ml.p2.xlarge'])
-    args = parser.parse_args()
+    parser.add_argument('--input-mode', default='File', choices=['File', 'Pipe'])
+    parser.add_argument('--bucket', help='S3 bucket for the training data (default: the SageMaker default bucket)')
+    parser.add_argument('--s3-endpoint-url', help='S3 endpoint, e.g. a local S3 stand-in for testing uploads. '
+                                                  'Needs --bucket.')
+    parser.add_argument('--part-size-mb', type=int, default=DEFAULT_PART_SIZE_MB,
+                        help='multipart upload part size, and the size above which files are split')
+    parser.add_argument('--max-concurrency', type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help='concurrent upload requests')
+    parser.add_argument('--force-upload', action='store_true', help='upload the channels even if unchanged')
+    args = parser.parse_args(argv)
+    if args.s3_endpoint_url and not args.bucket:
+        # The default bucket is looked up (and created) in real AWS, not at the endpoint
+        parser.error('--s3-endpoint-url needs --bucket')
+    return args
+
+
+if __name__ == '__main__':
+    from sagemaker.estimator import Estimator
+
+    args = parse_args()
 
     tensorflow_version_tag = get_tensorflow_version_tag(args.tf_version, args.instance_type)
 
@@ -91,8 +220,15 @@ if __name__ == '__main__':
                            width_shift_range=.1, height_shift_range=.1)
 
     estimator = Estimator(image_name, role='SageMakerRole', train_instance_count=1,
-                          train_instance_type=args.instance_type, hyperparameters=hyperparameters)
-
-    channels = upload_training_data()
+                          train_instance_type=args.instance_type, hyperparameters=hyperparameters,
+                          input_mode=args.input_mode)
+
+    s3 = get_sagemaker_session().boto_session.client('s3', endpoint_url=args.s3_endpoint_url)
+    channels, records = upload_training_data(args.input_mode, s3=s3, bucket=args.bucket,
+                                             transfer_config=make_transfer_config(args.part_size_mb,
+                                                                                  args.max_concurrency),
+                                             force=args.force_upload)
+    # In Pipe mode the trainer can't see how big the train channel is before it streams it
+    estimator.set_hyperparameters(train_records=records['train'])
 
     estimator.fit(channels)
@@ -0,0 +1,80 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from trainer.pipe import PipeModeReader
+
+RECORD_DTYPE = np.dtype([('x', np.uint8, (4, 4, 3)), ('y', np.float32, (10,))])
+
+
+def make_records(n, seed):
+    records = np.zeros(n, dtype=RECORD_DTYPE)
+    records['x'] = np.random.RandomState(seed).randint(0, 256, size=records['x'].shape)
+    records['y'][np.arange(n), np.arange(n) % 10] = 1
+    return records
+
+
+def stream(path, records):
+    """Writes records into a FIFO from another thread, the way SageMaker fills a Pipe mode channel"""
+    def write():
+        try:
+            with open(path, 'wb') as fifo:
+                fifo.write(records.tobytes())
+        except (BrokenPipeError, IOError):
+            pass  # the reader stopped early
+    writer = threading.Thread(target=write)
+    writer.daemon = True
+    writer.start()
+    return writer
+
+
+@pytest.fixture
+def input_data_dir(tmp_path):
+    if not hasattr(os, 'mkfifo'):
+        pytest.skip('needs os.mkfifo')
+    for epoch in range(2):
+        os.mkfifo(str(tmp_path / ('train_%d' % epoch)))
+    return str(tmp_path)
+
+
+def test_reads_every_record_of_two_epochs(input_data_dir):
+    epochs = [make_records(37, seed=0), make_records(37, seed=1)]
+    writers = [stream(os.path.join(input_data_dir, 'train_%d' % epoch), records)
+               for epoch, records in enumerate(epochs)]
+    with PipeModeReader('train', RECORD_DTYPE, 8, prefetch_batches=2, input_data_dir=input_data_dir) as reader:
+        generator = reader.keras_generator(scale=0.5)
+        for records in epochs:
+            batches = [next(generator) for _ in range(5)]
+            assert [len(x) for x, y in batches] == [8, 8, 8, 8, 5]
+            np.testing.assert_array_equal(np.concatenate([x for x, y in batches]), records['x'] * np.float32(0.5))
+            np.testing.assert_array_equal(np.concatenate([y for x, y in batches]), records['y'])
+    for writer in writers:
+        writer.join(5)
+        assert not writer.is_alive()
+
+
+def test_close_joins_reader_stopped_mid_epoch(input_data_dir):
+    stream(os.path.join(input_data_dir, 'train_0'), make_records(1000, seed=0))
+    reader = PipeModeReader('train', RECORD_DTYPE, 8, prefetch_batches=2, input_data_dir=input_data_dir)
+    generator = reader.keras_generator()
+    next(generator)
+    threads = [thread for thread, _, _ in reader._readers]
+    assert len(threads) == 1 and threads[0].is_alive()
+
+    reader.close()
+    assert not threads[0].is_alive()
+    assert reader._readers == []
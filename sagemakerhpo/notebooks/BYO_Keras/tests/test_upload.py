@@ -0,0 +1,104 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+import boto3
+from botocore.stub import Stubber
+import numpy as np
+import pytest
+
+import main
+
+BUCKET = 'test-bucket'
+
+
+@pytest.fixture
+def s3():
+    """A real S3 client whose requests are answered by a Stubber, recording (operation, key) of every call"""
+    client = boto3.client('s3', region_name='us-east-1', aws_access_key_id='testing',
+                          aws_secret_access_key='testing')
+    client.calls = []
+    client.meta.events.register('before-parameter-build.s3',
+                                lambda params, model, **kwargs: client.calls.append((model.name, params.get('Key'))))
+    with Stubber(client) as stubber:
+        client.stubber = stubber
+        yield client
+
+
+def expect_upload(s3, n_files):
+    for _ in range(n_files):
+        s3.stubber.add_response('put_object', {})
+    s3.stubber.add_response('put_object', {})  # the marker
+
+
+def upload(s3, x, y, force=False):
+    return main.upload_channel('train', x, y, 'File', s3=s3, bucket=BUCKET,
+                               transfer_config=main.make_transfer_config(max_concurrency=1), force=force)
+
+
+def uploads(s3):
+    return [key for operation, key in s3.calls if operation == 'PutObject']
+
+
+def make_data(seed):
+    random = np.random.RandomState(seed)
+    return random.randint(0, 256, size=(20, 4, 4, 3)).astype(np.uint8), random.randint(0, 10, size=(20, 1))
+
+
+def test_second_run_skips_unchanged_channel(s3):
+    x, y = make_data(0)
+    s3.stubber.add_client_error('head_object', service_error_code='404', http_status_code=404)
+    expect_upload(s3, 3)  # x and y shards, manifest
+    uri = upload(s3, x, y)
+    s3.stubber.assert_no_pending_responses()
+    marker_key = uploads(s3)[-1]
+    assert marker_key.startswith(main.UPLOADED_MARKER_PREFIX + '/file/train/')
+    assert uri.startswith('s3://%s/%s/file/train/' % (BUCKET, main.KEY_PREFIX))
+    assert all(key.startswith(uri[len('s3://%s/' % BUCKET):]) for key in uploads(s3)[:-1])
+
+    del s3.calls[:]
+    s3.stubber.add_response('head_object', {}, {'Bucket': BUCKET, 'Key': marker_key})
+    assert upload(s3, x, y) == uri
+    s3.stubber.assert_no_pending_responses()
+    assert uploads(s3) == []
+
+
+def test_changed_channel_is_uploaded_again(s3):
+    s3.stubber.add_client_error('head_object', service_error_code='404', http_status_code=404)
+    expect_upload(s3, 3)
+    first_uri = upload(s3, *make_data(0))
+    first_marker = uploads(s3)[-1]
+
+    del s3.calls[:]
+    s3.stubber.add_client_error('head_object', service_error_code='404', http_status_code=404)
+    expect_upload(s3, 3)
+    second_uri = upload(s3, *make_data(1))
+    s3.stubber.assert_no_pending_responses()
+    assert second_uri != first_uri
+    assert len(uploads(s3)) == 4 and uploads(s3)[-1] != first_marker
+
+
+def test_force_upload_ignores_marker(s3):
+    x, y = make_data(0)
+    expect_upload(s3, 3)
+    upload(s3, x, y, force=True)
+    s3.stubber.assert_no_pending_responses()
+    assert [operation for operation, _ in s3.calls].count('HeadObject') == 0
+    assert len(uploads(s3)) == 4
+
+
+def test_s3_endpoint_needs_bucket(capsys):
+    with pytest.raises(SystemExit):
+        main.parse_args(['--ecr-repository', 'repo', '--s3-endpoint-url', 'http://localhost:9000'])
+    assert '--bucket' in capsys.readouterr().err
+    args = main.parse_args(['--ecr-repository', 'repo', '--s3-endpoint-url', 'http://localhost:9000',
+                            '--bucket', BUCKET])
+    assert args.bucket == BUCKET
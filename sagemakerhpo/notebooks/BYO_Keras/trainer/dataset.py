@@ -0,0 +1,211 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import json
+import logging
+import math
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+FORMAT_NAME = "npy-shards"
+FORMAT_VERSION = 1
+DEFAULT_SHARD_ROWS = 10000
+
+
+def write_shards(directory, arrays, shard_rows=DEFAULT_SHARD_ROWS):
+    """Writes each array as uncompressed .npy shards of `shard_rows` rows, plus a manifest.
+
+    Args:
+        directory: where to write the shards and `manifest.json`.
+        arrays: dict of name -> np.ndarray. All arrays must have the same number of rows.
+        shard_rows: number of rows per shard file.
+
+    Returns:
+        (dict) the manifest.
+    """
+    rows = set(len(array) for array in arrays.values())
+    if len(rows) != 1:
+        raise ValueError("All arrays in a channel need the same number of rows, got %s" % sorted(rows))
+    n_rows = rows.pop()
+
+    manifest = {"format": FORMAT_NAME, "version": FORMAT_VERSION, "rows": n_rows, "arrays": {}}
+    for name, array in sorted(arrays.items()):
+        shards = []
+        for shard_num, start in enumerate(range(0, n_rows, shard_rows)):
+            file_name = "%s-%05d.npy" % (name, shard_num)
+            chunk = np.ascontiguousarray(array[start:start + shard_rows])
+            np.save(os.path.join(directory, file_name), chunk)
+            shards.append({"file": file_name, "rows": len(chunk)})
+        manifest["arrays"][name] = {
+            "dtype": array.dtype.str,
+            "shape": list(array.shape[1:]),
+            "shards": shards,
+        }
+    with open(os.path.join(directory, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+class ShardedArray(object):
+    """Read-only array made of row shards. Rows are gathered on demand, so memory-mapped
+    shards are only paged in for the rows a batch actually touches.
+    """
+    def __init__(self, shards):
+        if not shards:
+            raise ValueError("ShardedArray needs at least one shard")
+        self.shards = shards
+        self.offsets = np.cumsum([0] + [len(s) for s in shards])
+        self.dtype = shards[0].dtype
+        self.shape = (int(self.offsets[-1]),) + tuple(shards[0].shape[1:])
+
+    def __len__(self):
+        return self.shape[0]
+
+    def take(self, indices, dtype=None):
+        """Gathers rows into a new array, converting to `dtype` while copying.
+
+        Args:
+            indices: row numbers. Sorted indices read the shards sequentially.
+            dtype: dtype of the returned array, defaults to the stored dtype.
+        """
+        indices = np.asarray(indices)
+        out = np.empty((len(indices),) + self.shape[1:], dtype=dtype or self.dtype)
+        shard_ids = np.searchsorted(self.offsets, indices, side="right") - 1
+        for shard_id in np.unique(shard_ids):
+            in_shard = shard_ids == shard_id
+            out[in_shard] = self.shards[shard_id][indices[in_shard] - self.offsets[shard_id]]
+        return out
+
+
+def open_channel(channel_dir, mmap_mode="r"):
+    """Opens the arrays in a channel directory.
+
+    Reads the `.npy` shards listed in `manifest.json` with memory mapping. Channels
+    written in the older single `.npz` archive format are loaded into memory instead.
+
+    Returns:
+        (dict) name -> `ShardedArray`
+    """
+    manifest_path = os.path.join(channel_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return _open_npz_channel(channel_dir)
+
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_NAME:
+        raise ValueError("Unknown channel format %s in %s" % (manifest.get("format"), manifest_path))
+
+    arrays = {}
+    for name, spec in manifest["arrays"].items():
+        shards = [np.load(os.path.join(channel_dir, shard["file"]), mmap_mode=mmap_mode) for shard in spec["shards"]]
+        arrays[name] = ShardedArray(shards)
+    return arrays
+
+
+def _open_npz_channel(channel_dir):
+    archives = sorted(f for f in os.listdir(channel_dir) if f.endswith(".npz"))
+    if not archives:
+        raise IOError("No %s or .npz archive found in %s" % (MANIFEST_FILE, channel_dir))
+    logger.warning("Loading compressed archive %s fully into memory", archives[0])
+    data = np.load(os.path.join(channel_dir, archives[0]))
+    return {name: ShardedArray([data[name]]) for name in data.files}
+
+
+class ShardedBatches(object):
+    """Batches of (x, y) drawn from a channel opened with `open_channel`.
+
+    Each batch is gathered from the shards straight into a float32 buffer which is scaled
+    in place, so only one batch at a time is ever converted from the stored dtype.
+    Implements the `keras.utils.Sequence` protocol; mix it in with that class to use it
+    with `fit_generator`.
+    """
+    def __init__(self, channel, batch_size, x_name="x", y_name="y", scale=None, shuffle=True,
+                 transform=None, seed=None):
+        """
+        Args:
+            channel: dict of name -> `ShardedArray`, from `open_channel`.
+            batch_size: rows per batch. The last batch may be smaller.
+            scale: multiplier applied to x, e.g. 1 / 255. for images.
+            shuffle: reshuffle rows at the end of every epoch.
+            transform: function applied to each x row after scaling, e.g. data augmentation.
+        """
+        self.x = channel[x_name]
+        self.y = channel[y_name]
+        self.batch_size = batch_size
+        self.scale = scale
+        self.shuffle = shuffle
+        self.transform = transform
+        self._random = np.random.RandomState(seed)
+        self._order = np.arange(len(self.x))
+        if shuffle:
+            self._random.shuffle(self._order)
+
+    def __len__(self):
+        return int(math.ceil(len(self.x) / float(self.batch_size)))
+
+    def batch_indices(self, idx):
+        # Sorting within a batch keeps reads sequential inside each shard
+        return np.sort(self._order[idx * self.batch_size:(idx + 1) * self.batch_size])
+
+    def __getitem__(self, idx):
+        return self.load(self.batch_indices(idx))
+
+    def load(self, indices):
+        """Reads, scales and transforms the rows `indices` into an (x, y) batch.
+        """
+        batch_x = self.x.take(indices, dtype=np.float32)
+        if self.scale is not None:
+            np.multiply(batch_x, self.scale, out=batch_x)
+        if self.transform is not None:
+            for i in range(len(batch_x)):
+                batch_x[i] = self.transform(batch_x[i])
+        return batch_x, self.y.take(indices)
+
+    def batch_spec(self):
+        """(shape, dtype) of x and y in a full batch, known without reading or transforming any rows.
+        """
+        return [((self.batch_size,) + self.x.shape[1:], np.dtype(np.float32)),
+                ((self.batch_size,) + self.y.shape[1:], self.y.dtype)]
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            self._random.shuffle(self._order)
+
+
+def record_dtype(arrays):
+    """The structured dtype of one record holding a row of each array, fields in name order.
+    """
+    return np.dtype([(name, array.dtype, array.shape[1:]) for name, array in sorted(arrays.items())])
+
+
+def write_records(directory, arrays, shard_rows=DEFAULT_SHARD_ROWS):
+    """Writes the arrays interleaved row by row as headerless fixed-size records, the layout
+    `trainer.pipe.PipeModeReader` streams in Pipe mode. No manifest is written, since
+    everything under the channel's S3 prefix is streamed into the pipe.
+
+    Returns:
+        (np.dtype) the record dtype to give the reader.
+    """
+    dtype = record_dtype(arrays)
+    n_rows = len(next(iter(arrays.values())))
+    for shard_num, start in enumerate(range(0, n_rows, shard_rows)):
+        records = np.empty(min(shard_rows, n_rows - start), dtype=dtype)
+        for name, array in arrays.items():
+            records[name] = array[start:start + shard_rows]
+        records.tofile(os.path.join(directory, "records-%05d.bin" % shard_num))
+    return dtype
@@ -22,16 +22,22 @@ import subprocess
 
 import collections
 
+try:
+    from collections.abc import Mapping
+except ImportError:  # python 2
+    from collections import Mapping
+
 logging.basicConfig()
 logger = logging.getLogger(__name__)
 
-BASE_PATH = "/opt/ml"
-MODEL_PATH = "/opt/ml/model"
-INPUT_PATH = "/opt/ml/input"
-INPUT_DATA_PATH = "/opt/ml/input/data"
-OUTPUT_PATH = "/opt/ml/output"
-INPUT_CONFIG_PATH = "/opt/ml/input/config"
-OUTPUT_DATA_PATH = "/opt/ml/output/data"
+# SAGEMAKER_BASE_PATH moves the whole layout, e.g. for running trials locally with smhpolib.local
+BASE_PATH = os.environ.get("SAGEMAKER_BASE_PATH", "/opt/ml")
+MODEL_PATH = os.path.join(BASE_PATH, "model")
+INPUT_PATH = os.path.join(BASE_PATH, "input")
+INPUT_DATA_PATH = os.path.join(BASE_PATH, "input", "data")
+OUTPUT_PATH = os.path.join(BASE_PATH, "output")
+INPUT_CONFIG_PATH = os.path.join(BASE_PATH, "input", "config")
+OUTPUT_DATA_PATH = os.path.join(BASE_PATH, "output", "data")
 
 HYPERPARAMETERS_FILE = "hyperparameters.json"
 RESOURCE_CONFIG_FILE = "resourceconfig.json"
@@ -64,6 +70,22 @@ def get_channel_dir(channel):
     return os.path.join(INPUT_DATA_PATH, channel)
 
 
+def get_channel_fifo(channel, epoch, input_data_dir=INPUT_DATA_PATH):
+    """ Returns the named pipe SageMaker creates for a channel in Pipe mode, which is:
+    - <input_data_dir>/<channel>_<epoch>
+    A new pipe is created for each pass (epoch) over the channel data, starting at 0.
+    Returns:
+        (str) The path of the FIFO for the specified channel and epoch.
+    """
+    return os.path.join(input_data_dir, '%s_%d' % (channel, epoch))
+
+
+def get_input_mode(input_data_config, channel):
+    """ Returns 'File' or 'Pipe', the TrainingInputMode of a channel in inputdataconfig.json
+    """
+    return input_data_config[channel].get('TrainingInputMode', 'File')
+
+
 def get_available_gpus():
     """The number of gpus available in the current container.
 
@@ -113,7 +135,7 @@ def create_trainer_environment():
     return env
 
 
-class HyperParameters(collections.Mapping):
+class HyperParameters(Mapping):
     """dict of the hyperparameters provided in the training job. Allows casting of the hyperparameters
     in the `get` method.
 
@@ -298,3 +320,14 @@ class TrainerEnvironment(
         return super(TrainerEnvironment, cls).__new__(cls,
             input_dir, input_config_dir, model_dir, output_dir, hyperparameters, resource_config, input_data_config,
             output_data_dir, hosts, channel_dirs, current_host, available_gpus, available_cpus)
+
+    def input_mode(self, channel):
+        """Returns 'File' if the channel was downloaded to `channel_dirs[channel]`, or 'Pipe'
+        if it's streamed through the FIFOs returned by `channel_fifo`.
+        """
+        return get_input_mode(self.input_data_config, channel)
+
+    def channel_fifo(self, channel, epoch):
+        """Returns the path of the Pipe mode FIFO for a channel and epoch, e.g. /opt/ml/input/data/train_0
+        """
+        return get_channel_fifo(channel, epoch, input_data_dir=os.path.join(self.input_dir, 'data'))
@@ -0,0 +1,183 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import io
+import logging
+import threading
+
+try:
+    import queue
+except ImportError:  # python 2
+    import Queue as queue
+
+import numpy as np
+
+from trainer.environment import get_channel_fifo, INPUT_DATA_PATH
+
+logger = logging.getLogger(__name__)
+
+_END_OF_EPOCH = object()
+
+
+class PipeModeReader(object):
+    """Streams fixed-size binary records from a SageMaker Pipe mode channel as NumPy batches.
+
+    Every object under the channel's S3 prefix is streamed, back to back, through the FIFO
+    `<input_data_dir>/<channel>_<epoch>`. The objects must contain only whole records of
+    `record_dtype`, e.g. the files written by `trainer.dataset.write_records`.
+
+    A background thread reads batches ahead of the consumer into a queue holding at most
+    `prefetch_batches` batches, so reading overlaps with training but memory stays bounded.
+    Call `close()`, or use the reader as a context manager, to stop and join the threads of
+    epochs the consumer didn't read to the end, e.g. the one `keras_generator` had started
+    when training finished.
+    """
+    JOIN_TIMEOUT_SECS = 10
+    _PUT_POLL_SECS = 0.1
+
+    def __init__(self, channel, record_dtype, batch_size, prefetch_batches=4, drop_remainder=False,
+                 input_data_dir=INPUT_DATA_PATH):
+        """
+        Args:
+            channel: the channel name, e.g. 'train'.
+            record_dtype: a NumPy (structured) dtype describing one record.
+            batch_size: records per batch.
+            prefetch_batches: maximum number of batches read ahead of the consumer.
+            drop_remainder: skip the last batch of an epoch if it has less than `batch_size` records.
+            input_data_dir: where the FIFOs are. Point this at a local directory to test with `os.mkfifo`.
+        """
+        self.channel = channel
+        self.record_dtype = np.dtype(record_dtype)
+        self.batch_size = batch_size
+        self.prefetch_batches = prefetch_batches
+        self.drop_remainder = drop_remainder
+        self.input_data_dir = input_data_dir
+        self._readers = []
+
+    def fifo_path(self, epoch):
+        return get_channel_fifo(self.channel, epoch, input_data_dir=self.input_data_dir)
+
+    def epoch_batches(self, epoch):
+        """Yields structured arrays of up to `batch_size` records for one pass over the channel.
+        """
+        batches = queue.Queue(maxsize=self.prefetch_batches)
+        stop = threading.Event()
+        reader = threading.Thread(target=self._read_fifo, args=(self.fifo_path(epoch), batches, stop))
+        reader.daemon = True
+        reader.start()
+        self._readers.append((reader, batches, stop))
+        try:
+            while True:
+                batch = batches.get()
+                if batch is _END_OF_EPOCH:
+                    break
+                if isinstance(batch, Exception):
+                    raise batch
+                yield batch
+        finally:
+            self._stop_reader(reader, batches, stop)
+
+    def _stop_reader(self, reader, batches, stop):
+        stop.set()
+        # Dropping what was read ahead frees the memory, and unblocks a reader stuck in put()
+        while True:
+            try:
+                batches.get_nowait()
+            except queue.Empty:
+                break
+        reader.join(self.JOIN_TIMEOUT_SECS)
+        if reader.is_alive():
+            logger.warning('Reader thread of channel %s is still blocked on its FIFO', self.channel)
+        if (reader, batches, stop) in self._readers:
+            self._readers.remove((reader, batches, stop))
+
+    def close(self):
+        """Stops every reader thread still running and drops the batches they read ahead.
+        """
+        for reader, batches, stop in list(self._readers):
+            self._stop_reader(reader, batches, stop)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _put(self, batches, item, stop):
+        # Polls, so the thread notices stop even while the consumer isn't taking batches
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=self._PUT_POLL_SECS)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _read_fifo(self, path, batches, stop):
+        try:
+            with io.open(path, 'rb', buffering=0) as fifo:
+                while not stop.is_set():
+                    batch = np.empty(self.batch_size, dtype=self.record_dtype)
+                    n_records = self._read_batch(fifo, batch)
+                    if n_records == 0 or (n_records < self.batch_size and self.drop_remainder):
+                        break
+                    if not self._put(batches, batch[:n_records], stop):
+                        return
+                    if n_records < self.batch_size:
+                        break
+            self._put(batches, _END_OF_EPOCH, stop)
+        except Exception as e:
+            self._put(batches, e, stop)
+
+    def _read_batch(self, fifo, batch):
+        """Fills `batch` straight from the pipe. Returns the number of whole records read.
+        """
+        buf = memoryview(batch.view(np.uint8).reshape(-1))
+        filled = 0
+        while filled < len(buf):
+            n = fifo.readinto(buf[filled:])
+            if not n:
+                break
+            filled += n
+        if filled % self.record_dtype.itemsize:
+            raise IOError("Channel %s ended in the middle of a record (%d stray bytes). Is record_dtype right?" %
+                          (self.channel, filled % self.record_dtype.itemsize))
+        return filled // self.record_dtype.itemsize
+
+    def read_all(self, epoch=0):
+        """Reads one whole pass over the channel into memory. Handy for small validation channels.
+        """
+        batches = list(self.epoch_batches(epoch))
+        if not batches:
+            return np.empty(0, dtype=self.record_dtype)
+        return np.concatenate(batches)
+
+    def keras_generator(self, x_field='x', y_field='y', scale=None, transform=None, first_epoch=0):
+        """Endless generator of (x, y) batches for `fit_generator`, moving on to the next
+        epoch's FIFO whenever one is exhausted. x is converted to float32 and scaled in place.
+
+        Pass `steps_per_epoch` to keras, since the number of batches isn't known up front.
+        It's not thread-safe, so use it with `workers=1`; batches are already read ahead.
+        """
+        epoch = first_epoch
+        while True:
+            for batch in self.epoch_batches(epoch):
+                x = batch[x_field].astype(np.float32)
+                if scale is not None:
+                    np.multiply(x, scale, out=x)
+                if transform is not None:
+                    for i in range(len(x)):
+                        x[i] = transform(x[i])
+                yield x, batch[y_field]
+            epoch += 1
@@ -0,0 +1,186 @@
+# Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import logging
+import multiprocessing
+import os
+import traceback
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Workers are forked so they inherit the (memory-mapped) dataset instead of pickling it.
+# Forking is only safe before TensorFlow starts its threads, so start() the pipeline
+# before keras is imported; see trainer/start.py.
+_mp = multiprocessing.get_context('fork') if hasattr(multiprocessing, 'get_context') else multiprocessing
+
+
+def default_workers(env):
+    """Number of input worker processes for a `TrainerEnvironment`.
+
+    With GPUs the CPUs only feed the model, so all but one core (left for the training
+    process itself) go to input. Without GPUs training competes for the same cores, so
+    input gets half of them.
+    """
+    cpus = max(1, env.available_cpus)
+    if env.available_gpus > 0:
+        return max(1, cpus - 1)
+    return max(1, cpus // 2)
+
+
+def default_prefetch(workers):
+    """Batches in flight: enough for every worker to have one batch queued behind the one it is producing.
+    """
+    return 2 * workers
+
+
+def _worker_loop(batches, slots, tasks, done, seed):
+    # Every worker needs its own random state for augmentation
+    np.random.seed(seed)
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        batch_idx, slot, indices = task
+        try:
+            x, y = batches.load(indices)
+            slots[slot][0][:len(x)] = x
+            slots[slot][1][:len(y)] = y
+            done.put((batch_idx, slot, len(x), None))
+        except Exception:
+            done.put((batch_idx, slot, 0, traceback.format_exc()))
+
+
+class InputPipeline(object):
+    """Produces the batches of a `ShardedBatches` in a pool of worker processes.
+
+    Workers write batches into a ring of shared-memory slots allocated once up front, so
+    batches are never pickled between processes. The number of workers and the prefetch
+    depth default to values sized from the `TrainerEnvironment`.
+
+    Workers are forked, so start the pipeline before keras or TensorFlow is imported and
+    only build the model afterwards. A transform that needs keras should import it on first
+    use, as `trainer.start.Augmentation` does, so only the workers import it.
+
+    Example:
+        ```
+        pipeline = InputPipeline(train_batches, env=env).start()
+        import keras
+        model = ...
+        try:
+            model.fit_generator(pipeline.keras_generator(), steps_per_epoch=len(pipeline),
+                                epochs=EPOCHS, workers=1)
+        finally:
+            pipeline.close()
+        ```
+    """
+    def __init__(self, batches, env=None, workers=None, prefetch=None, seed=None):
+        """
+        Args:
+            batches: a `trainer.dataset.ShardedBatches`, or anything with `__len__`,
+                     `batch_indices(idx)`, `load(indices)` and `on_epoch_end()`.
+            env: the `TrainerEnvironment` to size the pool from.
+            workers: number of worker processes. Defaults to `default_workers(env)`.
+            prefetch: number of batches in flight. Defaults to `default_prefetch(workers)`.
+        """
+        if workers is None:
+            workers = default_workers(env) if env is not None else 1
+        if prefetch is None:
+            prefetch = default_prefetch(workers)
+        self.batches = batches
+        self.workers = workers
+        self.prefetch = max(prefetch, workers)
+        self.seed = seed if seed is not None else os.getpid()
+        self._processes = []
+        logger.info('Input pipeline with %d workers and %d batches in flight', self.workers, self.prefetch)
+
+    def __len__(self):
+        return len(self.batches)
+
+    def _batch_spec(self):
+        if hasattr(self.batches, 'batch_spec'):
+            return self.batches.batch_spec()
+        # Otherwise a full-size batch tells us the shapes and dtypes to reserve. This runs the
+        # transform in the parent, so it may import whatever the transform needs before the fork.
+        return [(array.shape, array.dtype) for array in self.batches.load(self.batches.batch_indices(0))]
+
+    def _allocate_slots(self):
+        spec = self._batch_spec()
+        self._slots = []
+        for _ in range(self.prefetch):
+            slot = []
+            for shape, dtype in spec:
+                buf = _mp.RawArray('b', int(np.prod(shape)) * np.dtype(dtype).itemsize)
+                slot.append(np.frombuffer(buf, dtype=dtype).reshape(shape))
+            self._slots.append(slot)
+
+    def start(self):
+        if self._processes:
+            return self
+        self._allocate_slots()
+        self._tasks = _mp.Queue()
+        self._done = _mp.Queue()
+        for worker_num in range(self.workers):
+            process = _mp.Process(target=_worker_loop,
+                                  args=(self.batches, self._slots, self._tasks, self._done, self.seed + worker_num))
+            process.daemon = True
+            process.start()
+            self._processes.append(process)
+        return self
+
+    def close(self):
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join()
+        self._processes = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.close()
+
+    def epoch(self):
+        """Yields (x, y) for every batch of one epoch, in the order workers finish them.
+        """
+        self.start()
+        n_batches = len(self.batches)
+        free_slots = list(range(len(self._slots)))
+        next_batch = 0
+        in_flight = 0
+        while next_batch < n_batches or in_flight:
+            while free_slots and next_batch < n_batches:
+                self._tasks.put((next_batch, free_slots.pop(), self.batches.batch_indices(next_batch)))
+                next_batch += 1
+                in_flight += 1
+            batch_idx, slot, n_rows, error = self._done.get()
+            in_flight -= 1
+            if error:
+                raise RuntimeError('Input worker failed on batch %d:\n%s' % (batch_idx, error))
+            # Copying out of the slot is a plain memcpy, and lets the slot be refilled
+            # while keras still holds on to this batch
+            x, y = self._slots[slot]
+            batch = (x[:n_rows].copy(), y[:n_rows].copy())
+            free_slots.append(slot)
+            yield batch
+        self.batches.on_epoch_end()
+
+    def keras_generator(self):
+        """Endless generator for `fit_generator` with `steps_per_epoch=len(pipeline)` and `workers=1`.
+        """
+        while True:
+            for batch in self.epoch():
+                yield batch
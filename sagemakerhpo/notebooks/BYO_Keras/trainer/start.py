@@ -13,20 +13,54 @@
 from __future__ import absolute_import
 from __future__ import print_function
 
-import keras
-from keras.preprocessing.image import ImageDataGenerator
-from keras.models import Sequential
-from keras.layers import Dense, Dropout, Activation, Flatten
-from keras.layers import Conv2D, MaxPooling2D
+import math
 import os
 import numpy as np
 
+from trainer.dataset import open_channel, ShardedArray, ShardedBatches
 from trainer.environment import create_trainer_environment
+from trainer.pipe import PipeModeReader
+from trainer.pipeline import InputPipeline
 
 NUM_CLASSES = 10
 EPOCHS = 10
 NUM_PREDICTIONS = 20
 MODEL_NAME = 'keras_cifar10_trained_model.h5'
+PIXEL_SCALE = 1 / 255.
+
+# Layout of the records main.py uploads for Pipe mode (see trainer.dataset.write_records)
+RECORD_DTYPE = np.dtype([('x', np.uint8, (32, 32, 3)), ('y', np.float32, (NUM_CLASSES,))])
+
+
+class Augmentation(object):
+    """Keras real-time data augmentation, applied to one image at a time.
+
+    The ImageDataGenerator is only built on the first call, so keras (and TensorFlow) are
+    imported in the process that augments, not in the one that creates this object.
+    """
+    def __init__(self, width_shift_range, height_shift_range):
+        self.width_shift_range = width_shift_range
+        self.height_shift_range = height_shift_range
+        self._generator = None
+
+    def __call__(self, x):
+        if self._generator is None:
+            from keras.preprocessing.image import ImageDataGenerator
+            self._generator = ImageDataGenerator(
+                featurewise_center=False,  # set input mean to 0 over the dataset
+                samplewise_center=False,  # set each sample mean to 0
+                featurewise_std_normalization=False,  # divide inputs by std of the dataset
+                samplewise_std_normalization=False,  # divide each input by its std
+                zca_whitening=False,  # apply ZCA whitening
+                rotation_range=0,  # randomly rotate images in the range (degrees, 0 to 180)
+                width_shift_range=self.width_shift_range,  # randomly shift images horizontally (fraction of total width)
+                height_shift_range=self.height_shift_range,  # randomly shift images vertically (fraction of total height)
+                horizontal_flip=True,  # randomly flip images
+                vertical_flip=False)  # randomly flip images
+        # No feature-wise statistics are enabled above, so ImageDataGenerator.fit() over the
+        # whole dataset isn't needed and each image is augmented as its batch is read.
+        return self._generator.random_transform(x)
+
 
 # the trainer environment contains useful information about
 env = create_trainer_environment()
@@ -38,17 +72,56 @@ data_augmentation = env.hyperparameters.get('data_augmentation', default=True, o
 learning_rate = env.hyperparameters.get('learning_rate', default=.0001, object_type=float)
 width_shift_range = env.hyperparameters.get('width_shift_range', object_type=float)
 height_shift_range = env.hyperparameters.get('height_shift_range', object_type=float)
+# records in the train channel, set by main.py from the data it uploads. Pipe mode can't see the size up front.
+train_records = env.hyperparameters.get('train_records', object_type=int)
+
+pipe_mode = env.input_mode('train') == 'Pipe'
+if pipe_mode:
+    # the train channel is streamed through FIFOs while training runs. The test channel is small,
+    # so one pass of it is read into memory up front.
+    print('Reading channels in Pipe mode')
+    if train_records is None:
+        raise ValueError('Pipe mode needs the train_records hyperparameter, the number of records in the train channel')
+    input_data_dir = os.path.join(env.input_dir, 'data')
+    train_reader = PipeModeReader('train', RECORD_DTYPE, batch_size, input_data_dir=input_data_dir)
+    test_records = PipeModeReader('test', RECORD_DTYPE, batch_size, input_data_dir=input_data_dir).read_all()
+    test_channel = {'x': ShardedArray([test_records['x']]), 'y': ShardedArray([test_records['y']])}
+else:
+    # opening the train and test channels. The shards are memory-mapped, so nothing is read until a batch needs it
+    train_channel = open_channel(env.channel_dirs['train'])
+    test_channel = open_channel(env.channel_dirs['test'])
+    print('train channel: x%s, test channel: x%s' % (train_channel['x'].shape, test_channel['x'].shape))
+
+transform = None
+if not data_augmentation:
+    print('Not using data augmentation.')
+else:
+    print('Using real-time data augmentation.')
+    transform = Augmentation(width_shift_range, height_shift_range)
 
-# reading data from train and test channels
-train_data = np.load(os.path.join(env.channel_dirs['train'], 'cifar-10-npz-compressed.npz'))
-(x_train, y_train) = train_data['x'], train_data['y']
+pipeline = None
+if not pipe_mode:
+    # reading and augmentation run in a pool of processes sized from the available CPUs and GPUs.
+    # The pool is forked here, before keras is imported, so the workers don't inherit the
+    # threads and locks TensorFlow creates when the model is built.
+    train_batches = ShardedBatches(train_channel, batch_size, scale=PIXEL_SCALE, shuffle=True, transform=transform)
+    pipeline = InputPipeline(train_batches, env=env).start()
 
-test_data = np.load(os.path.join(env.channel_dirs['test'], 'cifar-10-npz-compressed.npz'))
-(x_test, y_test) = test_data['x'], test_data['y']
+import keras
+from keras.models import Sequential
+from keras.layers import Dense, Dropout, Activation, Flatten
+from keras.layers import Conv2D, MaxPooling2D
+
+
+class ChannelSequence(ShardedBatches, keras.utils.Sequence):
+    """Float32, scaled batches read from memory-mapped channel shards"""
+    pass
 
 
+test_batches = ChannelSequence(test_channel, batch_size, scale=PIXEL_SCALE, shuffle=False)
+
 model = Sequential()
-model.add(Conv2D(32, (3, 3), padding='same', input_shape=x_train.shape[1:]))
+model.add(Conv2D(32, (3, 3), padding='same', input_shape=test_channel['x'].shape[1:]))
 model.add(Activation('relu'))
 model.add(Conv2D(32, (3, 3)))
 model.add(Activation('relu'))
@@ -75,36 +148,22 @@ opt = keras.optimizers.rmsprop(lr=learning_rate, decay=1e-6)
 # Let's train the model using RMSprop
 model.compile(loss='categorical_crossentropy', optimizer=opt, metrics=['accuracy'])
 
-x_train = x_train.astype('float32')
-x_test = x_test.astype('float32')
-x_train /= 255
-x_test /= 255
-
-if not data_augmentation:
-    print('Not using data augmentation.')
-    model.fit(x_train, y_train, batch_size=batch_size, epochs=EPOCHS, validation_data=(x_test, y_test), shuffle=True)
+if pipe_mode:
+    # the reader prefetches in its own thread, and its generator isn't thread-safe
+    train_generator = train_reader.keras_generator(scale=PIXEL_SCALE, transform=transform)
+    steps_per_epoch = int(math.ceil(train_records / float(batch_size)))
+    try:
+        model.fit_generator(train_generator, steps_per_epoch=steps_per_epoch, epochs=EPOCHS,
+                            validation_data=test_batches, workers=1)
+    finally:
+        # the generator stops mid-epoch when training ends, with its reader thread blocked on the queue
+        train_reader.close()
 else:
-    print('Using real-time data augmentation.')
-    # This will do preprocessing and real time data augmentation:
-    data_generator = ImageDataGenerator(
-        featurewise_center=False,  # set input mean to 0 over the dataset
-        samplewise_center=False,  # set each sample mean to 0
-        featurewise_std_normalization=False,  # divide inputs by std of the dataset
-        samplewise_std_normalization=False,  # divide each input by its std
-        zca_whitening=False,  # apply ZCA whitening
-        rotation_range=0,  # randomly rotate images in the range (degrees, 0 to 180)
-        width_shift_range=width_shift_range,  # randomly shift images horizontally (fraction of total width)
-        height_shift_range=height_shift_range,  # randomly shift images vertically (fraction of total height)
-        horizontal_flip=True,  # randomly flip images
-        vertical_flip=False)  # randomly flip images
-
-    # Compute quantities required for feature-wise normalization
-    # (std, mean, and principal components if ZCA whitening is applied).
-    data_generator.fit(x_train)
-
-    # Fit the model on the batches generated by data_generator.flow().
-    data_generator_flow = data_generator.flow(x_train, y_train, batch_size=batch_size)
-    model.fit_generator(data_generator_flow, epochs=EPOCHS, validation_data=(x_test, y_test), workers=4)
+    try:
+        model.fit_generator(pipeline.keras_generator(), steps_per_epoch=len(pipeline), epochs=EPOCHS,
+                            validation_data=test_batches, workers=1)
+    finally:
+        pipeline.close()
 
 # Save model and weights
 model_path = os.path.join(env.model_dir, MODEL_NAME)
@@ -112,6 +171,6 @@ model.save(model_path)
 print('Saved trained model at %s ' % model_path)
 
 # Score trained model.
-scores = model.evaluate(x_test, y_test, verbose=1)
+scores = model.evaluate_generator(test_batches)
 print('Test loss:', scores[0])
 print('Test accuracy:', scores[1])
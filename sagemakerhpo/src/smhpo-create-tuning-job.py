@@ -16,7 +16,6 @@ Simple utility to launch a TuningJob from a JSON request definition.
 """
 import argparse
 import json
-import os
 import sys
 
 from smhpolib.client import get_smhpo_client
@@ -42,10 +41,7 @@ def get_parser():
 
 
 def main(opts):
-    if opts.aws_region:
-        os.environ["AWS_REGION"] = opts.aws_region
-
-    smhpo_client = get_smhpo_client()
+    smhpo_client = get_smhpo_client(opts.aws_region)
     request = json.load(open(opts.request_json))
     request['TuningJobName'] = opts.tuning_job_name
     result = smhpo_client.create_tuning_job(**request)
@@ -17,7 +17,6 @@ aws sagemaker describe-tuning-job
 """
 import argparse
 import json
-import os
 
 from smhpolib.client import get_smhpo_client
 from smhpolib import serialize_helper
@@ -39,9 +38,7 @@ def get_parser():
 
 
 def main(opts):
-    if opts.aws_region:
-        os.environ["AWS_REGION"] = opts.aws_region
-    smhpo_client = get_smhpo_client()
+    smhpo_client = get_smhpo_client(opts.aws_region)
     result = smhpo_client.describe_tuning_job(TuningJobName=opts.tuning_job_name)
     print(json.dumps(result, indent=2, sort_keys=True, default=serialize_helper))
 
@@ -14,7 +14,9 @@
 """
 Downloads all the metrics for the training jobs associated with a tuning job.
 Generates a set of .csv files  (one per training job) from all the 
-metrics in CloudWatch.
+metrics in CloudWatch.  With --source logs the metrics are extracted from
+the training jobs' logs instead, one datapoint per log line rather than
+one per minute.
 """
 import argparse
 import json
@@ -22,6 +24,7 @@ import os
 import traceback
 
 import smhpolib
+from smhpolib.logscan import CloudWatchLogsMetricFetcher
 from smhpolib.trainingcurve import CloudWatchMetricFetcher
 
 def get_parser():
@@ -44,6 +47,10 @@ def get_parser():
             help="maximum number of failures before quitting",
             type=int,
             default=5)
+    parser.add_argument("-s","--source",
+            help="where to read metrics from: CloudWatch 'metrics' (1 minute averages) or 'logs' (every datapoint)",
+            choices=["metrics", "logs"],
+            default="metrics")
     parser.add_argument("--aws-region",
                         help="AWS region",
                         type=str,
@@ -56,10 +63,8 @@ def generate_output_filename(training_job_name, opts):
     return "%s/metrics_%s.csv" % (opts.output_directory, training_job_name)
 
 def main(opts):
-    if opts.aws_region:
-        os.environ["AWS_REGION"] = opts.aws_region
     tuning_job = smhpolib.analysis.TuningJob(opts.tuning_job_name,
-            max_training_jobs=opts.max_training_jobs)
+            max_training_jobs=opts.max_training_jobs, region_context=opts.aws_region)
     metric_names = tuning_job.metric_names()
     training_names = tuning_job.training_job_names()
     print("Fetching %d metrics each for %d training jobs" % (len(metric_names), len(training_names)))
@@ -67,7 +72,10 @@ def main(opts):
     for n, training_job_name in enumerate(training_names):
         try:
             filename = generate_output_filename(training_job_name, opts)
-            fetcher = CloudWatchMetricFetcher()
+            if opts.source == "logs":
+                fetcher = CloudWatchLogsMetricFetcher.from_tuning_job(tuning_job)
+            else:
+                fetcher = CloudWatchMetricFetcher(region_context=tuning_job.region_context)
             for metric_name in metric_names:
                 fetcher.fetch_metric(training_job_name, metric_name)
             tcd = fetcher.training_curve_data()
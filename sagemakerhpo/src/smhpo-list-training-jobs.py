@@ -14,13 +14,23 @@
 """
 This effectively calls
 aws sagemakerhpo list-training-jobs-for-tuning-job
+for every page of results, and writes one compact JSON object per training
+job per line (NDJSON) as the pages arrive, e.g. to pipe into jq.
+
+--fields picks what goes in each line, with dots for nested fields:
+  --fields TrainingJobName,TrainingJobStatus,FinalTuningJobObjectiveMetric.Value
+--describe adds each training job's DescribeTrainingJob response to its
+line, fetched --describe-workers at a time.  A job whose describe fails
+gets an "Error" field instead.
 """
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 import json
-import os
+import sys
 
 from smhpolib import get_smhpo_client
 from smhpolib import serialize_helper
+from smhpolib.jobindex import TrainingJobIndex
 
 def get_parser():
     # --help text taken from docstring at top of file.
@@ -30,6 +40,33 @@ def get_parser():
             help="Tuning job name",
             type=str,
             required=True)
+    parser.add_argument("-s","--status",
+            help="only list training jobs with these statuses (repeatable)",
+            choices=TrainingJobIndex.STATUSES,
+            action="append")
+    parser.add_argument("-sb","--sort-by",
+            help="sort by the final objective metric value instead of listing in the service's order",
+            choices=["FinalObjectiveMetricValue"],
+            default=None)
+    parser.add_argument("-so","--sort-order",
+            help="Ascending or Descending",
+            choices=["Ascending", "Descending"],
+            default=None)
+    parser.add_argument("-f","--fields",
+            help="comma separated fields to output, dotted for nested fields.  Default: everything",
+            type=str,
+            default=None)
+    parser.add_argument("-l","--limit",
+            help="stop after this many training jobs",
+            type=int,
+            default=None)
+    parser.add_argument("-d","--describe",
+            help="add each training job's DescribeTrainingJob response",
+            action="store_true")
+    parser.add_argument("-dw","--describe-workers",
+            help="concurrent DescribeTrainingJob calls with --describe",
+            type=int,
+            default=8)
     parser.add_argument("--aws-region",
                         help="AWS region",
                         type=str,
@@ -37,17 +74,84 @@ def get_parser():
     return parser
 
 
+def project(record, fields):
+    """{field: value} for each dotted field path.  Missing fields are left out.
+    """
+    out = {}
+    for field in fields:
+        value = record
+        for part in field.split("."):
+            if not isinstance(value, dict) or part not in value:
+                break
+            value = value[part]
+        else:
+            out[field] = value
+    return out
+
+
+def list_training_jobs(smhpo_client, opts):
+    """Yields pages of training job summaries matching the options
+    """
+    kwargs = {'TuningJobName': opts.tuning_job_name}
+    statuses = set(opts.status or [])
+    if len(statuses) == 1:
+        # The service filters on one status.  More than one are filtered here.
+        kwargs['TrainingJobStatusEquals'] = list(statuses)[0]
+    if opts.sort_by:
+        kwargs['SortBy'] = opts.sort_by
+    if opts.sort_order:
+        kwargs['SortOrder'] = opts.sort_order
+    for page in smhpo_client.paginate_training_jobs_for_tuning_job(**kwargs):
+        if len(statuses) > 1:
+            page = [summary for summary in page if summary.get('TrainingJobStatus') in statuses]
+        yield page
+
+
 def main(opts):
-    if opts.aws_region:
-        os.environ["AWS_REGION"] = opts.aws_region
-    smhpo_client = get_smhpo_client()
-    result = smhpo_client.list_training_jobs_for_tuning_job(TuningJobName=opts.tuning_job_name, 
-        MaxResults=100)
-    print(json.dumps(result, indent=2, sort_keys=True, default=serialize_helper))
+    smhpo_client = get_smhpo_client(opts.aws_region)
+    fields = opts.fields.split(",") if opts.fields else None
 
+    # Called directly rather than through TrainingJobStatusFetcher, whose cache would
+    # keep a record of every job listed
+    sagemaker = smhpo_client.region_context.client('sagemaker')
 
-if __name__ == "__main__":
-    opts = get_parser().parse_args()
-    main(opts)
+    def describe(summary):
+        record = dict(summary)
+        try:
+            description = sagemaker.describe_training_job(TrainingJobName=summary['TrainingJobName'])
+        except Exception as e:
+            # One failed describe shouldn't end the listing
+            record['Error'] = str(e)
+            return record
+        description.pop('ResponseMetadata', None)
+        record.update(description)
+        return record
+
+    count = 0
+    with ThreadPoolExecutor(max_workers=opts.describe_workers) as executor:
+        for page in list_training_jobs(smhpo_client, opts):
+            if opts.limit is not None:
+                page = page[:opts.limit - count]
+            # map keeps the page's order while the describes run concurrently
+            records = executor.map(describe, page) if opts.describe else page
+            for record in records:
+                if fields:
+                    error = record.get('Error')
+                    record = project(record, fields)
+                    if error is not None:
+                        record['Error'] = error
+                sys.stdout.write(json.dumps(record, sort_keys=True, separators=(",", ":"), default=serialize_helper) + "\n")
+            sys.stdout.flush()
+            count += len(page)
+            if opts.limit is not None and count >= opts.limit:
+                break
+    print("Listed %d training jobs" % count, file=sys.stderr)
 
 
+if __name__ == "__main__":
+    opts = get_parser().parse_args()
+    try:
+        main(opts)
+    except BrokenPipeError:
+        # The reader (e.g. head) went away.  Keep python from complaining at exit.
+        sys.stderr.close()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+
+"""
+Watches a tuning job and stops it (like smhpo-stop-tuning-job.py) once
+--patience completed training jobs in a row haven't improved the best
+objective by more than --min-delta.
+"""
+import argparse
+import logging
+
+from smhpolib.guard import PlateauGuard
+
+def get_parser():
+    # --help text taken from docstring at top of file.
+    parser = argparse.ArgumentParser(description=__doc__,
+            formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("-n","--tuning-job-name",
+            help="Tuning job name",
+            type=str,
+            required=True)
+    parser.add_argument("-p","--patience",
+            help="completed training jobs without improvement before stopping",
+            type=int,
+            default=10)
+    parser.add_argument("-md","--min-delta",
+            help="smallest change in the objective that counts as an improvement",
+            type=float,
+            default=0.0)
+    parser.add_argument("--relative",
+            help="--min-delta is a fraction of the best objective, e.g. 0.001 for 0.1%%",
+            action="store_true")
+    parser.add_argument("-mj","--min-jobs",
+            help="completed training jobs needed before stopping at all (default: patience + 1)",
+            type=int,
+            default=None)
+    parser.add_argument("-ps","--poll-seconds",
+            help="seconds between checks",
+            type=int,
+            default=60)
+    parser.add_argument("-dr","--dryrun",
+            help="only log when the tuning job would be stopped",
+            action="store_true")
+    parser.add_argument("--once",
+            help="check once and exit instead of watching",
+            action="store_true")
+    parser.add_argument("--aws-region",
+                        help="AWS region",
+                        type=str,
+                        required=False)
+    return parser
+
+
+def main(opts):
+    logging.basicConfig(level=logging.INFO)
+    guard = PlateauGuard(opts.tuning_job_name, patience=opts.patience, min_delta=opts.min_delta,
+                         relative=opts.relative, min_jobs=opts.min_jobs, dry_run=opts.dryrun,
+                         poll_seconds=opts.poll_seconds, region_context=opts.aws_region)
+    if opts.once:
+        guard.check()
+    else:
+        guard.watch()
+
+
+if __name__ == "__main__":
+    opts = get_parser().parse_args()
+    main(opts)
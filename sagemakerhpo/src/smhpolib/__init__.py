@@ -12,18 +12,38 @@
 
 from __future__ import absolute_import
 
+import sys
+
 from .client import get_smhpo_client
 from .util import serialize_helper
 
 from . import analysis
+from . import channels
 from . import launcher
+from . import logscan
 from . import client
+from . import cost
+from . import curvematrix
+from . import earlystopping
+from . import extrapolation
+from . import guard
+from . import importance
+from . import jobindex
+from . import jobrecord
+from . import local
 from . import metrics
+from . import narrowing
+from . import regexlint
+from . import region
+from . import surrogate
+from . import sweep
 from . import trainingcurve
 from . import util
+from . import utilization
+from . import validation
 
 try:
     from . import viz
 except ModuleNotFoundError as err:
-    print("viz module error: %s" % err)
+    print("viz module error: %s" % err, file=sys.stderr)
 
@@ -15,7 +15,6 @@ Helper class for analyzing tuning jobs results
 """
 from __future__ import absolute_import
 
-import boto3
 from collections import defaultdict
 import datetime
 import logging
@@ -26,6 +25,10 @@ import traceback
 import numpy as np
 
 from . import metrics
+from .jobindex import TrainingJobIndex
+from .jobrecord import LRUCache, TrainingJobRecord
+from .region import get_region_context
+from .util import ranges_by_name
 
 try:
     import pandas as pd
@@ -35,18 +38,24 @@ except:
 
 class TuningJob():
 
-    def __init__(self, tuning_job_name, smhpo_client=None, max_training_jobs=None):
+    def __init__(self, tuning_job_name, smhpo_client=None, max_training_jobs=None, region_context=None):
+        """
+        :param region_context: region.RegionContext or region name the tuning job is in.
+            Every AWS call made for this tuning job goes to that region.  Default region if not given.
+        """
+        self.region_context = get_region_context(region_context)
         if smhpo_client:
             self.smhpo_client = smhpo_client
         else:
-            self.smhpo_client = boto3.client('sagemaker')
+            self.smhpo_client = self.region_context.client('sagemaker')
             
         self.tuning_job_name = tuning_job_name
         self._tuning_job_describe_result = None
-        self._training_job_summaries = None
-        self._training_job_summary_dict = None
+        self._training_job_index = None
         self._metric_names = None
         self._extra_metrics = defaultdict(dict)  # {tj_name:{metric:val}}
+        self._added_metrics = []  # [(metric_name, aggregate)] from add_metric, redone by refresh
+        self._hyperparam_dataframes = {}  # {include_times: DataFrame}, patched by refresh
         self._cached_timeseries = defaultdict(dict)  # {tj_name:{metric:[(x,x,x),(y,y,y)]}}
         if max_training_jobs is None:
             self._max_training_jobs = 9999999
@@ -61,13 +70,16 @@ class TuningJob():
                     HyperParameterTuningJobName=self.tuning_job_name)
         return self._tuning_job_describe_result
 
+    def stop(self):
+        """Calls StopHyperParameterTuningJob.  Its training jobs still running are stopped too.
+        """
+        return self.smhpo_client.stop_hyper_parameter_tuning_job(HyperParameterTuningJobName=self.tuning_job_name)
+
     def hyperparam_ranges(self):
+        """{name: range} of the tuning job's ParameterRanges, each with the Type of its group
+        """
         description = self.describe()
-        out = {}
-        for _, ranges in description['HyperParameterTuningJobConfig']['ParameterRanges'].items():
-            for param in ranges:
-                out[param['Name']] = param
-        return out
+        return ranges_by_name(description['HyperParameterTuningJobConfig']['ParameterRanges'])
 
     def metric_names(self):
         if self._metric_names is None:
@@ -75,87 +87,156 @@ class TuningJob():
         return self._metric_names
 
     def training_job_summaries(self):
-        """Everything (paginated) from ListTrainingJobsForTuningJob
+        """Everything (paginated) from ListTrainingJobsForTuningJob.
+        Rebuilt from the training_job_index() on each call, with every field the listing returned.
         """
-        self._ensure_tj_summaries()
-        return self._training_job_summaries
+        return self.training_job_index().summaries()
 
     def summary_for(self, training_job_name):
         """One specific record pulled from list of 
         ListTrainingJobsForTuningJob
         """
-        self._ensure_tj_summaries()
-        return self._training_job_summary_dict[training_job_name]
+        return self.training_job_index().summary(training_job_name)
 
     def training_job_names(self):
+        return list(self.training_job_index().names)
+
+    def training_job_index(self):
+        """jobindex.TrainingJobIndex of every training job's summary
+        """
         self._ensure_tj_summaries()
-        return [j['TrainingJobName'] for j in self._training_job_summaries]
+        return self._training_job_index
 
-    def _ensure_tj_summaries(self):
-        if self._training_job_summaries is not None:
-            return
-        logging.info("Fetching all TrainingJob summaries for %s" % self.tuning_job_name)
-        output = []
+    def _summary_pages(self):
+        """Yields each page of ListTrainingJobsForHyperParameterTuningJob
+        """
         next_args = {}
-        for cnt in range(100):
+        cnt = 0
+        while True:
+            cnt += 1
             logging.debug("Calling list_training_jobs_for_tuning_job %d" % cnt)
             raw_result = self.smhpo_client.list_training_jobs_for_hyper_parameter_tuning_job(HyperParameterTuningJobName=self.tuning_job_name,
                 MaxResults=100, **next_args)
             new_output = raw_result['TrainingJobSummaries']
-            output.extend(new_output)
-            logging.debug("Got %d more TrainingJobs. Total so far: %d" % (len(new_output), len(output)))
+            yield new_output
             if ('NextToken' in raw_result) and (len(new_output) > 0):
                 next_args['NextToken'] = raw_result['NextToken']
             else:
                 break
-            if len(output) >= self._max_training_jobs:
-                break
-        output = output[:self._max_training_jobs]
-        self._training_job_summaries = output
-        self._training_job_summary_dict = {s['TrainingJobName']: s for s in output}
 
+    def _ensure_tj_summaries(self):
+        if self._training_job_index is not None:
+            return
+        logging.info("Fetching all TrainingJob summaries for %s" % self.tuning_job_name)
+        index = TrainingJobIndex(describe_fn=self.describe_training_job)
+        for new_output in self._summary_pages():
+            # Pages go straight into the index, so the raw dicts don't pile up
+            index.add_summaries(new_output[:self._max_training_jobs - len(index)])
+            logging.debug("Got %d more TrainingJobs. Total so far: %d" % (len(new_output), len(index)))
+            if len(index) >= self._max_training_jobs:
+                break
+        self._training_job_index = index
+
+    def refresh(self):
+        """Lists the training jobs again and updates everything cached about the ones
+        that are new or whose status, objective or times changed: their descriptions,
+        metric timeseries, add_metric() values and rows of hyperparam_dataframe().
+        Jobs that haven't changed aren't described or reshaped again.
+        Returns the names of the new or changed jobs.
+        """
+        self._tuning_job_describe_result = None
+        if self._training_job_index is None:
+            self._ensure_tj_summaries()
+            return self.training_job_names()
+        index = self._training_job_index
+        changed = []
+        for new_output in self._summary_pages():
+            room = self._max_training_jobs - len(index)
+            known = [s for s in new_output if s['TrainingJobName'] in index]
+            new = [s for s in new_output if s['TrainingJobName'] not in index][:max(room, 0)]
+            changed.extend(index.update_summaries(known + new))
+        logging.info("Refreshed %s: %d of %d training jobs new or changed" %
+                     (self.tuning_job_name, len(changed), len(index)))
+        for training_job_name in changed:
+            TrainingJobStatusFetcher.invalidate(training_job_name, self.region_context)
+            self._cached_timeseries.pop(training_job_name, None)
+            for metric_name, aggregate in self._added_metrics:
+                self._record_metric(training_job_name, metric_name, aggregate)
+        if changed:
+            self._patch_hyperparam_dataframes(changed)
+        return changed
+
+
+    def describe_training_job(self, training_job_name):
+        """Cached response to DescribeTrainingJob for one of this tuning job's training jobs
+        """
+        return TrainingJobStatusFetcher.fetch(training_job_name, self.region_context)
 
     def hyperparam_dataframe(self, include_times=True):
         """If include_times is set, it will fetch the start/end times from SageMaker DescribeTrainingJob.
         This is needed to get the metrics from CWM
+        Built once, then kept up to date by refresh() and add_metric().  Returns a copy.
         """
         import pandas as pd
-        summaries = self.training_job_summaries()
-        def reshape(training_summary):
-            training_job_name = '??unknown??'
-            out = {}
+        df = self._hyperparam_dataframes.get(include_times)
+        if df is None:
+            summaries = self.training_job_summaries()
+            df = pd.DataFrame([self._hyperparam_row(tj, include_times) for tj in summaries])
+            self._hyperparam_dataframes[include_times] = df
+        return df.copy()
+
+    def _hyperparam_row(self, training_summary, include_times):
+        """One training job's row of hyperparam_dataframe, as a dict
+        """
+        training_job_name = '??unknown??'
+        out = {}
 
-            training_job_name = training_summary['TrainingJobName']
-            
-            training_job_description = TrainingJobStatusFetcher.fetch(training_job_name)
-            for k,v in training_job_description['HyperParameters'].items():
-                # Something (bokeh?) gets confused with ints so convert to float
-                try:
-                    v = float(v)
-                except:
-                    pass
-                out[k]=v
-            
-            out['TrainingJobName'] = training_job_name
-            out['TrainingJobStatus'] = training_summary['TrainingJobStatus']
-            out['FinalObjectiveValue'] = training_summary.get('FinalHyperParameterTuningJobObjectiveMetric',{}).get('Value')
-            if (include_times and  training_summary['TrainingJobStatus'] == 'Completed'): 
-                out['TrainingEndTime'] = None
-                out['TrainingCreationTime'] = None
-                try:
-                    description = TrainingJobStatusFetcher.fetch(training_job_name)
-                    end_time = description['TrainingEndTime']
-                    start_time = description['CreationTime']
-                    out['TrainingEndTime'] = end_time
-                    out['TrainingCreationTime'] = start_time
-                    if start_time and end_time:
-                        out['TrainingElapsedTimeSeconds'] = (end_time - start_time).total_seconds()
-                except:
-                    logging.warning("Problem converting training_job %s: %s" % (training_job_name,traceback.format_exc()))
-            out.update(self._extra_metrics[training_job_name])
-            return out
-        df = pd.DataFrame([reshape(tj) for tj in summaries])
-        return df
+        training_job_name = training_summary['TrainingJobName']
+        
+        training_job_description = TrainingJobStatusFetcher.fetch(training_job_name, self.region_context)
+        for k,v in training_job_description['HyperParameters'].items():
+            # Something (bokeh?) gets confused with ints so convert to float
+            try:
+                v = float(v)
+            except:
+                pass
+            out[k]=v
+        
+        out['TrainingJobName'] = training_job_name
+        out['TrainingJobStatus'] = training_summary['TrainingJobStatus']
+        out['FinalObjectiveValue'] = training_summary.get('FinalHyperParameterTuningJobObjectiveMetric',{}).get('Value')
+        if (include_times and  training_summary['TrainingJobStatus'] == 'Completed'): 
+            out['TrainingEndTime'] = None
+            out['TrainingCreationTime'] = None
+            try:
+                description = TrainingJobStatusFetcher.fetch(training_job_name, self.region_context)
+                end_time = description['TrainingEndTime']
+                start_time = description['CreationTime']
+                out['TrainingEndTime'] = end_time
+                out['TrainingCreationTime'] = start_time
+                if start_time and end_time:
+                    out['TrainingElapsedTimeSeconds'] = (end_time - start_time).total_seconds()
+            except:
+                logging.warning("Problem converting training_job %s: %s" % (training_job_name,traceback.format_exc()))
+        out.update(self._extra_metrics[training_job_name])
+        return out
+
+    def _patch_hyperparam_dataframes(self, training_job_names):
+        """Rebuilds the rows of these jobs in every cached hyperparam_dataframe.
+        Row i of the frames is row i of the index, so new jobs are appended.
+        """
+        import pandas as pd
+        index = self.training_job_index()
+        for include_times, df in list(self._hyperparam_dataframes.items()):
+            rows = pd.DataFrame([self._hyperparam_row(index.summary(name), include_times)
+                                 for name in training_job_names],
+                                index=[index.row(name) for name in training_job_names])
+            kept = df.drop(index=[row for row in rows.index if row in df.index])
+            # Assigning into the old columns fails when e.g. a None objective meets a float64
+            # column, so the rows are joined and every column's dtype inferred again, as when
+            # the frame was built.  None becomes NaN (or NaT) where the column is numeric.
+            df = pd.concat([kept, rows], sort=False).sort_index().infer_objects()
+            self._hyperparam_dataframes[include_times] = df
 
 
     def metric_timeseries(self, metric_name, training_job_name):
@@ -163,7 +244,7 @@ class TuningJob():
         """
         if not self._cached_timeseries[training_job_name].get(metric_name):
             logging.debug("Fetching %s for %s" % (metric_name, training_job_name))
-            fetcher = TrainingJobMetricsFetcher(training_job_name)
+            fetcher = TrainingJobMetricsFetcher(training_job_name, self.region_context)
             xy = fetcher.fetch_metric(metric_name)
             self._cached_timeseries[training_job_name][metric_name] = xy
         return self._cached_timeseries[training_job_name][metric_name] 
@@ -173,14 +254,38 @@ class TuningJob():
         """
         cnt = 0
         recorded_metric_name= "%s_%s" % (aggregate, metric_name)
+        if (metric_name, aggregate) not in self._added_metrics:
+            self._added_metrics.append((metric_name, aggregate))
+        values = []
         for training_job_name in self.training_job_names():
-            xy = self.metric_timeseries(metric_name, training_job_name)
-            val = self._pick_aggregate(xy, aggregate)
-            self._extra_metrics[training_job_name][recorded_metric_name] = val
+            val = self._record_metric(training_job_name, metric_name, aggregate)
+            values.append(val)
             if val is not None:
                 cnt += 1
+        for df in self._hyperparam_dataframes.values():
+            df[recorded_metric_name] = values
         print("Recorded non-blank %s for %d training jobs" % (recorded_metric_name,cnt))
 
+    def _record_metric(self, training_job_name, metric_name, aggregate):
+        xy = self.metric_timeseries(metric_name, training_job_name)
+        val = self._pick_aggregate(xy, aggregate)
+        self._extra_metrics[training_job_name]["%s_%s" % (aggregate, metric_name)] = val
+        return val
+
+
+    def hyperparam_importance(self, objective='FinalObjectiveValue', **kwargs):
+        """Returns an importance.HyperparamImportance for this tuning job's results.
+        Cached until more training jobs finish.
+        """
+        from .importance import HyperparamImportance
+        return HyperparamImportance.for_tuning_job(self, objective, **kwargs)
+
+    def recommend_ranges(self, objective='FinalObjectiveValue', **kwargs):
+        """Returns a narrowing.RangeNarrower with tighter ranges for a follow-up tuning job.
+        Use its save() to write a ranges file for the launcher.
+        """
+        from .narrowing import RangeNarrower
+        return RangeNarrower.from_tuning_job(self, objective, **kwargs)
 
     def _pick_aggregate(self, xy, aggregate):
         y = xy[1]
@@ -199,42 +304,67 @@ class TuningJob():
 
 
 class TrainingJobStatusFetcher():
-    """Utility class to call describe-training-job in SageMaker and cache results
+    """Utility class to call describe-training-job in SageMaker and cache results.
+
+    fetch() returns a jobrecord.TrainingJobRecord, which reads like the response
+    dict for the fields analysis uses but keeps nothing else.  The complete
+    responses of the most recently fetched jobs are kept in full_cache, and
+    fetch_full() describes the job again if it's no longer there.
     """
-    _DEFAULT_REGION="us-west-2"
-    cache = {}
+    FULL_CACHE_SIZE = 256
+    cache = {}  # {(region, training_job_name): TrainingJobRecord}
+    full_cache = LRUCache(FULL_CACHE_SIZE)  # {(region, training_job_name): response}
 
     @classmethod
-    def fetch(cls, training_job_name):
-
-        region= boto3.Session().region_name
-        if not region:
-            region=cls._DEFAULT_REGION
-        sm = boto3.client('sagemaker', region_name=region)
+    def fetch(cls, training_job_name, region_context=None):
+        region_context = get_region_context(region_context)
+        key = (region_context.region, training_job_name)
+        if key in cls.cache:
+            return cls.cache[key]
+        result = cls.fetch_full(training_job_name, region_context)
+        # fetch_full only fills cache when it describes the job, not when full_cache has it
+        record = cls.cache.get(key)
+        if record is None:
+            record = cls.cache[key] = TrainingJobRecord(result)
+        return record
 
-        if training_job_name in cls.cache:
-            return cls.cache[training_job_name]
-
-        result = sm.describe_training_job(TrainingJobName=training_job_name)
-        cls.cache[training_job_name] = result
+    @classmethod
+    def fetch_full(cls, training_job_name, region_context=None):
+        """The complete DescribeTrainingJob response
+        """
+        region_context = get_region_context(region_context)
+        key = (region_context.region, training_job_name)
+        result = cls.full_cache.get(key)
+        if result is None:
+            sm = region_context.client('sagemaker')
+            result = sm.describe_training_job(TrainingJobName=training_job_name)
+            cls.full_cache.put(key, result)
+            cls.cache[key] = TrainingJobRecord(result)
         return result
-    
+
+    @classmethod
+    def invalidate(cls, training_job_name, region_context=None):
+        """Forgets a job's cached description, so the next fetch describes it again
+        """
+        region_context = get_region_context(region_context)
+        key = (region_context.region, training_job_name)
+        cls.cache.pop(key, None)
+        cls.full_cache.pop(key)
 
 
 class TrainingJobMetricsFetcher():
     """
     """
 
-    cloudwatch = boto3.client('cloudwatch')
-
-    def __init__(self, training_job_name):
+    def __init__(self, training_job_name, region_context=None):
         self.training_job_name = training_job_name
+        self.region_context = get_region_context(region_context)
 
     def determine_timeinterval(self):
         """Returns a dict with two datetime objects, start_time and end_time
         covering the interval of the training job
         """
-        description = TrainingJobStatusFetcher.fetch(self.training_job_name)
+        description = TrainingJobStatusFetcher.fetch(self.training_job_name, self.region_context)
         start_time = description[u'TrainingStartTime']  # datetime object
         end_time = description.get(u'TrainingEndTime', datetime.datetime.utcnow())
         return {
@@ -249,7 +379,7 @@ class TrainingJobMetricsFetcher():
         """
         logging.debug("Fetching metric %s for TrainingJob: %s" % (metric_name, self.training_job_name))
         timeinterval = self.determine_timeinterval()
-        xy = metrics.plottable_for_job(self.training_job_name, metric_name, **timeinterval)
+        xy = metrics.plottable_for_job(self.training_job_name, metric_name, self.region_context, **timeinterval)
         return xy
 
     
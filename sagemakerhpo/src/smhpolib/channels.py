@@ -0,0 +1,99 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+
+"""
+Declarative description of the input channels of a training job.
+"""
+from __future__ import absolute_import
+
+INPUT_MODES = ("File", "Pipe")
+COMPRESSION_TYPES = ("None", "Gzip")
+DISTRIBUTION_TYPES = ("FullyReplicated", "ShardedByS3Key")
+S3_DATA_TYPES = ("S3Prefix", "ManifestFile")
+RECORD_WRAPPER_TYPES = ("None", "RecordIO")
+
+
+def _check_choice(name, value, choices):
+    if value not in choices:
+        raise ValueError("%s must be one of %s, not '%s'" % (name, choices, value))
+
+
+class InputChannel(object):
+    """One entry of InputDataConfig.
+
+    Use distribution="ShardedByS3Key" to give each instance of a multi-instance job
+    its own subset of the S3 objects instead of a full copy, and compression="Gzip"
+    for gzipped objects, which SageMaker decompresses when streaming in Pipe mode.
+    """
+
+    def __init__(self, name, s3_uri, content_type=None, compression="None",
+                 distribution="FullyReplicated", s3_data_type="S3Prefix", record_wrapper=None):
+        _check_choice("CompressionType", compression, COMPRESSION_TYPES)
+        _check_choice("S3DataDistributionType", distribution, DISTRIBUTION_TYPES)
+        _check_choice("S3DataType", s3_data_type, S3_DATA_TYPES)
+        if record_wrapper is not None:
+            _check_choice("RecordWrapperType", record_wrapper, RECORD_WRAPPER_TYPES)
+        self.name = name
+        self.s3_uri = s3_uri
+        self.content_type = content_type
+        self.compression = compression
+        self.distribution = distribution
+        self.s3_data_type = s3_data_type
+        self.record_wrapper = record_wrapper
+
+    def with_options(self, **options):
+        """Returns a copy with some settings changed, e.g. with_options(compression="Gzip")
+        """
+        settings = {
+            "content_type": self.content_type,
+            "compression": self.compression,
+            "distribution": self.distribution,
+            "s3_data_type": self.s3_data_type,
+            "record_wrapper": self.record_wrapper,
+        }
+        unknown = set(options) - set(settings)
+        if unknown:
+            raise ValueError("Unknown InputChannel options %s" % sorted(unknown))
+        settings.update(options)
+        return InputChannel(self.name, self.s3_uri, **settings)
+
+    def to_request(self):
+        """Returns the Channel structure for a CreateTuningJob request
+        """
+        channel = {
+            "ChannelName": self.name,
+            "CompressionType": self.compression,
+            "DataSource": {
+                "S3DataSource": {
+                    "S3Uri": self.s3_uri,
+                    "S3DataType": self.s3_data_type,
+                    "S3DataDistributionType": self.distribution,
+                }
+            },
+        }
+        if self.content_type is not None:
+            channel["ContentType"] = self.content_type
+        if self.record_wrapper is not None:
+            channel["RecordWrapperType"] = self.record_wrapper
+        return channel
+
+    def __repr__(self):
+        return "InputChannel(%s, %s, %s, %s)" % (self.name, self.s3_uri, self.distribution, self.compression)
+
+
+def input_data_config(channels):
+    """Builds the InputDataConfig list from InputChannel objects
+    """
+    names = [c.name for c in channels]
+    if len(set(names)) != len(names):
+        raise ValueError("Duplicate channel names in %s" % names)
+    return [c.to_request() for c in channels]
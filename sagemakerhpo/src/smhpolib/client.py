@@ -10,10 +10,11 @@
 # and limitations under the License.
 
 
-import boto3
 import os
+import sys
 
 from . import util
+from .region import get_region_context
 
 class SmhpoClient():
     """Helper class to set up boto3 client to call SageMakerHPO.
@@ -21,9 +22,6 @@ class SmhpoClient():
     Sets AwsAccountId for you.
     """
 
-    # Defaults
-    _DEFAULT_REGION = "us-west-2"
-
     _ENDPOINTS_MAP = {
         'us-west-2':'https://zj0jmkp64g.execute-api.us-west-2.amazonaws.com/Prod',
         'us-east-1':'https://86b5tsckyb.execute-api.us-east-1.amazonaws.com/Prod'
@@ -32,14 +30,11 @@ class SmhpoClient():
     @classmethod
     def get_smhpo_client(cls, region=None, endpoint_url=None):
         """Returns a boto client for calling SageMaker-HPO.
-        :param region: the AWS region
+        :param region: the AWS region, or a region.RegionContext.  Default region if not given.
         :param endpoint_url: the service endpoint
         """
-        if not region:
-            region=os.getenv("AWS_REGION")
-            if not region:
-                region=cls._DEFAULT_REGION
-        return SmhpoClient(region, cls._pick_endpoint(explicit_endpoint=endpoint_url,region=region))
+        region_context = get_region_context(region)
+        return SmhpoClient(region_context, cls._pick_endpoint(explicit_endpoint=endpoint_url,region=region_context.region))
 
     @classmethod
     def _pick_endpoint(cls, explicit_endpoint,region):
@@ -47,20 +42,19 @@ class SmhpoClient():
             return explicit_endpoint
         env_endpoint = os.getenv('SMHPO_ENDPOINT_URL')
         if env_endpoint:
-            print("Using SMHPO_ENDPOINT_URL from environment: %s" % env_endpoint)
+            print("Using SMHPO_ENDPOINT_URL from environment: %s" % env_endpoint, file=sys.stderr)
             return env_endpoint
         if region in cls._ENDPOINTS_MAP:
-            print("Using SMHPO_ENDPOINT_URL: %s" % cls._ENDPOINTS_MAP[region])
+            print("Using SMHPO_ENDPOINT_URL: %s" % cls._ENDPOINTS_MAP[region], file=sys.stderr)
             return cls._ENDPOINTS_MAP[region]
         else:
             raise ValueError("given aws region not in endpoints map")
 
     def __init__(self, region, endpoint_url):
-        self._boto_client = boto3.client('sagemakerhpo',
-            region_name=region,
-            endpoint_url=endpoint_url,
-        )
-        self._aws_account_id = util.current_aws_account()
+        region_context = get_region_context(region)
+        self.region_context = region_context
+        self._boto_client = region_context.client('sagemakerhpo', endpoint_url=endpoint_url)
+        self._aws_account_id = util.current_aws_account(region_context)
 
     def describe_tuning_job(self, *args, **kwargs):
         return self._boto_client.describe_tuning_job(AwsAccountId=self._aws_account_id, *args, **kwargs)
@@ -71,6 +65,18 @@ class SmhpoClient():
     def list_training_jobs_for_tuning_job(self, *args, **kwargs):
         return self._boto_client.list_training_jobs_for_tuning_job(AwsAccountId=self._aws_account_id, *args, **kwargs)
 
+    def paginate_training_jobs_for_tuning_job(self, **kwargs):
+        """Yields each page of TrainingJobSummaries, following NextToken to the end
+        """
+        kwargs.setdefault('MaxResults', 100)
+        while True:
+            result = self.list_training_jobs_for_tuning_job(**kwargs)
+            summaries = result.get('TrainingJobSummaries', [])
+            yield summaries
+            if not result.get('NextToken') or not summaries:
+                return
+            kwargs['NextToken'] = result['NextToken']
+
     def stop_tuning_job(self, *args, **kwargs):
         return self._boto_client.stop_tuning_job(AwsAccountId=self._aws_account_id, *args, **kwargs)
 
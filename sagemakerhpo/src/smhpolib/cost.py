@@ -0,0 +1,169 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+
+"""
+Compute cost and throughput of tuning jobs: billable instance time,
+dollars, and how much objective improvement they bought.
+"""
+from __future__ import absolute_import
+
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+
+from .jobindex import to_epoch
+
+
+class PriceTable(object):
+    """Hourly price per instance of each instance type.
+
+    No prices are built in since they depend on region, date and discounts.
+    Load them from a JSON file like {"ml.m4.xlarge": 0.28, ...}, or pass a dict.
+    """
+
+    def __init__(self, prices=None):
+        self.prices = dict(prices or {})
+
+    @classmethod
+    def from_file(cls, filename):
+        with open(filename) as fh:
+            return cls(json.load(fh))
+
+    def hourly(self, instance_types):
+        """Vectorized lookup.  Unknown instance types get NaN and a warning.
+        """
+        prices = pd.Series(instance_types).map(self.prices).astype(float).values
+        missing = sorted(set(t for t, p in zip(instance_types, prices) if np.isnan(p)))
+        if missing:
+            logging.warning("No price for instance types %s, their cost will be NaN" % missing)
+        return prices
+
+
+class TuningCost(object):
+    """Cost and throughput of one or more tuning jobs.
+
+    jobs is a DataFrame with one row per training job, as built by
+    from_tuning_jobs.  All the figures are computed column-wise over it.
+    """
+
+    def __init__(self, jobs, price_table=None):
+        self.price_table = price_table or PriceTable()
+        jobs = jobs.sort_values(['TuningJobName', 'CreationTime']).reset_index(drop=True)
+        jobs['Cost'] = jobs['BillableInstanceSeconds'] / 3600.0 * self.price_table.hourly(list(jobs['InstanceType']))
+        # "Higher is better" scores make the running best a cummax for every tuning job
+        jobs['Score'] = np.where(jobs['Maximize'], 1.0, -1.0) * jobs['FinalObjectiveValue']
+        grouped = jobs.groupby('TuningJobName', sort=False)
+        jobs['CumulativeCost'] = grouped['Cost'].cumsum()
+        jobs['CumulativeInstanceSeconds'] = grouped['BillableInstanceSeconds'].cumsum()
+        jobs['BestScoreSoFar'] = jobs['Score'].fillna(-np.inf).groupby(jobs['TuningJobName'], sort=False).cummax()
+        jobs.loc[np.isinf(jobs['BestScoreSoFar']), 'BestScoreSoFar'] = np.nan
+        self.jobs = jobs
+
+    @classmethod
+    def from_tuning_jobs(cls, tuning_jobs, price_table=None, use_describe=True):
+        """Builds the per-job table from TuningJob objects.
+
+        With use_describe, billable time comes from each training job's DescribeTrainingJob:
+        BillableTimeInSeconds if present, otherwise TrainingEndTime - TrainingStartTime, times
+        the InstanceCount.  Without it, times come from the summaries and the instance type and
+        count from the tuning job's TrainingJobDefinition.
+        """
+        frames = [cls._jobs_for(tuning_job, use_describe) for tuning_job in tuning_jobs]
+        return cls(pd.concat(frames, ignore_index=True), price_table)
+
+    @classmethod
+    def _jobs_for(cls, tuning_job, use_describe):
+        description = tuning_job.describe()
+        maximize = description['HyperParameterTuningJobConfig']['HyperParameterTuningJobObjective']['Type'] == 'Maximize'
+        resources = description['TrainingJobDefinition']['ResourceConfig']
+        index = tuning_job.training_job_index()
+        n = len(index)
+        instance_type = [resources['InstanceType']] * n
+        instance_count = np.full(n, float(resources['InstanceCount']))
+        start = np.where(np.isnan(index.start_time), index.creation_time, index.start_time)
+        seconds = index.end_time - start
+        if use_describe:
+            for i, name in enumerate(index.names):
+                job = index.describe(name)
+                instance_type[i] = job['ResourceConfig']['InstanceType']
+                instance_count[i] = job['ResourceConfig']['InstanceCount']
+                if 'BillableTimeInSeconds' in job:
+                    seconds[i] = job['BillableTimeInSeconds']
+                elif job.get('TrainingStartTime') and job.get('TrainingEndTime'):
+                    seconds[i] = to_epoch(job['TrainingEndTime']) - to_epoch(job['TrainingStartTime'])
+        return pd.DataFrame({
+            'TuningJobName': tuning_job.tuning_job_name,
+            'TrainingJobName': index.names,
+            'TrainingJobStatus': np.array(index.statuses, dtype=object)[index.status],
+            'InstanceType': instance_type,
+            'InstanceCount': instance_count,
+            # Jobs still running have no end yet, and cost nothing so far as far as we can tell
+            'BillableInstanceSeconds': np.nan_to_num(seconds) * instance_count,
+            'CreationTime': index.creation_time,
+            'EndTime': index.end_time,
+            'FinalObjectiveValue': index.objective,
+            'Maximize': maximize,
+        })
+
+    def per_tuning_job(self):
+        """One row per tuning job: totals, best objective and the cost of improving it.
+
+        Improvement is how much better the best objective is than the first one reported,
+        in the direction of the tuning job's objective.
+        """
+        jobs = self.jobs
+        grouped = jobs.groupby('TuningJobName', sort=False)
+        # first() skips NaN, so this is the first objective reported
+        first_score = grouped['Score'].first()
+        best_score = grouped['Score'].max()
+        out = pd.DataFrame({
+            'TrainingJobs': grouped.size(),
+            'InstanceType': grouped['InstanceType'].agg(lambda s: ",".join(sorted(set(s)))),
+            'BillableInstanceSeconds': grouped['BillableInstanceSeconds'].sum(),
+            'Cost': grouped['Cost'].sum(min_count=1),
+            'WallClockSeconds': grouped['EndTime'].max() - grouped['CreationTime'].min(),
+            'BestObjectiveValue': best_score * np.where(grouped['Maximize'].first(), 1.0, -1.0),
+            'Improvement': best_score - first_score,
+        })
+        hours = out['WallClockSeconds'] / 3600.0
+        instance_hours = out['BillableInstanceSeconds'] / 3600.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out['CostPerJob'] = out['Cost'] / out['TrainingJobs']
+            out['CostPerImprovement'] = np.where(out['Improvement'] > 0, out['Cost'] / out['Improvement'], np.nan)
+            out['ImprovementPerHour'] = out['Improvement'] / hours
+            out['ImprovementPerInstanceHour'] = out['Improvement'] / instance_hours
+        return out.reset_index().rename(columns={'index': 'TuningJobName'})
+
+    def cost_to_reach(self, fraction=0.95):
+        """Cost and instance time each tuning job had spent when its running best first got
+        within `fraction` of its total improvement.
+        """
+        jobs = self.jobs
+        grouped = jobs.groupby('TuningJobName', sort=False)
+        first = grouped['Score'].transform('first')
+        best = grouped['Score'].transform('max')
+        reached = jobs['BestScoreSoFar'] >= first + fraction * (best - first)
+        hits = jobs[reached].groupby('TuningJobName', sort=False).head(1)
+        return hits[['TuningJobName', 'TrainingJobName', 'CumulativeCost', 'CumulativeInstanceSeconds']].reset_index(drop=True)
+
+    def by_instance_type(self):
+        """Totals per instance type across all the tuning jobs, for comparing throughput per dollar
+        """
+        summary = self.per_tuning_job()
+        grouped = summary.groupby('InstanceType')
+        out = grouped[['TrainingJobs', 'BillableInstanceSeconds', 'Cost', 'Improvement', 'WallClockSeconds']].sum(min_count=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out['CostPerImprovement'] = out['Cost'] / out['Improvement']
+            out['ImprovementPerHour'] = out['Improvement'] / (out['WallClockSeconds'] / 3600.0)
+        return out.reset_index()
@@ -0,0 +1,222 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+
+"""
+Training curves of many jobs resampled onto one common grid, so that
+cross-job statistics are plain array operations.
+"""
+from __future__ import absolute_import
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+
+class _RaggedCurves(object):
+    """Many (x, y) curves concatenated into flat arrays sorted by (job, x).
+
+    Looking up points for many jobs at once works by offsetting each job's x
+    by a multiple of a span wider than all the x values, which turns every
+    per-job search into a single searchsorted on one sorted array.
+    """
+
+    def __init__(self, xs, ys):
+        lengths = np.array([len(x) for x in xs], dtype=np.int64)
+        self.n_jobs = len(xs)
+        self.starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+        self.ends = self.starts + lengths
+        if lengths.sum() == 0:
+            self.x = np.zeros(0)
+            self.y = np.zeros(0)
+            self.job_ids = np.zeros(0, dtype=np.int64)
+            return
+        x = np.concatenate([np.asarray(v, dtype=float) for v in xs])
+        y = np.concatenate([np.asarray(v, dtype=float) for v in ys])
+        job_ids = np.repeat(np.arange(self.n_jobs), lengths)
+        # Stable, so of several points at the same x the last one recorded wins
+        order = np.lexsort((x, job_ids))
+        self.x = x[order]
+        self.y = y[order]
+        self.job_ids = job_ids[order]
+
+    def first_x(self):
+        out = np.full(self.n_jobs, np.nan)
+        has = self.ends > self.starts
+        out[has] = self.x[self.starts[has]]
+        return out
+
+    def last_x(self):
+        out = np.full(self.n_jobs, np.nan)
+        has = self.ends > self.starts
+        out[has] = self.x[self.ends[has] - 1]
+        return out
+
+    def last_y(self):
+        out = np.full(self.n_jobs, np.nan)
+        has = self.ends > self.starts
+        out[has] = self.y[self.ends[has] - 1]
+        return out
+
+    def asof(self, job_ids, queries):
+        """Index of the last point of job_ids[i] at or before queries[i], -1 if there is none.
+        job_ids and queries are broadcast against each other.
+        """
+        job_ids, queries = np.broadcast_arrays(job_ids, np.asarray(queries, dtype=float))
+        if len(self.x) == 0:
+            return np.full(queries.shape, -1, dtype=np.int64)
+        low = min(self.x.min(), np.nanmin(queries) if queries.size else 0.0)
+        high = max(self.x.max(), np.nanmax(queries) if queries.size else 0.0)
+        span = high - low + 1.0
+        keys = self.job_ids * span + (self.x - low)
+        idx = np.searchsorted(keys, job_ids * span + (queries - low), side='right') - 1
+        found = (idx >= self.starts[job_ids]) & ~np.isnan(queries)
+        return np.where(found, idx, -1)
+
+
+class CurveMatrix(object):
+    """One metric for many jobs as a dense (jobs x grid) matrix.
+
+    values[i, j] is job i's metric at grid[j], NaN where mask is False.  The
+    mask covers the grid points between each job's first and last datapoint,
+    or from the first datapoint on if hold=True.  interpolation="step" holds
+    the last recorded value, "linear" interpolates between datapoints.
+    """
+
+    INTERPOLATIONS = ("step", "linear")
+
+    def __init__(self, curves, grid=None, n_grid=200, interpolation="step", hold=False, x_label="seconds"):
+        """
+        :param curves: {training_job_name: (x_list, y_list)} as returned by TuningJob.metric_timeseries
+        :param grid: the points to resample at.  Default: n_grid points from 0 to the last x of any job.
+        :param hold: keep each job's last value after its last datapoint
+        """
+        if interpolation not in self.INTERPOLATIONS:
+            raise ValueError("interpolation must be one of %s, not '%s'" % (self.INTERPOLATIONS, interpolation))
+        self.job_names = sorted(curves)
+        self.n_jobs = len(self.job_names)
+        self.interpolation = interpolation
+        self.x_label = x_label
+        ragged = _RaggedCurves([curves[name][0] for name in self.job_names],
+                               [curves[name][1] for name in self.job_names])
+        self.first_x = ragged.first_x()
+        self.last_x = ragged.last_x()
+        self.last_value = ragged.last_y()
+        if grid is None:
+            end = np.nanmax(self.last_x) if np.any(~np.isnan(self.last_x)) else 0.0
+            grid = np.linspace(0, end, n_grid)
+        self.grid = np.asarray(grid, dtype=float)
+
+        jobs = np.arange(self.n_jobs)[:, None]
+        idx = ragged.asof(jobs, self.grid[None, :])
+        found = idx >= 0
+        values = np.full(idx.shape, np.nan)
+        values[found] = ragged.y[idx[found]]
+        if interpolation == "linear":
+            nxt = idx + 1
+            between = found & (nxt < ragged.ends[:, None])
+            i0 = idx[between]
+            i1 = nxt[between]
+            g = np.broadcast_to(self.grid[None, :], idx.shape)[between]
+            weight = (g - ragged.x[i0]) / (ragged.x[i1] - ragged.x[i0])
+            values[between] = ragged.y[i0] + weight * (ragged.y[i1] - ragged.y[i0])
+        self.mask = found
+        if not hold:
+            with np.errstate(invalid='ignore'):
+                self.mask = found & (self.grid[None, :] <= self.last_x[:, None])
+        values[~self.mask] = np.nan
+        self.values = values
+
+    @classmethod
+    def from_tuning_job(cls, tuning_job, metric_name, epoch_metric=None, **kwargs):
+        """Resamples a metric for every training job of a TuningJob.
+        With epoch_metric, the grid is epochs instead of seconds, see by_epoch.
+        """
+        names = tuning_job.training_job_names()
+        curves = {name: tuning_job.metric_timeseries(metric_name, name) for name in names}
+        if epoch_metric is None:
+            return cls(curves, **kwargs)
+        epoch_curves = {name: tuning_job.metric_timeseries(epoch_metric, name) for name in names}
+        return cls.by_epoch(curves, epoch_curves, **kwargs)
+
+    @classmethod
+    def by_epoch(cls, curves, epoch_curves, grid=None, **kwargs):
+        """Aligns each job's metric to its own epoch counter instead of elapsed time.
+
+        Every datapoint gets the epoch most recently reported at or before it (an
+        as-of join), and the last datapoint of each epoch is kept.  Both sets of
+        curves must measure x from the same origin.
+        :param epoch_curves: {training_job_name: (x_list, epoch_list)}
+        :param grid: epochs to resample at.  Default: every whole epoch up to the last one seen.
+        """
+        names = sorted(curves)
+        epochs = _RaggedCurves([epoch_curves.get(name, ([], []))[0] for name in names],
+                               [epoch_curves.get(name, ([], []))[1] for name in names])
+        lengths = [len(curves[name][0]) for name in names]
+        job_ids = np.repeat(np.arange(len(names)), lengths)
+        x = np.concatenate([np.asarray(curves[name][0], dtype=float) for name in names] + [np.zeros(0)])
+        y = np.concatenate([np.asarray(curves[name][1], dtype=float) for name in names] + [np.zeros(0)])
+        idx = epochs.asof(job_ids, x)
+        found = idx >= 0
+        # Points stay grouped by job, so the found ones split back into per-job curves
+        splits = np.cumsum(np.bincount(job_ids[found], minlength=len(names)))[:-1]
+        aligned = dict(zip(names, zip(np.split(epochs.y[idx[found]], splits), np.split(y[found], splits))))
+        if grid is None:
+            last_epoch = max([np.max(e) for e, _ in aligned.values() if len(e)] or [0])
+            grid = np.arange(0, int(last_epoch) + 1)
+        kwargs.setdefault('interpolation', 'step')
+        return cls(aligned, grid=grid, x_label="epoch", **kwargs)
+
+    def count(self):
+        """Number of jobs with a value at each grid point
+        """
+        return self.mask.sum(axis=0)
+
+    def _nan_reduce(self, func, *args, **kwargs):
+        with warnings.catch_warnings():
+            # Columns where no job has a value just come out NaN
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            return func(self.values, *args, axis=0, **kwargs)
+
+    def mean(self):
+        return self._nan_reduce(np.nanmean)
+
+    def median(self):
+        return self._nan_reduce(np.nanmedian)
+
+    def percentile(self, q):
+        """Percentile curve(s) across jobs.  q can be a number or a list of numbers.
+        """
+        return self._nan_reduce(np.nanpercentile, q)
+
+    def band(self, low=25, high=75):
+        """(low, high) percentile curves, e.g. for a shaded band around the median
+        """
+        lower, upper = self.percentile([low, high])
+        return lower, upper
+
+    def ranks(self, maximize=False):
+        """Rank of every job among the jobs with a value at each grid point, 1 being best.
+        NaN where the job has no value.
+        """
+        scores = -self.values if maximize else self.values
+        scores = np.where(self.mask, scores, np.inf)
+        order = np.argsort(scores, axis=0, kind='stable')
+        ranks = np.empty(order.shape)
+        ranks[order, np.arange(order.shape[1])[None, :]] = np.arange(1, self.n_jobs + 1)[:, None]
+        ranks[~self.mask] = np.nan
+        return ranks
+
+    def to_dataframe(self):
+        """values as a DataFrame, one row per job and one column per grid point
+        """
+        return pd.DataFrame(self.values, index=self.job_names, columns=self.grid)
@@ -0,0 +1,239 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+
+"""
+Offline replay of early-stopping rules over recorded training curves.
+Answers "how much compute would this rule have saved, and would it have
+killed the job that ended up winning?" before trusting it on a live run.
+"""
+from __future__ import absolute_import
+
+import logging
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from .curvematrix import CurveMatrix
+
+
+class MedianStoppingRule(object):
+    """Stops a job when its best value so far is worse than the median of all
+    jobs' running averages at the same elapsed time.
+    Jobs are compared against all jobs including themselves, which is
+    indistinguishable from "the other jobs" at the sizes where this matters.
+    """
+
+    def __init__(self, min_seconds=0, min_jobs=3):
+        self.min_seconds = min_seconds
+        self.min_jobs = min_jobs
+
+    def __repr__(self):
+        return "MedianStoppingRule(min_seconds=%s)" % self.min_seconds
+
+    def stop_matrix(self, sim):
+        with warnings.catch_warnings():
+            # All-NaN columns just mean nobody has reported yet
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            reference = np.nanmedian(sim.running_average, axis=0)
+        enough = np.sum(~np.isnan(sim.running_average), axis=0) >= self.min_jobs
+        eligible = (sim.grid >= self.min_seconds) & enough
+        with np.errstate(invalid='ignore'):
+            return (sim.best_so_far > reference[None, :]) & eligible[None, :]
+
+
+class PercentileRule(object):
+    """Stops a job when its best value so far is worse than the given percentile
+    of every job's best value so far at the same elapsed time.
+    percentile=50 keeps the better half, percentile=75 only stops the worst quarter.
+    """
+
+    def __init__(self, percentile=50, min_seconds=0, min_jobs=3):
+        self.percentile = percentile
+        self.min_seconds = min_seconds
+        self.min_jobs = min_jobs
+
+    def __repr__(self):
+        return "PercentileRule(percentile=%s, min_seconds=%s)" % (self.percentile, self.min_seconds)
+
+    def stop_matrix(self, sim):
+        # Scores are "lower is better", so the kept fraction sits below the threshold
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            threshold = np.nanpercentile(sim.best_so_far, self.percentile, axis=0)
+        enough = np.sum(~np.isnan(sim.best_so_far), axis=0) >= self.min_jobs
+        eligible = (sim.grid >= self.min_seconds) & enough
+        with np.errstate(invalid='ignore'):
+            return (sim.best_so_far > threshold[None, :]) & eligible[None, :]
+
+
+class SuccessiveHalvingRule(object):
+    """At rungs of min_seconds * eta**k elapsed seconds, keeps only the best
+    1/eta of the jobs still running and stops the rest.
+    """
+
+    def __init__(self, min_seconds, eta=3):
+        if min_seconds <= 0 or eta <= 1:
+            raise ValueError("SuccessiveHalvingRule needs min_seconds > 0 and eta > 1")
+        self.min_seconds = min_seconds
+        self.eta = eta
+
+    def __repr__(self):
+        return "SuccessiveHalvingRule(min_seconds=%s, eta=%s)" % (self.min_seconds, self.eta)
+
+    def stop_matrix(self, sim):
+        stop = np.zeros(sim.best_so_far.shape, dtype=bool)
+        alive = np.ones(sim.n_jobs, dtype=bool)
+        rung_seconds = self.min_seconds
+        while rung_seconds <= sim.grid[-1]:
+            t = np.searchsorted(sim.grid, rung_seconds)
+            scores = sim.best_so_far[:, t]
+            competing = alive & sim.running[:, t] & ~np.isnan(scores)
+            n_keep = int(np.ceil(competing.sum() / float(self.eta)))
+            if competing.sum() > n_keep:
+                ranked = np.where(competing, scores, np.inf).argsort(kind='stable')
+                losers = ranked[n_keep:competing.sum()]
+                stop[losers, t] = True
+                alive[losers] = False
+            rung_seconds *= self.eta
+        return stop
+
+
+class EarlyStoppingSimulator(object):
+    """Replays early-stopping rules over the recorded curves of many training jobs.
+
+    All curves are resampled once onto a common grid of elapsed seconds, so
+    each rule is evaluated as array operations across every job at once.
+    """
+
+    def __init__(self, curves, maximize=False, instance_counts=1, n_grid=200):
+        """
+        :param curves: {training_job_name: (x_list, y_list)} as returned by TuningJob.metric_timeseries
+        :param maximize: True if larger metric values are better
+        :param instance_counts: an int, or {training_job_name: InstanceCount}
+        :param n_grid: number of evaluation points on the elapsed-time grid
+        """
+        curves = {name: xy for name, xy in curves.items() if len(xy[0]) > 0}
+        if not curves:
+            raise ValueError("No non-empty training curves to simulate")
+        self.job_names = sorted(curves)
+        self.n_jobs = len(self.job_names)
+        self.maximize = maximize
+        matrix = CurveMatrix(curves, n_grid=n_grid, hold=True)
+        self.end_seconds = matrix.last_x
+        self.final_value = matrix.last_value
+        if isinstance(instance_counts, dict):
+            self.instance_counts = np.array([instance_counts.get(name, 1) for name in self.job_names], dtype=float)
+        else:
+            self.instance_counts = np.full(self.n_jobs, float(instance_counts))
+
+        self.grid = matrix.grid
+        self.values = matrix.values
+        self.running = self.grid[None, :] <= self.end_seconds[:, None]
+
+        # Everything below is "lower is better"
+        scores = -self.values if maximize else self.values
+        has_value = ~np.isnan(scores)
+        best = np.minimum.accumulate(np.where(has_value, scores, np.inf), axis=1)
+        self.best_so_far = np.where(np.isinf(best), np.nan, best)
+        # Averages stop accumulating when a job ends, so completed jobs keep their final average
+        reported = has_value & self.running
+        counts = np.cumsum(reported, axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.running_average = np.cumsum(np.where(reported, scores, 0.0), axis=1) / counts
+        self.running_average[counts == 0] = np.nan
+
+    @classmethod
+    def from_tuning_job(cls, tuning_job, metric_name, **kwargs):
+        """Builds a simulator from every training job of a TuningJob.
+        The optimization direction is taken from the tuning job's objective.
+        """
+        curves = {name: tuning_job.metric_timeseries(metric_name, name)
+                  for name in tuning_job.training_job_names()}
+        if 'maximize' not in kwargs:
+            config = tuning_job.describe()['HyperParameterTuningJobConfig']
+            kwargs['maximize'] = config['HyperParameterTuningJobObjective']['Type'] == 'Maximize'
+        return cls(curves, **kwargs)
+
+    @classmethod
+    def from_training_curve_data(cls, training_curve_data, metric_name, **kwargs):
+        """Builds a simulator from a TrainingCurveData holding several training jobs
+        """
+        df = training_curve_data.df_for_metric(metric_name, minimal_columns=False)
+        curves = {}
+        for name, rows in df.sort_values('timestamp').groupby('training_job_name'):
+            curves[name] = (rows['timestamp'].values, rows['value'].values)
+        return cls(curves, **kwargs)
+
+    def stop_times(self, rule):
+        """Elapsed seconds at which each job would be stopped, NaN if never.
+        """
+        # Completed jobs still count as references for the rules, but can't be stopped
+        stop = rule.stop_matrix(self) & ~np.isnan(self.best_so_far)
+        stop &= self.grid[None, :] < self.end_seconds[:, None]
+        stopped = stop.any(axis=1)
+        first = stop.argmax(axis=1)
+        return np.where(stopped, self.grid[first], np.nan), first, stopped
+
+    def simulate(self, rule):
+        """Returns a SimulationResult for one rule
+        """
+        stop_seconds, stop_index, stopped = self.stop_times(rule)
+        reported = np.where(stopped, self.values[np.arange(self.n_jobs), stop_index], self.final_value)
+        saved = np.where(stopped, (self.end_seconds - stop_seconds) * self.instance_counts, 0.0)
+        jobs = pd.DataFrame({
+            'TrainingJobName': self.job_names,
+            'EndSeconds': self.end_seconds,
+            'StopSeconds': stop_seconds,
+            'Stopped': stopped,
+            'FinalValue': self.final_value,
+            'ReportedValue': reported,
+            'SavedInstanceSeconds': saved,
+        })
+        return SimulationResult(rule, jobs, self)
+
+    def compare(self, rules):
+        """Simulates several rules and returns one summary row per rule
+        """
+        return pd.DataFrame([self.simulate(rule).summary() for rule in rules])
+
+
+class SimulationResult(object):
+
+    def __init__(self, rule, jobs, sim):
+        self.rule = rule
+        self.jobs = jobs
+        self._sim = sim
+
+    def summary(self):
+        sim = self._sim
+        scores = -self.jobs['ReportedValue'].values if sim.maximize else self.jobs['ReportedValue'].values
+        true_scores = -sim.final_value if sim.maximize else sim.final_value
+        best = int(np.nanargmin(true_scores))
+        # Rank 1 means the eventual winner is still the winner under this rule
+        best_rank = int(np.sum(scores < scores[best])) + 1
+        total = float(np.sum(sim.end_seconds * sim.instance_counts))
+        saved = float(self.jobs['SavedInstanceSeconds'].sum())
+        out = {
+            'Rule': repr(self.rule),
+            'JobsStopped': int(self.jobs['Stopped'].sum()),
+            'TotalInstanceSeconds': total,
+            'SavedInstanceSeconds': saved,
+            'SavedFraction': saved / total if total > 0 else 0.0,
+            'BestTrainingJobName': sim.job_names[best],
+            'BestJobStopped': bool(self.jobs['Stopped'].values[best]),
+            'BestJobRank': best_rank,
+            'BestJobRankChange': best_rank - 1,
+        }
+        if out['BestJobStopped']:
+            logging.warning("%s would have stopped the best job %s" % (out['Rule'], out['BestTrainingJobName']))
+        return out
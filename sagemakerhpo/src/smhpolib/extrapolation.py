@@ -0,0 +1,209 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+
+"""
+Predicts where partial training curves will end up, so running jobs can be
+ranked or stopped before they finish.
+"""
+from __future__ import absolute_import
+
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from .curvematrix import CurveMatrix
+
+
+def _power_law_basis(u, params):
+    """x^-c for each c in params, as a (params x points) matrix.  y = a + b * x^-c
+    """
+    with np.errstate(divide='ignore'):
+        return np.where(u[None, :] > 0, u[None, :] ** -params[:, None], np.nan)
+
+
+def _exp_saturation_basis(u, params):
+    """exp(-k x) for each k in params.  y = a + b * exp(-k x)
+    """
+    return np.exp(-params[:, None] * u[None, :])
+
+
+class CurveExtrapolation(object):
+    """Fits every curve with a power law and an exponential saturation, and
+    predicts its value at the horizon with a confidence interval.
+
+    Both families are y = a + b * f(x) with one nonlinear parameter in f.
+    That parameter is taken from a fixed grid, and for each grid value a and b
+    have a closed-form least squares solution, so fitting all jobs is a few
+    (jobs x points) by (points x grid) matrix products.  The prediction averages
+    over both families and every grid value, weighted by how well each fits,
+    and its interval combines that spread with each fit's residual noise.
+
+    x is scaled so the horizon is 1.  Points at x <= 0 are left out of the fit.
+    """
+
+    MODELS = {
+        'power_law': (_power_law_basis, np.geomspace(0.02, 4.0, 40)),
+        'exp_saturation': (_exp_saturation_basis, np.geomspace(0.1, 50.0, 40)),
+    }
+    N_PARAMS = 3  # a, b and the nonlinear parameter
+
+    def __init__(self, curves, horizon=None, maximize=False, models=None, confidence=0.9, min_points=5,
+                 n_grid=100):
+        """
+        :param curves: {training_job_name: (x_list, y_list)} as returned by TuningJob.metric_timeseries
+        :param horizon: x the jobs run until, e.g. the number of epochs.  Default: the last x of any job.
+        :param maximize: True if larger metric values are better
+        :param models: names from MODELS to fit.  Default: all of them.
+        :param confidence: coverage of the lower/upper interval
+        :param min_points: jobs with fewer datapoints get NaN predictions
+        :param n_grid: number of points each curve is resampled to before fitting
+        """
+        self.maximize = maximize
+        self.confidence = confidence
+        self.min_points = min_points
+        self.models = sorted(models or self.MODELS)
+        matrix = CurveMatrix(curves, n_grid=n_grid, interpolation="linear")
+        self.job_names = matrix.job_names
+        self.n_jobs = matrix.n_jobs
+        self.last_x = matrix.last_x
+        self.last_value = matrix.last_value
+        if horizon is None:
+            horizon = np.nanmax(self.last_x) if np.any(~np.isnan(self.last_x)) else 1.0
+        self.horizon = float(horizon)
+
+        u = matrix.grid / self.horizon
+        weights = (matrix.mask & (u[None, :] > 0)).astype(float)
+        y = np.where(weights > 0, matrix.values, 0.0)
+        self.n_points = np.array([len(curves[name][0]) for name in self.job_names], dtype=int)
+
+        means = []
+        variances = []
+        log_likelihoods = []
+        self.model_names = []
+        for name in self.models:
+            basis_func, params = self.MODELS[name]
+            mean, variance, log_likelihood = self._fit(weights, y, u, basis_func, params)
+            means.append(mean)
+            variances.append(variance)
+            log_likelihoods.append(log_likelihood)
+            self.model_names.extend([name] * len(params))
+        means = np.concatenate(means, axis=1)
+        variances = np.concatenate(variances, axis=1)
+        log_likelihoods = np.concatenate(log_likelihoods, axis=1)
+
+        fitted = np.isfinite(log_likelihoods) & np.isfinite(means) & np.isfinite(variances)
+        enough = fitted.any(axis=1) & (self.n_points >= self.min_points)
+        log_likelihoods = np.where(fitted, log_likelihoods, -np.inf)
+        best = np.argmax(log_likelihoods, axis=1)
+        with np.errstate(invalid='ignore'):
+            w = np.exp(log_likelihoods - log_likelihoods[np.arange(self.n_jobs), best][:, None])
+            w /= w.sum(axis=1, keepdims=True)
+        w = np.where(fitted, w, 0.0)
+        means = np.where(fitted, means, 0.0)
+        variances = np.where(fitted, variances, 0.0)
+
+        self.predicted = np.where(enough, (w * means).sum(axis=1), np.nan)
+        second_moment = (w * (variances + means ** 2)).sum(axis=1)
+        self.std = np.where(enough, np.sqrt(np.maximum(second_moment - self.predicted ** 2, 0.0)), np.nan)
+        z = NormalDist().inv_cdf(0.5 + confidence / 2.0)
+        self.lower = self.predicted - z * self.std
+        self.upper = self.predicted + z * self.std
+        self.best_model = np.array([self.model_names[i] if ok else None for i, ok in zip(best, enough)],
+                                   dtype=object)
+
+    @classmethod
+    def from_tuning_job(cls, tuning_job, metric_name, training_job_names=None, **kwargs):
+        """Extrapolates a metric for the training jobs of a TuningJob, all of them by default.
+        The optimization direction is taken from the tuning job's objective.
+        """
+        names = training_job_names if training_job_names is not None else tuning_job.training_job_names()
+        curves = {name: tuning_job.metric_timeseries(metric_name, name) for name in names}
+        if 'maximize' not in kwargs:
+            config = tuning_job.describe()['HyperParameterTuningJobConfig']
+            kwargs['maximize'] = config['HyperParameterTuningJobObjective']['Type'] == 'Maximize'
+        return cls(curves, **kwargs)
+
+    def _fit(self, weights, y, u, basis_func, params):
+        """Weighted least squares of y = a + b * basis for every (job, param) at once.
+        Returns (prediction at the horizon, its variance, log likelihood), each (jobs x params).
+        """
+        basis = basis_func(u, params)
+        usable = np.all(np.isfinite(basis[:, weights.any(axis=0)]), axis=1)
+        basis = np.where(np.isfinite(basis), basis, 0.0)
+        wy = weights * y
+        s1 = weights.sum(axis=1)[:, None]
+        sy = wy.sum(axis=1)[:, None]
+        syy = (wy * y).sum(axis=1)[:, None]
+        sf = weights.dot(basis.T)
+        sff = weights.dot((basis ** 2).T)
+        sfy = wy.dot(basis.T)
+        at_horizon = basis_func(np.array([1.0]), params)[:, 0][None, :]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            det = s1 * sff - sf ** 2
+            b = (s1 * sfy - sy * sf) / det
+            a = (sy - b * sf) / s1
+            sse = np.maximum(syy - a * sy - b * sfy, 0.0)
+            dof = s1 - self.N_PARAMS
+            noise = sse / dof
+            # Var(a + b f(h)) from the fit, plus the noise of the value actually reported there
+            leverage = (sff - 2 * at_horizon * sf + at_horizon ** 2 * s1) / det
+            variance = noise * (leverage + 1.0)
+            log_likelihood = -0.5 * s1 * np.log(sse / s1 + 1e-12 * (1.0 + syy / s1))
+        # Relative to the scale of the curve, a determinant this small means the basis is flat
+        degenerate = ~(det > 1e-10 * s1 * sff) | (dof <= 0) | ~usable[None, :]
+        log_likelihood = np.where(degenerate, -np.inf, log_likelihood)
+        return a + b * at_horizon, variance, log_likelihood
+
+    def probability_better_than(self, target):
+        """Chance each job ends better than target, e.g. the best objective so far
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z = (self.predicted - target) / self.std
+        if not self.maximize:
+            z = -z
+        z = np.where(self.std > 0, z, np.where(z > 0, np.inf, -np.inf))
+        cdf = np.vectorize(NormalDist().cdf, otypes=[float])
+        return np.where(np.isnan(self.predicted), np.nan, cdf(z))
+
+    def should_stop(self, target, min_probability=0.05):
+        """True for jobs whose chance of beating target is below min_probability.
+        Jobs without a prediction are never stopped.
+        """
+        probability = self.probability_better_than(target)
+        with np.errstate(invalid='ignore'):
+            return np.where(np.isnan(probability), False, probability < min_probability)
+
+    def ranks(self):
+        """Rank of every job by predicted value, 1 being best.  NaN without a prediction.
+        """
+        scores = -self.predicted if self.maximize else self.predicted
+        ranks = pd.Series(scores).rank(method='min').values
+        return ranks
+
+    def predictions(self):
+        """One row per training job, best predicted first
+        """
+        df = pd.DataFrame({
+            'TrainingJobName': self.job_names,
+            'Points': self.n_points,
+            'LastX': self.last_x,
+            'LastValue': self.last_value,
+            'Predicted': self.predicted,
+            'Lower': self.lower,
+            'Upper': self.upper,
+            'Model': self.best_model,
+            'Rank': self.ranks(),
+        }, columns=['TrainingJobName', 'Points', 'LastX', 'LastValue', 'Predicted', 'Lower', 'Upper',
+                    'Model', 'Rank'])
+        return df.sort_values('Rank', na_position='last').reset_index(drop=True)
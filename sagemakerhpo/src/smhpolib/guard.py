@@ -0,0 +1,140 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+
+"""
+Stops a tuning job once its best objective stops improving, instead of
+letting it spend the rest of MaxNumberOfTrainingJobs.
+"""
+from __future__ import absolute_import
+
+import logging
+import time
+
+import numpy as np
+
+from .analysis import TuningJob
+
+
+def jobs_since_improvement(scores, min_delta=0.0, relative=False):
+    """Number of scores after the last one that beat the best before it by more than min_delta.
+    Higher scores are better.  With relative, min_delta is a fraction of the best's magnitude.
+    Returns (best score, jobs since it improved).
+    """
+    best = -np.inf
+    last = -1
+    for i, score in enumerate(scores):
+        delta = min_delta * abs(best) if (relative and np.isfinite(best)) else min_delta
+        if score > best + delta:
+            best = score
+            last = i
+    return best, len(scores) - 1 - last
+
+
+class PlateauGuard(object):
+    """Watches a tuning job and stops it when the running best objective plateaus.
+
+    Completed training jobs are taken in the order they ended.  Once `patience`
+    of them in a row have failed to beat the best so far by more than min_delta,
+    the tuning job is stopped.  With dry_run it only logs that it would have.
+    """
+
+    IN_PROGRESS = 'InProgress'
+
+    def __init__(self, tuning_job_name, patience=10, min_delta=0.0, relative=False, min_jobs=None,
+                 dry_run=False, poll_seconds=60, region_context=None, smhpo_client=None):
+        """
+        :param patience: completed jobs without improvement before stopping
+        :param min_delta: smallest change in the objective that counts as an improvement
+        :param relative: min_delta is a fraction of the best objective, e.g. 0.001 for 0.1%
+        :param min_jobs: completed jobs needed before stopping at all.  Default: patience + 1.
+        """
+        self.tuning_job_name = tuning_job_name
+        self.patience = patience
+        self.min_delta = min_delta
+        self.relative = relative
+        self.min_jobs = min_jobs if min_jobs is not None else patience + 1
+        self.dry_run = dry_run
+        self.poll_seconds = poll_seconds
+        self.region_context = region_context
+        self.smhpo_client = smhpo_client
+        self.decisions = []
+        self._tuning_job = None
+
+    def tuning_job(self):
+        """The TuningJob with the current summaries.  The same one on every call,
+        refreshed so only the training jobs that changed since the last poll are re-read.
+        """
+        if self._tuning_job is None:
+            self._tuning_job = TuningJob(self.tuning_job_name, smhpo_client=self.smhpo_client,
+                                         region_context=self.region_context)
+        else:
+            self._tuning_job.refresh()
+        return self._tuning_job
+
+    def evaluate(self, tuning_job):
+        """The guard's view of a tuning job, as a dict.  Doesn't stop anything.
+        """
+        description = tuning_job.describe()
+        maximize = description['HyperParameterTuningJobConfig']['HyperParameterTuningJobObjective']['Type'] == 'Maximize'
+        index = tuning_job.training_job_index()
+        finished = index.mask(status='Completed') & ~np.isnan(index.objective)
+        ended = np.where(np.isnan(index.end_time), index.creation_time, index.end_time)
+        order = np.nonzero(finished)[0]
+        order = order[np.argsort(ended[order], kind='stable')]
+        scores = index.objective[order] * (1.0 if maximize else -1.0)
+        best, since = jobs_since_improvement(scores, self.min_delta, self.relative)
+        status = description['HyperParameterTuningJobStatus']
+        plateaued = len(scores) >= self.min_jobs and since >= self.patience
+        return {
+            'TuningJobName': self.tuning_job_name,
+            'TuningJobStatus': status,
+            'TrainingJobs': len(index),
+            'CompletedJobs': len(scores),
+            'BestObjectiveValue': float(best if maximize else -best) if len(scores) else None,
+            'JobsSinceImprovement': since if len(scores) else 0,
+            'Plateaued': bool(plateaued),
+            'Stop': bool(plateaued and status == self.IN_PROGRESS),
+        }
+
+    def check(self):
+        """Evaluates the tuning job once, stops it if it has plateaued, and returns the decision
+        """
+        tuning_job = self.tuning_job()
+        decision = self.evaluate(tuning_job)
+        if decision['Stop']:
+            if self.dry_run:
+                decision['Action'] = 'WouldStop'
+            else:
+                tuning_job.stop()
+                decision['Action'] = 'Stopped'
+        elif decision['TuningJobStatus'] != self.IN_PROGRESS:
+            decision['Action'] = 'Finished'
+        else:
+            decision['Action'] = 'Continue'
+        logging.info("PlateauGuard %s" % decision)
+        print("%s [%s]: %d completed, best %s, %d since last improvement (patience %d) -> %s" %
+              (self.tuning_job_name, decision['TuningJobStatus'], decision['CompletedJobs'],
+               decision['BestObjectiveValue'], decision['JobsSinceImprovement'], self.patience,
+               decision['Action']))
+        self.decisions.append(decision)
+        return decision
+
+    def watch(self):
+        """Checks every poll_seconds until the tuning job finishes or is stopped.
+        A dry run keeps watching after it would have stopped the job.
+        Returns the last decision.
+        """
+        while True:
+            decision = self.check()
+            if decision['Action'] in ('Stopped', 'Finished'):
+                return decision
+            time.sleep(self.poll_seconds)
@@ -0,0 +1,183 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+
+"""
+Which hyperparameters mattered?  Fits a surrogate forest to the results
+of a tuning job and measures how much of the objective each
+hyperparameter explains.
+"""
+from __future__ import absolute_import
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from .jobrecord import LRUCache
+from .surrogate import HistogramForest, HyperparamEncoder
+
+
+class HyperparamImportance(object):
+    """Hyperparameter importances and marginal effect curves for one tuning job.
+
+    Two measures are reported per hyperparameter:
+      PermutationImportance: how much worse the surrogate fits the objective
+          when that hyperparameter's values are shuffled between jobs, as a
+          fraction of the objective's variance.
+      VarianceFraction: the fANOVA-style main effect, the variance of the
+          hyperparameter's marginal curve as a fraction of the variance of
+          the surrogate's predictions.  Whatever the fractions don't add up
+          to is explained by interactions.
+    Everything is computed on first use and kept.
+    """
+
+    CACHE_SIZE = 16
+    # {(region, tuning_job_name, objective, kwargs): (n_finished, HyperparamImportance)}
+    _cache = LRUCache(CACHE_SIZE)
+
+    def __init__(self, df, ranges, objective='FinalObjectiveValue', maximize=False, log_scale=None,
+                 forest=None, max_rows=5000, background_rows=256, seed=0):
+        """
+        :param df: hyperparam_dataframe() of a tuning job, or anything with the same columns
+        :param ranges: TuningJob.hyperparam_ranges()
+        :param objective: column of df to explain
+        :param forest: an unfitted HistogramForest, to change the surrogate's settings
+        :param max_rows: rows sampled for permutation importance
+        :param background_rows: rows averaged over for each point of a marginal curve
+        """
+        df = df[pd.to_numeric(df[objective], errors='coerce').notnull()]
+        if len(df) < 2:
+            raise ValueError("Need at least 2 training jobs with a %s, got %d" % (objective, len(df)))
+        self.objective = objective
+        self.maximize = maximize
+        self.encoder = HyperparamEncoder(ranges, log_scale=log_scale)
+        self.X = self.encoder.encode(df)
+        self.y = pd.to_numeric(df[objective]).values.astype(float)
+        self.forest = forest or HistogramForest(seed=seed)
+        logging.info("Fitting surrogate to %d training jobs" % len(self.y))
+        self.forest.fit(self.X, self.y)
+        self._rng = np.random.RandomState(seed)
+        self._max_rows = max_rows
+        self._background = self.X[self._sample(background_rows)]
+        self._marginals = {}
+        self._importances = None
+
+    @classmethod
+    def for_tuning_job(cls, tuning_job, objective='FinalObjectiveValue', **kwargs):
+        """Returns the analysis for a TuningJob, reusing an earlier one unless new
+        training jobs have finished since.
+        """
+        n_finished = int(np.sum(~np.isnan(tuning_job.training_job_index().objective)))
+        key = (tuning_job.region_context.region, tuning_job.tuning_job_name, objective, repr(sorted(kwargs.items())))
+        cached = cls._cache.get(key)
+        if cached is not None and cached[0] == n_finished:
+            return cached[1]
+        if 'maximize' not in kwargs:
+            config = tuning_job.describe()['HyperParameterTuningJobConfig']
+            kwargs['maximize'] = config['HyperParameterTuningJobObjective']['Type'] == 'Maximize'
+        df = tuning_job.hyperparam_dataframe(include_times=False)
+        analysis = cls(df, tuning_job.hyperparam_ranges(), objective=objective, **kwargs)
+        # Replaces the analysis from before the latest jobs finished
+        cls._cache.put(key, (n_finished, analysis))
+        return analysis
+
+    def _sample(self, n_rows):
+        if len(self.X) <= n_rows:
+            return np.arange(len(self.X))
+        return self._rng.choice(len(self.X), n_rows, replace=False)
+
+    def importances(self, repeats=3):
+        """One row per hyperparameter, most important first
+        """
+        if self._importances is None:
+            permutation = self.permutation_importance(repeats)
+            variance = self.variance_fractions()
+            out = pd.DataFrame({
+                'HyperParameter': list(self.encoder.groups),
+                'PermutationImportance': [permutation[name] for name in self.encoder.groups],
+                'VarianceFraction': [variance[name] for name in self.encoder.groups],
+            })
+            self._importances = out.sort_values('PermutationImportance', ascending=False).reset_index(drop=True)
+        return self._importances
+
+    def permutation_importance(self, repeats=3):
+        """{name: increase in the surrogate's squared error when the hyperparameter is
+        shuffled, divided by the variance of the objective}
+        """
+        rows = self._sample(self._max_rows)
+        B = self.forest.bin(self.X[rows])
+        y = self.y[rows]
+        variance = y.var()
+        baseline = np.mean((self.forest.predict_binned(B).mean(axis=0) - y) ** 2)
+        out = {}
+        for name, cols in self.encoder.groups.items():
+            increases = []
+            for _ in range(repeats):
+                shuffled = B.copy()
+                shuffled[:, cols] = B[self._rng.permutation(len(B))][:, cols]
+                error = np.mean((self.forest.predict_binned(shuffled).mean(axis=0) - y) ** 2)
+                increases.append(error - baseline)
+            out[name] = float(np.mean(increases) / variance) if variance > 0 else 0.0
+        return out
+
+    def variance_fractions(self):
+        """{name: variance of the marginal curve / variance of the predictions}
+        """
+        total = self.forest.predict(self.X[self._sample(self._max_rows)]).var()
+        out = {}
+        for name in self.encoder.groups:
+            curve = self.marginal(name)
+            mean = np.average(curve['Objective'], weights=curve['Fraction'])
+            main_effect = np.average((curve['Objective'] - mean) ** 2, weights=curve['Fraction'])
+            out[name] = float(main_effect / total) if total > 0 else 0.0
+        return out
+
+    def marginal(self, name):
+        """The marginal effect curve of one hyperparameter: the surrogate's prediction
+        averaged over the other hyperparameters of the recorded jobs, at each value.
+
+        Numeric hyperparameters are evaluated at the centers of the surrogate's bins,
+        categorical ones at each category.  Returns a DataFrame with the Value,
+        the predicted Objective, ObjectiveStd (spread between trees), and the
+        Fraction of recorded jobs at that value.
+        """
+        if name not in self._marginals:
+            self._marginals[name] = self._compute_marginal(name)
+        return self._marginals[name]
+
+    def _compute_marginal(self, name):
+        param = self.encoder.param(name)
+        cols = self.encoder.groups[name]
+        if param['Type'] == 'Categorical':
+            settings = np.eye(len(cols))
+            values = list(param['Values'])
+            fraction = self.X[:, cols].mean(axis=0)
+        else:
+            centers = self.forest.bin_centers[cols[0]]
+            present = ~np.isnan(centers)
+            settings = centers[present][:, None]
+            values = self.encoder.from_unit(name, centers[present])
+            counts = np.bincount(self.forest.bin(self.X)[:, cols[0]], minlength=len(centers))
+            fraction = counts[present] / float(counts.sum())
+        n_settings = len(settings)
+        n_background = len(self._background)
+        # Every (setting, background row) pair is predicted in a single batch
+        X = np.tile(self._background, (n_settings, 1))
+        X[:, cols] = np.repeat(settings, n_background, axis=0)
+        per_tree = self.forest.predict_binned(self.forest.bin(X))
+        per_tree = per_tree.reshape(self.forest.n_trees, n_settings, n_background).mean(axis=2)
+        return pd.DataFrame({
+            'Value': values,
+            'Objective': per_tree.mean(axis=0),
+            'ObjectiveStd': per_tree.std(axis=0),
+            'Fraction': fraction,
+        })
@@ -0,0 +1,415 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+
+"""
+Compact, column-oriented index of the training jobs of a tuning job.
+"""
+from __future__ import absolute_import
+
+import calendar
+import datetime
+import sys
+
+import numpy as np
+
+from .metrics import UTC
+
+_UTC = UTC()
+
+
+def to_epoch(value):
+    """datetime (naive ones are taken as UTC) or number -> epoch seconds.  None -> NaN
+    """
+    if value is None:
+        return np.nan
+    if isinstance(value, datetime.datetime):
+        return calendar.timegm(value.utctimetuple()) + value.microsecond / 1e6
+    return float(value)
+
+
+def _from_epoch(seconds):
+    if np.isnan(seconds):
+        return None
+    return datetime.datetime.fromtimestamp(seconds, _UTC)
+
+
+def _same(a, b):
+    """Equal, counting NaN as equal to NaN
+    """
+    return a == b or (np.isnan(a) and np.isnan(b))
+
+
+def _float_or_nan(value):
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+class TrainingJobIndex(object):
+    """Training job summaries stored as numpy columns instead of one dict per job.
+
+    Statuses are small integer codes, times are epoch seconds (NaN if unknown)
+    and every hyperparameter is a column of codes into that hyperparameter's
+    distinct values, so ten thousand jobs take a few hundred kB.  Names are
+    interned and mapped to row numbers.  Queries like mask() and top() work on
+    whole columns at once.  Full DescribeTrainingJob responses are only
+    fetched when describe() asks for one.
+
+    Fields the columns don't hold, like FailureReason, ObjectiveStatus or the
+    objective's Type, are kept per job in a dict shared by every job with the
+    same ones, so summary() gives back everything the listing returned.
+    """
+
+    STATUSES = ['Created', 'InProgress', 'Completed', 'Failed', 'Stopping', 'Stopped', 'Deleting']
+    TIME_FIELDS = {
+        'creation_time': ('CreationTime',),
+        'start_time': ('TrainingStartTime',),
+        'end_time': ('TrainingEndTime', 'TrainingJobEndTime'),
+    }
+    OBJECTIVE_FIELDS = ('FinalHyperParameterTuningJobObjectiveMetric', 'FinalTuningJobObjectiveMetric')
+    HYPERPARAMETER_FIELDS = ('TunedHyperParameters', 'HyperParameters')
+    OBJECTIVE_COLUMN_KEYS = ('MetricName', 'Value')
+    COLUMN_FIELDS = frozenset(('TrainingJobName', 'TrainingJobStatus', 'TrainingJobArn') +
+                              sum(TIME_FIELDS.values(), ()) + OBJECTIVE_FIELDS + HYPERPARAMETER_FIELDS)
+
+    def __init__(self, summaries=(), describe_fn=None):
+        """
+        :param summaries: TrainingJobSummaries from ListTrainingJobsForHyperParameterTuningJob
+        :param describe_fn: function(training_job_name) -> DescribeTrainingJob response.
+            Default: analysis.TrainingJobStatusFetcher.fetch
+        """
+        self.names = []
+        self._rows = {}
+        self.statuses = list(self.STATUSES)
+        self.status = np.zeros(0, dtype=np.uint8)
+        self.objective = np.zeros(0)
+        self.objective_metric_name = None
+        self.creation_time = np.zeros(0)
+        self.start_time = np.zeros(0)
+        self.end_time = np.zeros(0)
+        self.hyperparameter_names = []
+        self._hp_codes = np.zeros((0, 0), dtype=np.int32)
+        self._hp_values = {}  # {name: [distinct values]}
+        self._hp_lookup = {}  # {name: {value: code}}
+        self._arn_prefix = None
+        self._arns = None
+        self._extras = []  # per job, the summary fields the columns don't hold
+        self._extras_pool = {}  # {repr: extras}, so jobs with the same extras share one dict
+        self._field_names = {}  # {column: which of its alternative field names the summaries use}
+        self._describe_fn = describe_fn
+        self.add_summaries(summaries)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, training_job_name):
+        return training_job_name in self._rows
+
+    @property
+    def nbytes(self):
+        """Bytes used by the numpy columns
+        """
+        return sum(a.nbytes for a in (self.status, self.objective, self.creation_time,
+                                      self.start_time, self.end_time, self._hp_codes))
+
+    def add_summaries(self, summaries):
+        """Appends a page of TrainingJobSummaries.  Jobs already in the index are skipped.
+        """
+        summaries = [s for s in summaries if s['TrainingJobName'] not in self._rows]
+        if not summaries:
+            return
+        n_old = len(self.names)
+        n = len(summaries)
+        status = np.empty(n, dtype=np.uint8)
+        objective = np.full(n, np.nan)
+        times = {column: np.full(n, np.nan) for column in self.TIME_FIELDS}
+        hp_rows = []
+        for i, summary in enumerate(summaries):
+            name = sys.intern(str(summary['TrainingJobName']))
+            self._rows[name] = n_old + i
+            self.names.append(name)
+            self._add_arn(summary.get('TrainingJobArn'), name)
+            status[i] = self._status_code(summary['TrainingJobStatus'])
+            self._extras.append(self._extra_fields(summary))
+            for field in self.OBJECTIVE_FIELDS:
+                metric = summary.get(field)
+                if metric:
+                    objective[i] = metric['Value']
+                    self.objective_metric_name = metric.get('MetricName', self.objective_metric_name)
+                    self._field_names['objective'] = field
+                    break
+            for column, fields in self.TIME_FIELDS.items():
+                for field in fields:
+                    if summary.get(field) is not None:
+                        times[column][i] = to_epoch(summary[field])
+                        self._field_names[column] = field
+                        break
+            for field in self.HYPERPARAMETER_FIELDS:
+                if field in summary:
+                    hp_rows.append(summary[field])
+                    self._field_names['hyperparameters'] = field
+                    break
+            else:
+                hp_rows.append({})
+
+        self.status = np.concatenate([self.status, status])
+        self.objective = np.concatenate([self.objective, objective])
+        for column in self.TIME_FIELDS:
+            setattr(self, column, np.concatenate([getattr(self, column), times[column]]))
+        self._add_hyperparameters(hp_rows, n_old)
+
+    def update_summaries(self, summaries):
+        """Adds new jobs and overwrites the status, objective and times of known ones.
+        Hyperparameters of known jobs are left alone, since they never change.
+        Returns the names of the jobs that were added or changed.
+        """
+        changed = []
+        new = []
+        for summary in summaries:
+            name = summary['TrainingJobName']
+            i = self._rows.get(name)
+            if i is None:
+                new.append(summary)
+                continue
+            updated = False
+            extras = self._extra_fields(summary)
+            if extras is not self._extras[i]:
+                self._extras[i] = extras
+                updated = True
+            status = self._status_code(summary['TrainingJobStatus'])
+            if status != self.status[i]:
+                self.status[i] = status
+                updated = True
+            objective = np.nan
+            for field in self.OBJECTIVE_FIELDS:
+                metric = summary.get(field)
+                if metric:
+                    objective = float(metric['Value'])
+                    self.objective_metric_name = metric.get('MetricName', self.objective_metric_name)
+                    break
+            if not _same(objective, self.objective[i]):
+                self.objective[i] = objective
+                updated = True
+            for column, fields in self.TIME_FIELDS.items():
+                value = np.nan
+                for field in fields:
+                    if summary.get(field) is not None:
+                        value = to_epoch(summary[field])
+                        break
+                if not _same(value, getattr(self, column)[i]):
+                    getattr(self, column)[i] = value
+                    updated = True
+            if updated:
+                changed.append(self.names[i])
+        self.add_summaries(new)
+        changed.extend(self.names[len(self.names) - len(new):])
+        return changed
+
+    def _extra_fields(self, summary):
+        """The parts of a summary the columns don't hold, as a dict shared with other jobs
+        """
+        extras = {}
+        for key, value in summary.items():
+            if key not in self.COLUMN_FIELDS:
+                extras[key] = value
+            elif key in self.OBJECTIVE_FIELDS and value:
+                rest = {k: v for k, v in value.items() if k not in self.OBJECTIVE_COLUMN_KEYS}
+                if rest:
+                    extras[key] = rest
+        return self._extras_pool.setdefault(repr(sorted(extras.items())), extras)
+
+    def _status_code(self, status):
+        if status not in self.statuses:
+            self.statuses.append(status)
+        return self.statuses.index(status)
+
+    def _add_arn(self, arn, name):
+        # Every job's ARN is normally a shared prefix plus its name in lower case,
+        # so only the prefix is kept unless some job breaks the pattern.
+        if self._arns is None:
+            if arn is None:
+                return
+            if self._arn_prefix is None and arn.endswith(name.lower()):
+                self._arn_prefix = arn[:-len(name)]
+            if self._arn_prefix is not None and arn == self._arn_prefix + name.lower():
+                return
+            self._arns = [self.arn(other) for other in self.names[:-1]]
+        self._arns.append(arn)
+
+    def _add_hyperparameters(self, hp_rows, n_old):
+        for hp in hp_rows:
+            for name in hp:
+                if name not in self._hp_values:
+                    self.hyperparameter_names.append(name)
+                    self._hp_values[name] = []
+                    self._hp_lookup[name] = {}
+        codes = np.full((n_old + len(hp_rows), len(self.hyperparameter_names)), -1, dtype=np.int32)
+        codes[:n_old, :self._hp_codes.shape[1]] = self._hp_codes
+        for j, name in enumerate(self.hyperparameter_names):
+            lookup = self._hp_lookup[name]
+            values = self._hp_values[name]
+            for i, hp in enumerate(hp_rows):
+                value = hp.get(name)
+                if value is None:
+                    continue
+                code = lookup.get(value)
+                if code is None:
+                    code = lookup[value] = len(values)
+                    values.append(value)
+                codes[n_old + i, j] = code
+        self._hp_codes = codes
+
+    def row(self, training_job_name):
+        return self._rows[training_job_name]
+
+    def arn(self, training_job_name):
+        if self._arns is not None:
+            return self._arns[self._rows[training_job_name]]
+        if self._arn_prefix is None:
+            return None
+        return self._arn_prefix + training_job_name.lower()
+
+    def hyperparameter(self, name, numeric=True):
+        """One hyperparameter for every job: floats (NaN where missing or not a number),
+        or with numeric=False an object array of the original strings (None where missing).
+        """
+        codes = self._hp_codes[:, self.hyperparameter_names.index(name)]
+        if numeric:
+            table = np.array([_float_or_nan(v) for v in self._hp_values[name]] + [np.nan])
+        else:
+            table = np.array(list(self._hp_values[name]) + [None], dtype=object)
+        # Code -1 (missing) picks the last entry
+        return table[codes]
+
+    def status_codes(self, statuses):
+        if isinstance(statuses, str):
+            statuses = [statuses]
+        return [self.statuses.index(s) for s in statuses if s in self.statuses]
+
+    def mask(self, status=None, objective_min=None, objective_max=None,
+             created_after=None, created_before=None, ended_after=None, ended_before=None):
+        """Boolean array of the jobs matching every given condition.
+        :param status: a status or list of statuses
+        Times are datetimes or epoch seconds.  Jobs missing a value never match a condition on it.
+        """
+        out = np.ones(len(self.names), dtype=bool)
+        if status is not None:
+            out &= np.isin(self.status, self.status_codes(status))
+        with np.errstate(invalid='ignore'):
+            if objective_min is not None:
+                out &= self.objective >= objective_min
+            if objective_max is not None:
+                out &= self.objective <= objective_max
+            if created_after is not None:
+                out &= self.creation_time >= to_epoch(created_after)
+            if created_before is not None:
+                out &= self.creation_time < to_epoch(created_before)
+            if ended_after is not None:
+                out &= self.end_time >= to_epoch(ended_after)
+            if ended_before is not None:
+                out &= self.end_time < to_epoch(ended_before)
+        return out
+
+    def select(self, **conditions):
+        """Names of the jobs matching mask(**conditions)
+        """
+        return [self.names[i] for i in np.nonzero(self.mask(**conditions))[0]]
+
+    def top(self, n=10, maximize=False, **conditions):
+        """Names of the n jobs with the best objective, best first
+        """
+        mask = self.mask(**conditions) & ~np.isnan(self.objective)
+        rows = np.nonzero(mask)[0]
+        scores = self.objective[rows]
+        order = np.argsort(-scores if maximize else scores, kind='stable')[:n]
+        return [self.names[i] for i in rows[order]]
+
+    def status_counts(self):
+        counts = np.bincount(self.status, minlength=len(self.statuses))
+        return {s: int(c) for s, c in zip(self.statuses, counts) if c > 0}
+
+    def elapsed_seconds(self):
+        """End time minus start time (or creation time if the start is unknown), NaN if not ended
+        """
+        start = np.where(np.isnan(self.start_time), self.creation_time, self.start_time)
+        return self.end_time - start
+
+    def summary(self, training_job_name):
+        """Rebuilds the TrainingJobSummary dict of one job, with every field it was listed with
+        """
+        i = self._rows[training_job_name]
+        out = {
+            'TrainingJobName': training_job_name,
+            'TrainingJobStatus': self.statuses[self.status[i]],
+        }
+        arn = self.arn(training_job_name)
+        if arn is not None:
+            out['TrainingJobArn'] = arn
+        for column, fields in self.TIME_FIELDS.items():
+            value = _from_epoch(getattr(self, column)[i])
+            if value is not None:
+                out[self._field_names.get(column, fields[0])] = value
+        if not np.isnan(self.objective[i]):
+            out[self._field_names.get('objective', self.OBJECTIVE_FIELDS[0])] = {
+                'MetricName': self.objective_metric_name, 'Value': float(self.objective[i])}
+        codes = self._hp_codes[i]
+        out[self._field_names.get('hyperparameters', self.HYPERPARAMETER_FIELDS[0])] = {
+            name: self._hp_values[name][code] for name, code in zip(self.hyperparameter_names, codes)
+            if code >= 0}
+        for key, value in self._extras[i].items():
+            if isinstance(value, dict) and isinstance(out.get(key), dict):
+                out[key] = dict(out[key], **value)
+            else:
+                out[key] = value
+        return out
+
+    def summaries(self, names=None):
+        """Rebuilt TrainingJobSummary dicts, built on each call rather than stored
+        """
+        return [self.summary(name) for name in (self.names if names is None else names)]
+
+    def describe(self, training_job_name):
+        """The DescribeTrainingJob response for one job, fetched on first use.
+        By default a jobrecord.TrainingJobRecord with the fields smhpolib reads.
+        """
+        if training_job_name not in self._rows:
+            raise KeyError(training_job_name)
+        if self._describe_fn is None:
+            from .analysis import TrainingJobStatusFetcher
+            self._describe_fn = TrainingJobStatusFetcher.fetch
+        return self._describe_fn(training_job_name)
+
+    def dataframe(self, rows=None):
+        """The index as a DataFrame with hyperparam_dataframe's column names
+        """
+        import pandas as pd
+        rows = slice(None) if rows is None else rows
+        df = pd.DataFrame({
+            'TrainingJobName': np.array(self.names, dtype=object)[rows],
+            'TrainingJobStatus': np.array(self.statuses, dtype=object)[self.status[rows]],
+            'FinalObjectiveValue': self.objective[rows],
+            'TrainingCreationTime': pd.to_datetime(self.creation_time[rows], unit='s', utc=True),
+            'TrainingStartTime': pd.to_datetime(self.start_time[rows], unit='s', utc=True),
+            'TrainingEndTime': pd.to_datetime(self.end_time[rows], unit='s', utc=True),
+            'TrainingElapsedTimeSeconds': self.elapsed_seconds()[rows],
+        })
+        for name in self.hyperparameter_names:
+            numeric = self.hyperparameter(name)[rows]
+            original = self.hyperparameter(name, numeric=False)[rows]
+            not_numbers = np.isnan(numeric) & np.not_equal(original, None)
+            # Same convention as hyperparam_dataframe: floats where possible
+            if not_numbers.any():
+                df[name] = np.where(not_numbers, original, numeric)
+            else:
+                df[name] = numeric
+        return df
@@ -0,0 +1,128 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+
+"""
+Compact records of DescribeTrainingJob responses, for caching many of them.
+"""
+from __future__ import absolute_import
+
+from collections import OrderedDict
+import sys
+import threading
+
+
+class TrainingJobRecord(object):
+    """The fields of a DescribeTrainingJob response that smhpolib reads.
+
+    Behaves like the response dict for those fields: record['TrainingEndTime'],
+    record.get('BillableTimeInSeconds') and `in` work, and fields missing from
+    the response raise KeyError just like the dict did.  Nested structures are
+    cut down too: ResourceConfig keeps the instance settings and
+    AlgorithmSpecification only its MetricDefinitions.
+    """
+
+    FIELDS = (
+        'TrainingJobName',
+        'TrainingJobStatus',
+        'SecondaryStatus',
+        'FailureReason',
+        'TuningJobArn',
+        'HyperParameters',
+        'CreationTime',
+        'TrainingStartTime',
+        'TrainingEndTime',
+        'LastModifiedTime',
+        'BillableTimeInSeconds',
+        'FinalMetricDataList',
+        'ResourceConfig',
+        'AlgorithmSpecification',
+    )
+    RESOURCE_CONFIG_FIELDS = ('InstanceType', 'InstanceCount', 'VolumeSizeInGB')
+
+    __slots__ = FIELDS
+
+    def __init__(self, response):
+        for field in self.FIELDS:
+            setattr(self, field, response.get(field))
+        # Every job of a tuning job has the same hyperparameter names, so share the strings
+        if self.HyperParameters is not None:
+            self.HyperParameters = {sys.intern(str(k)): v for k, v in self.HyperParameters.items()}
+        if self.ResourceConfig is not None:
+            self.ResourceConfig = {k: self.ResourceConfig[k] for k in self.RESOURCE_CONFIG_FIELDS
+                                   if k in self.ResourceConfig}
+        if self.AlgorithmSpecification is not None:
+            definitions = self.AlgorithmSpecification.get('MetricDefinitions')
+            self.AlgorithmSpecification = {'MetricDefinitions': definitions} if definitions else {}
+
+    def __getitem__(self, key):
+        value = getattr(self, key, None) if key in self.FIELDS else None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def keys(self):
+        return [field for field in self.FIELDS if getattr(self, field) is not None]
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.keys()}
+
+    def __repr__(self):
+        return "TrainingJobRecord(%s, %s)" % (self.TrainingJobName, self.TrainingJobStatus)
+
+
+class LRUCache(object):
+    """A dict-like cache holding at most max_size items, dropping the least recently used.
+    Safe to share between threads.
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._items.pop(key, default)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
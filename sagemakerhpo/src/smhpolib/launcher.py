@@ -20,14 +20,18 @@ import boto3
 import botocore
 import datetime
 import json
-import os
 from string import Template
 import sys
 import time
 import traceback
 import uuid
 
+from smhpolib.channels import InputChannel, INPUT_MODES, input_data_config
 from smhpolib.client import get_smhpo_client
+from smhpolib.regexlint import MetricRegexLinter, read_sample_log
+from smhpolib.region import get_region_context
+from smhpolib.sweep import SweepLauncher
+from smhpolib.validation import RequestValidator
 
 
 class BaseLauncher(object):
@@ -37,6 +41,18 @@ class BaseLauncher(object):
 
     INSTANCE_COUNT = 1
 
+    # "File" downloads every channel before training starts. "Pipe" streams it to the container.
+    TRAINING_INPUT_MODE = "File"
+
+    # Per-channel InputChannel options applied on top of get_input_channels(), e.g.
+    # {"train": {"distribution": "ShardedByS3Key", "compression": "Gzip", "content_type": "text/csv"}}
+    INPUT_CHANNEL_OPTIONS = {}
+
+    # Constraints on top of the service model, checked before launching
+    VALIDATION_SHAPE_OVERRIDES = {
+        "TuningJobName": {"max": 26},
+    }
+
     def __init__(self):
         self.hyperparam_ranges = None  # Can set explicitly instead of loading from file.
         self.opts = self.default_opts()
@@ -47,30 +63,101 @@ class BaseLauncher(object):
         Parses options from sys.argv, creates a request, and launches unless --dry-run
         """
         self.opts = self.get_parser().parse_args()  # Parse from command-line args
-        if self.opts.aws_region:
-            os.environ["AWS_REGION"] = self.opts.aws_region
+        if self.opts.sweep_file:
+            return self.sweep()
         self.create_tuning_job_request()
         if self.opts.verbose:
             print("Request JSON:\n%s" % json.dumps(self.request_json, indent=2, sort_keys=True))
 
         if self.opts.dryrun:
+            errors = self.validate_request(self.request_json)
+            for error in errors:
+                print("Validation error: %s" % error)
+            self.lint_metric_definitions(self.opts.sample_log)
             print("Dry run only.  Not actually launching.")
         else:
             self.launch_tuning_job()
 
+    def sweep(self):
+        """Builds one request per combination in --sweep_file, and launches
+        them all concurrently unless --dryrun
+        """
+        sweep = SweepLauncher.from_file(self, self.opts.sweep_file,
+                                        manifest_file=self.opts.sweep_manifest,
+                                        max_in_flight=self.opts.max_in_flight)
+        entries = sweep.build()
+        for entry in entries:
+            print("%s [%s]: %s" % (entry['TuningJobName'], entry['Status'], json.dumps(entry['Overrides'], sort_keys=True)))
+            if self.opts.verbose:
+                print("Request JSON:\n%s" % json.dumps(entry['Request'], indent=2, sort_keys=True))
+
+        if self.opts.dryrun:
+            print("Dry run only.  Not actually launching %d tuning jobs." % len(entries))
+        else:
+            sweep.run()
+        return sweep
+
+    def request_validator(self):
+        """Offline validator for CreateTuningJob, compiled from the bundled service model
+        """
+        return RequestValidator.for_operation("CreateTuningJob",
+                                              ignore_required=["AwsAccountId"],  # Filled in by SmhpoClient
+                                              shape_overrides=self.VALIDATION_SHAPE_OVERRIDES)
+
+    def validate_request(self, request_json):
+        """Returns a list of problems with the request.  Empty if it's ready to be sent
+        """
+        errors = []
+        if 'UNSET_PARAMETER_WARNING' in json.dumps(request_json):
+            errors.append("CreateTuningJob request contains unset parameters")
+        errors.extend(self.request_validator().validate(request_json))
+        metric_definitions = request_json.get('TrainingJobDefinition', {}) \
+            .get('AlgorithmSpecification', {}).get('MetricDefinitions')
+        if metric_definitions:
+            errors.extend(MetricRegexLinter(metric_definitions).errors())
+        return errors
+
+    def lint_metric_definitions(self, sample_log=None):
+        """Prints warnings about MetricDefinitions that backtrack badly or match the wrong text.
+        With a sample training log, also prints what each regex costs per line.
+        Returns the warnings.
+        """
+        linter = MetricRegexLinter.from_launcher(self)
+        lines = read_sample_log(sample_log) if sample_log else None
+        warnings = linter.static_warnings()
+        if lines is not None:
+            benchmark = linter.benchmark(lines)
+            print("MetricDefinitions over %d lines of %s:\n%s" %
+                  (len(lines), sample_log, benchmark.to_string(index=False)))
+            warnings.extend(linter.sample_warnings(lines, benchmark))
+        for warning in warnings:
+            print("Metric definition warning: %s" % warning)
+        return warnings
+
+    def check_request(self, request_json):
+        """Raises ValueError if the request isn't ready to be sent
+        """
+        errors = self.validate_request(request_json)
+        if errors:
+            raise ValueError("Invalid CreateTuningJob request %s:\n  %s" %
+                             (request_json.get('TuningJobName'), "\n  ".join(errors)))
+
     def launch_tuning_job(self):
         if not self.request_json:
             self.create_tuning_job_request()
-        request_json = self.request_json
-        if 'UNSET_PARAMETER_WARNING' in json.dumps(request_json):
-            raise ValueError("CreateTuningJob request contains unset parameters: %s" % request_json)
-        smhpo = get_smhpo_client()
+        self.check_request(self.request_json)
+        smhpo = get_smhpo_client(self.get_region_context())
         response = smhpo.create_tuning_job(**self.request_json)
         print("Response: %s" % json.dumps(response, indent=2, sort_keys=True))
         print("Created Tuning job named %s" % self.request_json['TuningJobName'])
         print("Timestamp: %s" % str(datetime.datetime.now()))
         return response
 
+    def get_region_context(self):
+        """region.RegionContext for --aws-region, or the default region
+        """
+        return get_region_context(self.opts.aws_region)
+
     def get_jobname(self):
         name = self.opts.jobname
         if name is None:
@@ -128,6 +215,22 @@ class BaseLauncher(object):
                             help="AWS region",
                             type=str,
                             required=False)
+        parser.add_argument("-sl", "--sample-log",
+                            help="Training log to check MetricDefinitions against in a --dryrun",
+                            default=None,
+                            type=str)
+        parser.add_argument("-sw", "--sweep_file",
+                            help="JSON file with a matrix of overrides.  Launches one tuning job per combination",
+                            default=None,
+                            type=str)
+        parser.add_argument("-sm", "--sweep_manifest",
+                            help="Manifest file recording sweep progress.  Re-run with it to resume",
+                            default=None,
+                            type=str)
+        parser.add_argument("-mif", "--max_in_flight",
+                            help="Maximum number of concurrent CreateTuningJob submissions in a sweep",
+                            default=SweepLauncher.DEFAULT_MAX_IN_FLIGHT,
+                            type=int)
         return parser
 
     def default_opts(self):
@@ -202,7 +305,7 @@ class BaseLauncher(object):
             },
             "AlgorithmSpecification": {
                 "TrainingImage": self.get_ecr_image(),
-                "TrainingInputMode": "File",
+                "TrainingInputMode": self.get_training_input_mode(),
                 "MetricDefinitions": self.clean_metric_definitions(self.get_metric_definitions()),
             },
             "InputDataConfig": self.get_input_data_config(),
@@ -218,21 +321,27 @@ class BaseLauncher(object):
         """
         return self.get_static_hyperparmaeters_from_ranges_files()
 
-    def get_input_data_config(self):
+    def get_training_input_mode(self):
+        if self.TRAINING_INPUT_MODE not in INPUT_MODES:
+            raise ValueError("TRAINING_INPUT_MODE must be one of %s" % (INPUT_MODES,))
+        return self.TRAINING_INPUT_MODE
+
+    def get_input_channels(self):
+        """Returns a list of InputChannel objects.  Override this to add channels,
+        or to shard / compress them.
+        """
         return [
-            {
-                "ChannelName": "all",
-                "CompressionType": "None",
-                "DataSource": {
-                    "S3DataSource": {
-                        "S3Uri": self.opts.input_data_url,
-                        "S3DataType": "S3Prefix",
-                        "S3DataDistributionType": "FullyReplicated"
-                    }
-                },
-            }
+            InputChannel("all", self.opts.input_data_url),
         ]
 
+    def get_input_data_config(self):
+        channels = self.get_input_channels()
+        unknown = set(self.INPUT_CHANNEL_OPTIONS) - set(c.name for c in channels)
+        if unknown:
+            raise ValueError("INPUT_CHANNEL_OPTIONS has options for unknown channels %s" % sorted(unknown))
+        channels = [c.with_options(**self.INPUT_CHANNEL_OPTIONS.get(c.name, {})) for c in channels]
+        return input_data_config(channels)
+
     def correct_instance_type(self, request):
         """Make sure the instance type is prefixed with "ml."
         """
@@ -371,7 +480,8 @@ class XGBoostLauncher(BaseLauncher):
 
     def get_ecr_image(self):
         # The location of your Docker image with your algorithm
-        return self.REGION_TO_ECR_IMAGE_MAP[os.getenv("AWS_REGION")] if os.getenv("AWS_REGION") in self.REGION_TO_ECR_IMAGE_MAP else self.REGION_TO_ECR_IMAGE_MAP[self.DEFAULT_REGION]
+        region = self.get_region_context().region
+        return self.REGION_TO_ECR_IMAGE_MAP[region] if region in self.REGION_TO_ECR_IMAGE_MAP else self.REGION_TO_ECR_IMAGE_MAP[self.DEFAULT_REGION]
 
     def get_metric_definitions(self):
         return [
@@ -385,32 +495,10 @@ class XGBoostLauncher(BaseLauncher):
             }
         ]
 
-    def get_input_data_config(self):
+    def get_input_channels(self):
         return [
-            {
-                "ChannelName": "train",
-                "CompressionType": "None",
-                "ContentType": "csv",
-                "DataSource": {
-                    "S3DataSource": {
-                        "S3Uri": self.opts.input_data_url + "train/",
-                        "S3DataType": "S3Prefix",
-                        "S3DataDistributionType": "FullyReplicated"
-                    }
-                },
-            },
-            {
-                "ChannelName": "validation",
-                "CompressionType": "None",
-                "ContentType": "csv",
-                "DataSource": {
-                    "S3DataSource": {
-                        "S3Uri": self.opts.input_data_url + "val/",
-                        "S3DataType": "S3Prefix",
-                        "S3DataDistributionType": "FullyReplicated"
-                    }
-                },
-            }
+            InputChannel("train", self.opts.input_data_url + "train/", content_type="csv"),
+            InputChannel("validation", self.opts.input_data_url + "val/", content_type="csv"),
         ]
 
     def get_static_hyperparameters(self):
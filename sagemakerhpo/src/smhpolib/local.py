@@ -0,0 +1,302 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+
+"""
+Runs a tuning job on this machine: each training job is a local process
+with its own copy of the /opt/ml layout SageMaker gives a container.
+"""
+from __future__ import absolute_import
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import datetime
+import json
+import logging
+import math
+import multiprocessing
+import os
+import subprocess
+
+import numpy as np
+import pandas as pd
+
+from .logscan import MetricLogScanner
+from .metrics import UTC
+from .surrogate import HistogramForest, HyperparamEncoder
+from .util import ranges_by_name
+
+# Training code reads its /opt/ml paths relative to this, if it's set
+BASE_PATH_ENV = "SAGEMAKER_BASE_PATH"
+
+
+def _normal_cdf(z):
+    return 0.5 * (1.0 + np.vectorize(math.erf)(z / math.sqrt(2.0)))
+
+
+def _normal_pdf(z):
+    return np.exp(-0.5 * z * z) / math.sqrt(2.0 * math.pi)
+
+
+def expected_improvement(mean, std, best, xi=0.0):
+    """Expected amount by which each candidate beats `best`, for scores where higher is better
+    """
+    std = np.maximum(std, 1e-12)
+    improvement = mean - best - xi
+    z = improvement / std
+    return improvement * _normal_cdf(z) + std * _normal_pdf(z)
+
+
+class LocalTuner(object):
+    """Local stand-in for a tuning job, built from the same CreateTuningJob request.
+
+    Every training job gets a directory under work_dir laid out like /opt/ml,
+    with input/config/{hyperparameters,resourceconfig,inputdataconfig}.json,
+    input/data/<channel> linked to a local directory, model/ and output/.
+    `command` runs there with $SAGEMAKER_BASE_PATH pointing at it, and its
+    output goes to training.log, which is scanned with the request's
+    MetricDefinitions when it exits.  Up to max_parallel jobs run at once.
+
+    Strategy "Random" samples every job independently.  "Bayesian" does that for
+    the first n_initial jobs, then fits a surrogate forest to the results and
+    launches the candidate with the highest expected improvement, using the
+    spread between trees as the uncertainty.  Jobs still running count as having
+    scored the surrogate's prediction, so parallel jobs don't all pick one point.
+    """
+
+    STRATEGIES = ("Random", "Bayesian")
+    DEFAULT_CANDIDATES = 2000
+    HOST = "algo-1"
+
+    def __init__(self, request, command, work_dir, channel_dirs=None, cwd=None, max_parallel=None,
+                 max_jobs=None, strategy=None, n_initial=None, n_candidates=DEFAULT_CANDIDATES, seed=0):
+        """
+        :param request: CreateTuningJob request, e.g. from BaseLauncher.create_tuning_job_request()
+        :param command: the training entry point, e.g. ["python", "-m", "trainer.start"]
+        :param work_dir: where each training job's directory is created
+        :param channel_dirs: {channel: local directory} standing in for the S3 channels
+        :param cwd: directory to run the command in
+        :param max_parallel: number of jobs run at once.  Default: one per CPU.
+        :param max_jobs: total jobs.  Default: the request's MaxNumberOfTrainingJobs.
+        :param strategy: "Random" or "Bayesian".  Default: the request's Strategy.
+        :param n_initial: random jobs before the Bayesian strategy starts.  Default: max_parallel, at least 5.
+        """
+        config = request['TuningJobConfig']
+        definition = request['TrainingJobDefinition']
+        self.tuning_job_name = request['TuningJobName']
+        self.command = list(command)
+        self.work_dir = os.path.abspath(work_dir)
+        self.cwd = cwd
+        self.channel_dirs = channel_dirs or {}
+        self.ranges = ranges_by_name(config['ParameterRanges'])
+        self.static_hyperparameters = dict(definition.get('StaticHyperParameters', {}))
+        self.objective_metric = config['TuningJobObjective']['MetricName']
+        self.maximize = config['TuningJobObjective']['Type'] == 'Maximize'
+        algorithm = definition['AlgorithmSpecification']
+        self.metric_definitions = algorithm['MetricDefinitions']
+        self.metric_names = [md['Name'] for md in self.metric_definitions]
+        if self.objective_metric not in self.metric_names:
+            raise ValueError("Objective metric %s has no MetricDefinition" % self.objective_metric)
+        self.input_data_config = {}
+        for channel in definition.get('InputDataConfig', []):
+            settings = {'TrainingInputMode': 'File'}
+            if 'ContentType' in channel:
+                settings['ContentType'] = channel['ContentType']
+            self.input_data_config[channel['ChannelName']] = settings
+        if algorithm.get('TrainingInputMode', 'File') != 'File':
+            logging.warning("Local training jobs read their channels in File mode, not %s" %
+                            algorithm['TrainingInputMode'])
+        self.max_runtime = definition.get('StoppingCondition', {}).get('MaxRuntimeInSeconds')
+        self.max_parallel = max_parallel or multiprocessing.cpu_count()
+        self.max_jobs = max_jobs or config['ResourceLimits']['MaxNumberOfTrainingJobs']
+        self.strategy = strategy or config.get('Strategy', 'Bayesian')
+        if self.strategy not in self.STRATEGIES:
+            raise ValueError("strategy must be one of %s, not '%s'" % (self.STRATEGIES, self.strategy))
+        self.n_initial = n_initial or max(self.max_parallel, 5)
+        self.n_candidates = n_candidates
+        self.encoder = HyperparamEncoder(self.ranges)
+        self._rng = np.random.RandomState(seed)
+        self._seed = seed
+        self.results = []  # one dict per finished job, in the order they finished
+        self._timeseries = {}  # {training_job_name: {metric: (x, y)}}
+
+    @classmethod
+    def from_launcher(cls, launcher, command, work_dir, **kwargs):
+        """Tuner for the request a BaseLauncher would send, with its ranges file,
+        static hyperparameters, objective and metric definitions
+        """
+        return cls(launcher.create_tuning_job_request(), command, work_dir, **kwargs)
+
+    def hyperparam_ranges(self):
+        """{name: range}, like TuningJob.hyperparam_ranges
+        """
+        return dict(self.ranges)
+
+    def run(self):
+        """Runs all the training jobs and returns hyperparam_dataframe()
+        """
+        launched = 0
+        pending = {}  # future: encoded hyperparameters
+        print("Running %d training jobs of %s locally, %d at a time, %s strategy" %
+              (self.max_jobs, self.tuning_job_name, self.max_parallel, self.strategy))
+        with ThreadPoolExecutor(max_workers=self.max_parallel) as executor:
+            while launched < self.max_jobs or pending:
+                while launched < self.max_jobs and len(pending) < self.max_parallel:
+                    x = self._propose(list(pending.values()))
+                    name = "%s-%03d" % (self.tuning_job_name, launched + 1)
+                    hyperparameters = self.encoder.decode(x).iloc[0].to_dict()
+                    pending[executor.submit(self._run_training_job, name, hyperparameters)] = x
+                    launched += 1
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in done:
+                    del pending[future]
+                    result = future.result()
+                    self.results.append(result)
+                    print("  %d) %s %s %s=%s" % (len(self.results), result['TrainingJobName'],
+                                                 result['TrainingJobStatus'], self.objective_metric,
+                                                 result['FinalObjectiveValue']))
+        return self.hyperparam_dataframe()
+
+    def _propose(self, pending):
+        """Encoded hyperparameters for the next job
+        """
+        finished = [r for r in self.results if r['FinalObjectiveValue'] is not None]
+        if self.strategy == 'Random' or len(finished) < self.n_initial:
+            return self.encoder.sample(1, self._rng)
+        X = self.encoder.encode(pd.DataFrame([r['HyperParameters'] for r in finished]))
+        sign = 1.0 if self.maximize else -1.0
+        y = sign * np.array([r['FinalObjectiveValue'] for r in finished], dtype=float)
+        forest = HistogramForest(seed=self._seed + len(self.results))
+        forest.fit(X, y)
+        if pending:
+            P = np.vstack(pending)
+            believed = forest.predict(P)
+            forest = HistogramForest(seed=self._seed + len(self.results))
+            forest.fit(np.vstack([X, P]), np.concatenate([y, believed]))
+        candidates = self.encoder.sample(self.n_candidates, self._rng)
+        mean, std = forest.predict(candidates, return_std=True)
+        ei = expected_improvement(mean, std, y.max())
+        return candidates[int(np.argmax(ei))][None, :]
+
+    def _hyperparameter_strings(self, hyperparameters):
+        """hyperparameters.json values are all strings, as SageMaker writes them
+        """
+        out = {k: str(v) for k, v in self.static_hyperparameters.items()}
+        for name, value in hyperparameters.items():
+            param = self.encoder.param(name)
+            if param['Type'] == 'Integer':
+                out[name] = str(int(value))
+            elif param['Type'] == 'Continuous':
+                out[name] = repr(float(value))
+            else:
+                out[name] = str(value)
+        return out
+
+    def _prepare(self, base, hyperparameters):
+        config_dir = os.path.join(base, "input", "config")
+        data_dir = os.path.join(base, "input", "data")
+        for path in (config_dir, data_dir, os.path.join(base, "model"), os.path.join(base, "output", "data")):
+            os.makedirs(path, exist_ok=True)
+        files = {
+            "hyperparameters.json": self._hyperparameter_strings(hyperparameters),
+            "resourceconfig.json": {"current_host": self.HOST, "hosts": [self.HOST]},
+            "inputdataconfig.json": self.input_data_config,
+        }
+        for filename, content in files.items():
+            with open(os.path.join(config_dir, filename), "w") as fh:
+                json.dump(content, fh, indent=2, sort_keys=True)
+        for channel in self.input_data_config:
+            link = os.path.join(data_dir, channel)
+            if channel not in self.channel_dirs:
+                logging.warning("No local directory for channel %s, it will be empty" % channel)
+                os.makedirs(link, exist_ok=True)
+            elif not os.path.lexists(link):
+                os.symlink(os.path.abspath(self.channel_dirs[channel]), link)
+
+    def _run_training_job(self, training_job_name, hyperparameters):
+        base = os.path.join(self.work_dir, training_job_name)
+        self._prepare(base, hyperparameters)
+        env = dict(os.environ)
+        env[BASE_PATH_ENV] = base
+        env["TRAINING_JOB_NAME"] = training_job_name
+        log_filename = os.path.join(base, "training.log")
+        created = datetime.datetime.now(UTC())
+        status = 'Completed'
+        failure_reason = None
+        with open(log_filename, "w") as log:
+            process = subprocess.Popen(self.command, cwd=self.cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+            try:
+                returncode = process.wait(timeout=self.max_runtime)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+                status = 'Stopped'
+                failure_reason = "MaxRuntimeInSeconds exceeded"
+                returncode = None
+        ended = datetime.datetime.now(UTC())
+        if returncode:
+            status = 'Failed'
+            failure_reason = "Exit code %d" % returncode
+            failure_file = os.path.join(base, "output", "failure")
+            if os.path.exists(failure_file):
+                with open(failure_file) as fh:
+                    failure_reason = fh.read().strip() or failure_reason
+
+        scanner = MetricLogScanner(self.metric_definitions)
+        out = scanner.scan_file(log_filename)
+        timeseries = {name: ([], []) for name in self.metric_names}
+        for x, name, value in zip(out['timestamp'], out['metric_name'], out['value']):
+            timeseries[name][0].append(x)
+            timeseries[name][1].append(value)
+        self._timeseries[training_job_name] = timeseries
+        final = {name: (xy[1][-1] if xy[1] else None) for name, xy in timeseries.items()}
+        objective = final[self.objective_metric] if status == 'Completed' else None
+        return {
+            'TrainingJobName': training_job_name,
+            'TrainingJobStatus': status,
+            'FailureReason': failure_reason,
+            'HyperParameters': hyperparameters,
+            'FinalObjectiveValue': objective,
+            'FinalMetrics': final,
+            'TrainingCreationTime': created,
+            'TrainingEndTime': ended,
+        }
+
+    def training_job_names(self):
+        return [r['TrainingJobName'] for r in self.results]
+
+    def metric_timeseries(self, metric_name, training_job_name):
+        """(x, y) lists of one metric from a job's log, x being the log line number
+        """
+        return self._timeseries[training_job_name][metric_name]
+
+    def hyperparam_dataframe(self):
+        """One row per finished job, with the columns of TuningJob.hyperparam_dataframe()
+        and final_<metric> for every metric definition, as TuningJob.add_metric would add.
+        """
+        rows = []
+        for result in self.results:
+            row = {}
+            for name, value in result['HyperParameters'].items():
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    pass
+                row[name] = value
+            row['TrainingJobName'] = result['TrainingJobName']
+            row['TrainingJobStatus'] = result['TrainingJobStatus']
+            row['FinalObjectiveValue'] = result['FinalObjectiveValue']
+            row['TrainingCreationTime'] = result['TrainingCreationTime']
+            row['TrainingEndTime'] = result['TrainingEndTime']
+            row['TrainingElapsedTimeSeconds'] = (result['TrainingEndTime'] - result['TrainingCreationTime']).total_seconds()
+            for name, value in result['FinalMetrics'].items():
+                row["final_%s" % name] = value
+            rows.append(row)
+        return pd.DataFrame(rows)
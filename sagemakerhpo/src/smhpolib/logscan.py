@@ -0,0 +1,291 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+
+"""
+Extracts metrics from training logs by applying MetricDefinitions locally,
+the same way SageMaker does: every regex is searched for on every line, and
+its first capture group is the metric value.
+"""
+from __future__ import absolute_import
+
+import gzip
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from .analysis import TrainingJobStatusFetcher
+from .trainingcurve import TrainingCurveData
+from .region import get_region_context
+
+
+class MetricLogScanner(object):
+    """Applies a list of MetricDefinitions to log text without a python loop per line.
+
+    Each regex is searched over whole chunks of log text at a time, so lines
+    that match no definition are skipped inside the regex engine.  Only the
+    lines found that way are then checked against every definition, which
+    keeps the results identical to searching every line with every regex.
+    """
+
+    DEFAULT_CHUNK_SIZE = 16 * 1024 * 1024
+
+    def __init__(self, metric_definitions):
+        self.definitions = []
+        for md in metric_definitions:
+            name = md.get('Name', md.get('name'))
+            regex = md.get('Regex', md.get('regex'))
+            try:
+                compiled = re.compile(regex)
+            except re.error as err:
+                raise ValueError("MetricDefinition %s: regex %r doesn't compile: %s" % (name, regex, err))
+            if compiled.groups < 1:
+                raise ValueError("MetricDefinition %s: regex %r needs a capture group for the metric value" %
+                                 (name, regex))
+            self.definitions.append((name, compiled))
+        self.metric_names = [name for name, _ in self.definitions]
+        self.unparseable_values = 0
+        # Searched over whole chunks, where ^ and $ need to match at every line boundary
+        self._chunk_regexes = [re.compile(regex.pattern, regex.flags | re.MULTILINE)
+                               for _, regex in self.definitions]
+
+    @classmethod
+    def from_launcher(cls, launcher):
+        """Scanner for the MetricDefinitions a BaseLauncher would put in its request
+        """
+        return cls(launcher.clean_metric_definitions(launcher.get_metric_definitions()))
+
+    def scan_line(self, line, out, x, **columns):
+        """Appends every metric found on one line to out, a dict of lists
+        """
+        for name, regex in self.definitions:
+            match = regex.search(line)
+            if match:
+                try:
+                    value = float(match.group(1))
+                except ValueError:
+                    self.unparseable_values += 1
+                    continue
+                out['timestamp'].append(x)
+                out['metric_name'].append(name)
+                out['value'].append(value)
+                for k, v in columns.items():
+                    out[k].append(v)
+
+    def scan_text(self, text, out, first_line=0):
+        """Scans a block of complete lines.  Each datapoint's timestamp is its line number.
+        Returns the number of lines in the text.
+        """
+        line_no = first_line
+        counted_to = 0
+        for start, end in self._candidate_lines(text):
+            line_no += text.count("\n", counted_to, start)
+            counted_to = start
+            self.scan_line(text[start:end], out, line_no)
+        return text.count("\n") + 1
+
+    def _candidate_lines(self, text):
+        """Sorted (start, end) offsets of the lines some definition matches.
+        Each regex searches the whole text on its own, which lets the regex engine
+        skip ahead to its literal prefix instead of stepping through every line.
+        """
+        lines = set()
+        for regex in self._chunk_regexes:
+            search = regex.search
+            pos = 0
+            while True:
+                match = search(text, pos)
+                if match is None:
+                    break
+                start = text.rfind("\n", 0, match.start()) + 1
+                end = text.find("\n", match.start())
+                if end < 0:
+                    end = len(text)
+                lines.add((start, end))
+                pos = end + 1
+        return sorted(lines)
+
+    def scan_file(self, filename, chunk_size=DEFAULT_CHUNK_SIZE, **columns):
+        """Streams a (possibly gzipped) log file in chunks.
+        Returns a dict of lists with timestamp, metric_name, value and any extra columns.
+        """
+        out = self._new_output(columns)
+        opener = gzip.open if filename.endswith(".gz") else open
+        line_no = 0
+        remainder = b""
+        with opener(filename, "rb") as fh:
+            while True:
+                chunk = fh.read(chunk_size)
+                if not chunk:
+                    break
+                chunk = remainder + chunk
+                cut = chunk.rfind(b"\n")
+                if cut < 0:
+                    remainder = chunk
+                    continue
+                remainder = chunk[cut + 1:]
+                n_before = len(out['timestamp'])
+                line_no += self.scan_text(chunk[:cut].decode("utf-8", "replace"), out, line_no)
+                self._fill_columns(out, columns, n_before)
+        if remainder:
+            n_before = len(out['timestamp'])
+            self.scan_text(remainder.decode("utf-8", "replace"), out, line_no)
+            self._fill_columns(out, columns, n_before)
+        return out
+
+    def scan_events(self, events, **columns):
+        """Scans CloudWatch Logs events.  Each datapoint's timestamp is its event's timestamp.
+        """
+        out = self._new_output(columns)
+        searches = [regex.search for regex in self._chunk_regexes]
+        candidates = [e for e in events if any(search(e['message']) for search in searches)]
+        for event in candidates:
+            for line in event['message'].split("\n"):
+                self.scan_line(line, out, event['timestamp'], **columns)
+        return out
+
+    def training_curve_data(self, filename, training_job_name=None, training_curve_data=None):
+        """Scans a log file into a TrainingCurveData, with line numbers as timestamps
+        """
+        if training_curve_data is None:
+            training_curve_data = TrainingCurveData()
+        columns = {}
+        if training_job_name is not None:
+            columns['training_job_name'] = training_job_name
+        out = self.scan_file(filename, **columns)
+        training_curve_data.add_metrics(**out)
+        return training_curve_data
+
+    def _new_output(self, columns):
+        out = {'timestamp': [], 'metric_name': [], 'value': []}
+        for k in columns:
+            out[k] = []
+        return out
+
+    def _fill_columns(self, out, columns, n_before):
+        n_new = len(out['timestamp']) - n_before
+        for k, v in columns.items():
+            out[k].extend([v] * n_new)
+
+
+class CloudWatchLogsMetricFetcher(object):
+    """Fetches metrics for a TrainingJob by scanning its logs in CloudWatch Logs.
+
+    A drop-in replacement for trainingcurve.CloudWatchMetricFetcher.  CloudWatch
+    Metrics averages every metric into 60 second buckets; reading the log lines
+    the metrics came from gives one datapoint per line instead, which keeps
+    every epoch of a fast-training job.
+
+    Each job's log streams are read in parallel and scanned once, whichever
+    metric is asked for first.  x values are seconds since the job's first
+    datapoint, and a host column records which instance logged each one.
+    """
+
+    LOG_GROUP = '/aws/sagemaker/TrainingJobs'
+    DEFAULT_MAX_WORKERS = 8
+
+    def __init__(self, metric_definitions=None, logs_client=None, max_workers=DEFAULT_MAX_WORKERS,
+                 region_context=None):
+        """
+        :param metric_definitions: [{"Name":..., "Regex":...}].  If None, they're read from
+            each training job's description.
+        :param max_workers: number of log streams read concurrently
+        :param region_context: region.RegionContext or region name the training jobs ran in
+        """
+        self._data = TrainingCurveData()
+        self.region_context = get_region_context(region_context)
+        if logs_client is None:
+            logs_client = self.region_context.client('logs')
+        self.logs = logs_client
+        self.metric_definitions = metric_definitions
+        self.max_workers = max_workers
+        self._scanned = {}
+
+    @classmethod
+    def from_tuning_job(cls, tuning_job, **kwargs):
+        """Fetcher using the MetricDefinitions of a tuning job's training job definition
+        """
+        algorithm = tuning_job.describe()['TrainingJobDefinition']['AlgorithmSpecification']
+        kwargs.setdefault('region_context', tuning_job.region_context)
+        return cls(metric_definitions=algorithm['MetricDefinitions'], **kwargs)
+
+    def fetch_metric(self, training_job_name, metric_name):
+        """Fetches all the values of a named metric for a training job
+        """
+        out = self._scan_job(training_job_name)
+        rows = [i for i, name in enumerate(out['metric_name']) if name == metric_name]
+        if len(rows) == 0:
+            print("Warning: No metrics called %s found" % metric_name)
+        self._data.add_metrics([out['timestamp'][i] for i in rows],
+                               [metric_name] * len(rows),
+                               [out['value'][i] for i in rows],
+                               training_job_name=[training_job_name] * len(rows),
+                               host=[out['host'][i] for i in rows])
+
+    def training_curve_data(self):
+        """Returns a TrainingCurveData object
+        """
+        return self._data
+
+    def log_stream_names(self, training_job_name):
+        """Names of the job's log streams, one or more per instance, e.g. <job>/algo-1-1517267456
+        """
+        paginator = self.logs.get_paginator('describe_log_streams')
+        names = []
+        for page in paginator.paginate(logGroupName=self.LOG_GROUP,
+                                       logStreamNamePrefix=training_job_name + "/"):
+            names.extend(stream['logStreamName'] for stream in page['logStreams'])
+        return names
+
+    def read_log_stream(self, log_stream_name):
+        """Returns all the events of one log stream, oldest first
+        """
+        events = []
+        kwargs = {'logGroupName': self.LOG_GROUP, 'logStreamName': log_stream_name, 'startFromHead': True}
+        while True:
+            response = self.logs.get_log_events(**kwargs)
+            events.extend(response['events'])
+            # The forward token stays the same once the end of the stream is reached
+            token = response.get('nextForwardToken')
+            if not token or token == kwargs.get('nextToken'):
+                return events
+            kwargs['nextToken'] = token
+
+    def _metric_definitions_for(self, training_job_name):
+        if self.metric_definitions is not None:
+            return self.metric_definitions
+        description = TrainingJobStatusFetcher.fetch(training_job_name, self.region_context)
+        definitions = description.get('AlgorithmSpecification', {}).get('MetricDefinitions')
+        if not definitions:
+            raise ValueError("No MetricDefinitions in the description of %s.  "
+                             "Pass metric_definitions, or use from_tuning_job." % training_job_name)
+        return definitions
+
+    def _scan_job(self, training_job_name):
+        if training_job_name in self._scanned:
+            return self._scanned[training_job_name]
+        scanner = MetricLogScanner(self._metric_definitions_for(training_job_name))
+        stream_names = self.log_stream_names(training_job_name)
+        logging.debug("Reading %d log streams for TrainingJob: %s" % (len(stream_names), training_job_name))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            all_events = list(executor.map(self.read_log_stream, stream_names))
+        out = {'timestamp': [], 'metric_name': [], 'value': [], 'host': []}
+        for stream_name, events in zip(stream_names, all_events):
+            host = stream_name[len(training_job_name) + 1:].rsplit("-", 1)[0]
+            found = scanner.scan_events(events, host=host)
+            for k in out:
+                out[k].extend(found[k])
+        if out['timestamp']:
+            # Event timestamps are epoch milliseconds
+            base_time = min(out['timestamp'])
+            out['timestamp'] = [(t - base_time) / 1000.0 for t in out['timestamp']]
+        self._scanned[training_job_name] = out
+        return out
@@ -13,10 +13,9 @@
 """
 Metrics processing.
 """
-import boto3
 import datetime
 
-cloudwatch = boto3.client('cloudwatch')
+from .region import get_region_context
 
 def kw_get_metrics(job_name, metric_name, **time_interval):
     """Returns the **kwargs needed to call CloudWatch Metrics
@@ -74,14 +73,16 @@ def plottable_from_cwm(raw_data):
     all_y = [xy[1] for xy in out]
     return all_x, all_y
 
-def plottable_for_job(job_name, metric_name, **time_interval):
+def plottable_for_job(job_name, metric_name, region_context=None, **time_interval):
     """Fetches metrics from CloudWatch.
     Returns a pair (x,y) of lists for plotting.
     x is a list of times in seconds, from the first metric in the job.
     y is a list of metric values
     time_interval can be "hours=3" or "minutes=15" or any other
     valid constructor arguments to datetime.timedelta().
+    region_context is a region.RegionContext or region name, default region if not given.
     """
+    cloudwatch = get_region_context(region_context).client('cloudwatch')
     raw_data = cloudwatch.get_metric_statistics(
         ** kw_get_metrics(job_name, metric_name, **time_interval)
     )['Datapoints']
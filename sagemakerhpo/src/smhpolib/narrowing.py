@@ -0,0 +1,161 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+
+"""
+Recommends tighter hyperparameter ranges for the next tuning job, from the
+results of the last one.
+"""
+from __future__ import absolute_import
+
+import copy
+import json
+
+import numpy as np
+import pandas as pd
+
+from .importance import HyperparamImportance
+
+
+class RangeNarrower(object):
+    """Proposes narrower ParameterRanges where the surrogate predicts the best results.
+
+    Random points are drawn from the whole search space and scored with the
+    surrogate forest of a HyperparamImportance.  Each important numeric range
+    is cut down to the 5th-95th percentile of the top_fraction of points,
+    widened by `margin` of the original range on each side.  Categorical
+    ranges keep the values that at least min_category_fraction of the top
+    points use.  Hyperparameters that explain less than min_importance of the
+    objective keep their whole range, and the best job found so far is always
+    kept inside the new ranges.
+    """
+
+    def __init__(self, importance, ranges, top_fraction=0.1, n_candidates=20000, margin=0.1,
+                 min_importance=0.02, min_category_fraction=0.05, seed=0):
+        """
+        :param importance: importance.HyperparamImportance fitted to the tuning job's results
+        :param ranges: {name: range} the tuning job used, as returned by TuningJob.hyperparam_ranges
+        """
+        self.importance = importance
+        self.ranges = ranges
+        self.top_fraction = top_fraction
+        self.margin = margin
+        self.min_importance = min_importance
+        self.min_category_fraction = min_category_fraction
+        encoder = importance.encoder
+        candidates = encoder.sample(n_candidates, np.random.RandomState(seed))
+        score = importance.forest.predict(candidates)
+        if not importance.maximize:
+            score = -score
+        self.top = candidates[score >= np.percentile(score, 100 * (1 - top_fraction))]
+        best = np.argmax(importance.y) if importance.maximize else np.argmin(importance.y)
+        self.incumbent = importance.X[best]
+        self._recommended = None
+
+    @classmethod
+    def from_tuning_job(cls, tuning_job, objective='FinalObjectiveValue', importance_kwargs=None, **kwargs):
+        importance = tuning_job.hyperparam_importance(objective, **(importance_kwargs or {}))
+        return cls(importance, tuning_job.hyperparam_ranges(), **kwargs)
+
+    @classmethod
+    def from_dataframe(cls, df, ranges, objective='FinalObjectiveValue', maximize=False, **kwargs):
+        """For results that aren't a TuningJob's, e.g. local.LocalTuner.hyperparam_dataframe()
+        """
+        return cls(HyperparamImportance(df, ranges, objective=objective, maximize=maximize), ranges, **kwargs)
+
+    def _importances(self):
+        table = self.importance.importances()
+        return dict(zip(table['HyperParameter'], table['PermutationImportance']))
+
+    def recommended_ranges(self):
+        """{name: range} in the same form as the input ranges
+        """
+        if self._recommended is None:
+            encoder = self.importance.encoder
+            importances = self._importances()
+            out = {}
+            for name in sorted(self.ranges):
+                spec = copy.deepcopy(self.ranges[name])
+                param = encoder.param(name)
+                cols = encoder.groups[name]
+                if importances.get(name, 0.0) < self.min_importance:
+                    out[name] = spec
+                    continue
+                if param['Type'] == 'Categorical':
+                    share = self.top[:, cols].mean(axis=0)
+                    keep = (share >= self.min_category_fraction) | (self.incumbent[cols] > 0)
+                    spec['Values'] = [v for v, k in zip(param['Values'], keep) if k]
+                else:
+                    units = self.top[:, cols[0]]
+                    low, high = np.percentile(units, [5, 95])
+                    low = max(0.0, min(low, self.incumbent[cols[0]]) - self.margin)
+                    high = min(1.0, max(high, self.incumbent[cols[0]]) + self.margin)
+                    low, high = encoder.from_unit(name, np.array([low, high]))
+                    if param['Type'] == 'Integer':
+                        spec['MinValue'], spec['MaxValue'] = str(int(low)), str(int(high))
+                    else:
+                        spec['MinValue'], spec['MaxValue'] = "%.6g" % low, "%.6g" % high
+                out[name] = spec
+            self._recommended = out
+        return self._recommended
+
+    def report(self):
+        """One row per hyperparameter: its importance, the original and recommended
+        range, and the Kept fraction of the range (scaled as the surrogate scales it)
+        """
+        encoder = self.importance.encoder
+        importances = self._importances()
+        rows = []
+        for name, spec in self.recommended_ranges().items():
+            original = self.ranges[name]
+            if 'Values' in spec:
+                before, after = list(original['Values']), spec['Values']
+                kept = len(after) / float(len(before))
+            else:
+                before = (original['MinValue'], original['MaxValue'])
+                after = (spec['MinValue'], spec['MaxValue'])
+                units = encoder.to_unit(name, [float(v) for v in after])
+                kept = float(units[1] - units[0])
+            rows.append({'HyperParameter': name, 'Importance': importances.get(name, 0.0),
+                         'Original': before, 'Recommended': after, 'Kept': kept})
+        return pd.DataFrame(rows, columns=['HyperParameter', 'Importance', 'Original', 'Recommended', 'Kept'])
+
+    def search_space_fraction(self):
+        """Product of the Kept fractions: how much of the search space is left
+        """
+        return float(np.prod(self.report()['Kept']))
+
+    def ranges_json(self, static_hyperparameters=None):
+        """The recommended ranges in the ranges file format BaseLauncher loads
+        """
+        out = {
+            "CategoricalParameterRanges": [],
+            "ContinuousParameterRanges": [],
+            "IntegerParameterRanges": [],
+        }
+        encoder = self.importance.encoder
+        for name, spec in self.recommended_ranges().items():
+            kind = encoder.param(name)['Type']
+            if kind == 'Categorical':
+                out["CategoricalParameterRanges"].append(spec)
+            elif kind == 'Integer':
+                out["IntegerParameterRanges"].append(spec)
+            else:
+                out["ContinuousParameterRanges"].append(spec)
+        if static_hyperparameters:
+            out["StaticHyperParameters"] = static_hyperparameters
+        return out
+
+    def save(self, filename, static_hyperparameters=None):
+        with open(filename, "w") as fh:
+            json.dump(self.ranges_json(static_hyperparameters), fh, indent=4, sort_keys=True)
+        print("Saved recommended ranges to %s, %.1f%% of the original search space" %
+              (filename, 100 * self.search_space_fraction()))
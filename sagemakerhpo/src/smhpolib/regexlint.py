@@ -0,0 +1,303 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+
+"""
+Checks MetricDefinitions before they ship.  SageMaker searches every regex
+on every log line, so a pattern that backtracks badly slows down every
+training job, and one that matches the wrong text records the wrong metric.
+"""
+from __future__ import absolute_import
+
+from collections import defaultdict
+import gzip
+import re
+import time
+
+import pandas as pd
+
+try:
+    import re._parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+from .logscan import MetricLogScanner
+
+NESTED_QUANTIFIER = "nested quantifier"
+_BACKTRACKING_REPEATS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+_PRINTABLE = frozenset(chr(i) for i in range(32, 127))
+_CATEGORIES = {
+    'CATEGORY_DIGIT': lambda c: c.isdigit(),
+    'CATEGORY_NOT_DIGIT': lambda c: not c.isdigit(),
+    'CATEGORY_SPACE': lambda c: c.isspace(),
+    'CATEGORY_NOT_SPACE': lambda c: not c.isspace(),
+    'CATEGORY_WORD': lambda c: c.isalnum() or c == '_',
+    'CATEGORY_NOT_WORD': lambda c: not (c.isalnum() or c == '_'),
+}
+
+
+def _children(op, av):
+    """Sub-patterns of one parsed item that the engine can backtrack into
+    """
+    if op in _BACKTRACKING_REPEATS:
+        return [av[2]]
+    if op == sre_parse.SUBPATTERN:
+        return [av[-1]]
+    if op == sre_parse.BRANCH:
+        return av[1]
+    if op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+        return [av[1]]
+    if op == sre_parse.GROUPREF_EXISTS:
+        return [p for p in av[1:] if p]
+    return []  # Atomic groups and possessive repeats never backtrack
+
+
+def _is_unbounded(op, av):
+    return op in _BACKTRACKING_REPEATS and av[1] == sre_parse.MAXREPEAT
+
+
+def _char_set(items):
+    """Printable characters a one-character sub-pattern matches, or None if it isn't one
+    """
+    items = list(items)
+    while len(items) == 1 and items[0][0] == sre_parse.SUBPATTERN:
+        items = list(items[0][1][-1])
+    if len(items) != 1:
+        return None
+    op, av = items[0]
+    if op == sre_parse.LITERAL:
+        return {chr(av)}
+    if op == sre_parse.NOT_LITERAL:
+        return _PRINTABLE - {chr(av)}
+    if op == sre_parse.ANY:
+        return set(_PRINTABLE)
+    if op != sre_parse.IN:
+        return None
+    negate = False
+    chars = set()
+    for in_op, in_av in av:
+        if in_op == sre_parse.NEGATE:
+            negate = True
+        elif in_op == sre_parse.LITERAL:
+            chars.add(chr(in_av))
+        elif in_op == sre_parse.RANGE:
+            chars.update(c for c in _PRINTABLE if in_av[0] <= ord(c) <= in_av[1])
+        elif in_op == sre_parse.CATEGORY and str(in_av) in _CATEGORIES:
+            chars.update(filter(_CATEGORIES[str(in_av)], _PRINTABLE))
+        else:
+            return None
+    return _PRINTABLE - chars if negate else chars
+
+
+def _leading_repeat(items):
+    """The unbounded repeat a sequence starts with, looking inside groups, or None
+    """
+    for op, av in items:
+        if op == sre_parse.SUBPATTERN:
+            return _leading_repeat(av[-1])
+        return (op, av) if _is_unbounded(op, av) else None
+    return None
+
+
+def backtracking_problems(pattern):
+    """Descriptions of the constructs in a regex that make failed searches slow.
+
+    Nested quantifiers like (\\d+)+ or (a|\\w+)* let the engine split the same text
+    in exponentially many ways.  Adjacent unbounded quantifiers over overlapping
+    characters, like \\d+[0-9.]+ or .*.*, and a leading .* make each failed
+    search polynomial in the line length.
+    """
+    problems = []
+
+    def walk(items, outer_repeat):
+        items = list(items)
+        for i, (op, av) in enumerate(items):
+            repeats = op in _BACKTRACKING_REPEATS and av[1] > 1
+            if repeats and outer_repeat and _is_unbounded(op, av):
+                problems.append("%s: an unbounded repeat inside another repeat can backtrack "
+                                "exponentially" % NESTED_QUANTIFIER)
+            if _is_unbounded(op, av) and i + 1 < len(items):
+                following = _leading_repeat(items[i + 1:])
+                if following is not None:
+                    this_chars = _char_set(av[2])
+                    next_chars = _char_set(following[1][2])
+                    if this_chars is not None and next_chars is not None and this_chars & next_chars:
+                        problems.append("adjacent unbounded quantifiers over characters %s can split "
+                                        "the same text many ways" %
+                                        repr("".join(sorted(this_chars & next_chars))[:20]))
+            for child in _children(op, av):
+                walk(child, outer_repeat or repeats)
+
+    parsed = list(sre_parse.parse(pattern))
+    if parsed and _is_unbounded(*parsed[0]) and _char_set(parsed[0][1][2]) == set(_PRINTABLE):
+        problems.append("leading .* is tried from every position of a line that doesn't match; "
+                        "search() already looks anywhere in the line")
+    walk(parsed, False)
+    return problems
+
+
+def read_sample_log(filename):
+    """Lines of a (possibly gzipped) training log
+    """
+    opener = gzip.open if filename.endswith(".gz") else open
+    with opener(filename, "rb") as fh:
+        return fh.read().decode("utf-8", "replace").splitlines()
+
+
+class MetricRegexLinter(object):
+    """Finds MetricDefinitions that are broken, slow or ambiguous.
+
+    Without a sample log the regexes are only parsed: each must compile and
+    have a capture group, and constructs that backtrack badly are flagged.
+    With sample log lines, each regex is timed the way SageMaker applies it
+    (one search per line), and lines where definitions capture something that
+    isn't a number, capture more than one value, or read the same value as
+    another definition are reported.  Regexes with nested quantifiers are left
+    out of that, since a single line can keep them busy for minutes.
+    """
+
+    MAX_MICROSECONDS_PER_LINE = 20.0
+    MAX_MICROSECONDS_SLOWEST_LINE = 1000.0
+    MAX_EXAMPLES = 3
+
+    def __init__(self, metric_definitions):
+        """
+        :param metric_definitions: [{"Name":..., "Regex":...}], e.g. from BaseLauncher.get_metric_definitions()
+        """
+        self.metric_definitions = metric_definitions
+        self._errors = []
+        self._problems = []
+        runnable = []
+        for md in metric_definitions:
+            name = md.get('Name', md.get('name'))
+            regex = md.get('Regex', md.get('regex'))
+            try:
+                groups = re.compile(regex).groups
+            except (re.error, TypeError) as err:
+                self._errors.append("metric %s: regex %r doesn't compile: %s" % (name, regex, err))
+                continue
+            if groups == 0:
+                self._errors.append("metric %s: regex %r has no capture group for the metric value" %
+                                    (name, regex))
+                continue
+            problems = backtracking_problems(regex)
+            self._problems.append((name, regex, problems))
+            if not any(problem.startswith(NESTED_QUANTIFIER) for problem in problems):
+                runnable.append({'Name': name, 'Regex': regex})
+        # Only the definitions that are safe to run over the sample log
+        self.scanner = MetricLogScanner(runnable)
+
+    @classmethod
+    def from_launcher(cls, launcher):
+        """Linter for the MetricDefinitions a BaseLauncher would put in its request
+        """
+        return cls(launcher.clean_metric_definitions(launcher.get_metric_definitions()))
+
+    def errors(self):
+        """Definitions SageMaker can't use at all
+        """
+        return list(self._errors)
+
+    def static_warnings(self):
+        """Problems visible from the definitions alone
+        """
+        warnings = []
+        counts = defaultdict(int)
+        for name, regex, problems in self._problems:
+            counts[name] += 1
+            for problem in problems:
+                warnings.append("metric %s: %s in %r" % (name, problem, regex))
+        for name, count in sorted(counts.items()):
+            if count > 1:
+                warnings.append("metric %s: defined %d times" % (name, count))
+        return warnings
+
+    def benchmark(self, lines, repeat=3):
+        """One row per definition: how many sample lines it matches and what it costs per line
+        """
+        rows = []
+        n_lines = max(len(lines), 1)
+        for name, regex in self.scanner.definitions:
+            search = regex.search
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for line in lines:
+                    search(line)
+            mean = (time.perf_counter() - start) / (repeat * n_lines)
+            slowest = 0.0
+            matched = 0
+            for line in lines:
+                line_start = time.perf_counter()
+                match = search(line)
+                slowest = max(slowest, time.perf_counter() - line_start)
+                matched += match is not None
+            rows.append({'Name': name, 'Regex': regex.pattern, 'LinesMatched': matched,
+                         'MicrosecondsPerLine': 1e6 * mean, 'SlowestLineMicroseconds': 1e6 * slowest})
+        return pd.DataFrame(rows, columns=['Name', 'Regex', 'LinesMatched', 'MicrosecondsPerLine',
+                                           'SlowestLineMicroseconds'])
+
+    def sample_warnings(self, lines, benchmark=None):
+        """Problems seen when applying the definitions to sample log lines
+        """
+        if benchmark is None:
+            benchmark = self.benchmark(lines)
+        warnings = []
+        for row in benchmark.itertuples():
+            if row.LinesMatched == 0:
+                warnings.append("metric %s: matches no line of the sample log" % row.Name)
+            if row.MicrosecondsPerLine > self.MAX_MICROSECONDS_PER_LINE:
+                warnings.append("metric %s: %.1f microseconds per line (limit %.1f)" %
+                                (row.Name, row.MicrosecondsPerLine, self.MAX_MICROSECONDS_PER_LINE))
+            if row.SlowestLineMicroseconds > self.MAX_MICROSECONDS_SLOWEST_LINE:
+                warnings.append("metric %s: %.0f microseconds on its slowest line (limit %.0f)" %
+                                (row.Name, row.SlowestLineMicroseconds, self.MAX_MICROSECONDS_SLOWEST_LINE))
+
+        unparseable = defaultdict(list)
+        several = defaultdict(list)
+        shared = defaultdict(list)
+        for line_no, line in enumerate(lines, 1):
+            readers = defaultdict(list)
+            for name, regex in self.scanner.definitions:
+                matches = list(regex.finditer(line))
+                if not matches:
+                    continue
+                value = matches[0].group(1)
+                try:
+                    float(value)
+                except (TypeError, ValueError):
+                    unparseable[name].append((line_no, value))
+                if len(matches) > 1:
+                    several[name].append((line_no, len(matches)))
+                readers[matches[0].span(1)].append(name)
+            for names in readers.values():
+                if len(names) > 1:
+                    shared[tuple(names)].append((line_no, line.strip()))
+
+        for name, examples in unparseable.items():
+            warnings.append("metric %s: captured text that isn't a number on %d lines, e.g. %s" %
+                            (name, len(examples), ", ".join("line %d: %r" % e for e in examples[:self.MAX_EXAMPLES])))
+        for name, examples in several.items():
+            warnings.append("metric %s: matches more than once on %d lines and only the first match is "
+                            "recorded, e.g. %s" %
+                            (name, len(examples),
+                             ", ".join("line %d (%d matches)" % e for e in examples[:self.MAX_EXAMPLES])))
+        for names, examples in shared.items():
+            warnings.append("metrics %s read the same value on %d lines, e.g. line %d: %s" %
+                            (", ".join(names), len(examples), examples[0][0], examples[0][1][:200]))
+        return warnings
+
+    def warnings(self, lines=None):
+        """Static warnings, plus sample log warnings if lines are given
+        """
+        warnings = self.static_warnings()
+        if lines is not None:
+            warnings.extend(self.sample_warnings(lines))
+        return warnings
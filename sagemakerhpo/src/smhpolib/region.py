@@ -0,0 +1,111 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+
+"""
+Region-scoped boto3 sessions and clients, so tuning jobs in several
+regions can be analyzed side by side in one process.
+"""
+from __future__ import absolute_import
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import botocore.config
+
+
+class RegionContext(object):
+    """A boto3 session pinned to one region, and the clients made from it.
+
+    Clients are created once per service and shared, each with its own
+    connection pool, so they can be used from several threads at once.
+    The region is the one given, else $AWS_REGION, else $AWS_DEFAULT_REGION,
+    else the configured region, else DEFAULT_REGION.  The environment is read
+    each time a default context is asked for, so changing it takes effect.
+    """
+
+    DEFAULT_REGION = "us-west-2"
+    DEFAULT_MAX_POOL_CONNECTIONS = 20
+
+    _contexts = {}
+    _contexts_lock = threading.Lock()
+    _configured_region = None
+
+    def __init__(self, region=None, session=None, max_pool_connections=DEFAULT_MAX_POOL_CONNECTIONS):
+        if session is None:
+            session = boto3.session.Session(region_name=region)
+        self.session = session
+        self.region = region or os.getenv("AWS_REGION") or session.region_name or self.resolve_region()
+        self._config = botocore.config.Config(max_pool_connections=max_pool_connections)
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def resolve_region(cls, region=None):
+        """The region a context for `region` uses.  None means the current default region.
+        """
+        if region:
+            return region
+        region = os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION")
+        if region:
+            return region
+        if cls._configured_region is None:
+            # From ~/.aws/config, which is only read once
+            cls._configured_region = boto3.session.Session().region_name or cls.DEFAULT_REGION
+        return cls._configured_region
+
+    @classmethod
+    def for_region(cls, region=None):
+        """The shared context for a region.  None means the current default region.
+        """
+        region = cls.resolve_region(region)
+        with cls._contexts_lock:
+            if region not in cls._contexts:
+                cls._contexts[region] = cls(region)
+            return cls._contexts[region]
+
+    @classmethod
+    def default(cls):
+        return cls.for_region(None)
+
+    def client(self, service_name, **kwargs):
+        """The shared boto3 client for a service in this region, e.g. client('cloudwatch')
+        """
+        key = (service_name, tuple(sorted(kwargs.items())))
+        # boto3 sessions aren't thread safe, so clients are created one at a time
+        with self._lock:
+            if key not in self._clients:
+                self._clients[key] = self.session.client(service_name, region_name=self.region,
+                                                         config=self._config, **kwargs)
+            return self._clients[key]
+
+    def __repr__(self):
+        return "RegionContext(%s)" % self.region
+
+
+def get_region_context(region_context=None):
+    """Accepts a RegionContext, a region name, or None for the default region
+    """
+    if isinstance(region_context, RegionContext):
+        return region_context
+    return RegionContext.for_region(region_context)
+
+
+def map_regions(func, regions, max_workers=None):
+    """Calls func(region_context) for every region concurrently.
+    Returns {region: result}.
+    """
+    contexts = [get_region_context(region) for region in regions]
+    with ThreadPoolExecutor(max_workers=max_workers or max(1, len(contexts))) as executor:
+        results = list(executor.map(func, contexts))
+    return dict(zip(regions, results))
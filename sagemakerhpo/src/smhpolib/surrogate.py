@@ -0,0 +1,290 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+
+"""
+Surrogate models of the objective as a function of the hyperparameters:
+an encoder from tuning job ranges to a numeric matrix, and a random forest
+of histogram trees built and evaluated with numpy array operations.
+"""
+from __future__ import absolute_import
+
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def _category_key(value):
+    """Categorical values come back from hyperparam_dataframe as floats when they look
+    numeric, so "1", 1 and 1.0 all need to map to the same category.
+    """
+    try:
+        return repr(float(value))
+    except (TypeError, ValueError):
+        return str(value)
+
+
+class HyperparamEncoder(object):
+    """Encodes hyperparameter values into a float matrix with one column per
+    numeric hyperparameter, scaled to [0, 1] within its range, and one 0/1
+    column per value of each categorical hyperparameter.
+    """
+
+    # Positive ranges at least this wide (max / min) are scaled logarithmically
+    LOG_SCALE_RATIO = 100.0
+
+    def __init__(self, ranges, log_scale=None):
+        """
+        :param ranges: {name: range} as returned by TuningJob.hyperparam_ranges
+        :param log_scale: names of numeric hyperparameters to scale logarithmically.
+            Default: ranges with ScalingType Logarithmic, or positive ranges spanning two decades.
+        """
+        self.params = []
+        self.columns = []
+        self.groups = OrderedDict()
+        for name in sorted(ranges):
+            spec = ranges[name]
+            param = {'Name': name}
+            if 'Values' in spec:
+                param['Type'] = 'Categorical'
+                param['Values'] = list(spec['Values'])
+                param['Keys'] = {_category_key(v): i for i, v in enumerate(param['Values'])}
+                self.groups[name] = list(range(len(self.columns), len(self.columns) + len(param['Values'])))
+                self.columns.extend("%s=%s" % (name, v) for v in param['Values'])
+            else:
+                if spec.get('Type') not in ('Integer', 'Continuous'):
+                    raise ValueError("Range for %s has MinValue/MaxValue but Type %r, not Integer or Continuous.  "
+                                     "Use util.ranges_by_name to take the Type from its group." %
+                                     (name, spec.get('Type')))
+                param['Type'] = spec['Type']
+                low, high = float(spec['MinValue']), float(spec['MaxValue'])
+                if log_scale is None:
+                    log = spec.get('ScalingType') == 'Logarithmic' or (low > 0 and high / low >= self.LOG_SCALE_RATIO)
+                else:
+                    log = name in log_scale
+                if log and low <= 0:
+                    raise ValueError("Can't scale %s logarithmically, its range starts at %s" % (name, low))
+                param['Log'] = log
+                param['Low'], param['High'] = (np.log(low), np.log(high)) if log else (low, high)
+                self.groups[name] = [len(self.columns)]
+                self.columns.append(name)
+            self.params.append(param)
+        self._params_by_name = {p['Name']: p for p in self.params}
+
+    def param(self, name):
+        return self._params_by_name[name]
+
+    def to_unit(self, name, values):
+        """Scales numeric hyperparameter values into [0, 1]
+        """
+        param = self._params_by_name[name]
+        values = np.asarray(values, dtype=float)
+        if param['Log']:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                values = np.log(values)
+        width = param['High'] - param['Low']
+        if width == 0:
+            return np.zeros_like(values)
+        return (values - param['Low']) / width
+
+    def from_unit(self, name, units):
+        """Inverse of to_unit, rounding Integer hyperparameters
+        """
+        param = self._params_by_name[name]
+        values = param['Low'] + np.clip(units, 0.0, 1.0) * (param['High'] - param['Low'])
+        if param['Log']:
+            values = np.exp(values)
+        if param['Type'] == 'Integer':
+            values = np.round(values)
+        return values
+
+    def encode(self, df):
+        """Encodes the hyperparameter columns of a DataFrame like hyperparam_dataframe().
+        Returns an (n, len(columns)) float array.  Missing numeric values are NaN.
+        """
+        out = np.zeros((len(df), len(self.columns)))
+        for param in self.params:
+            cols = self.groups[param['Name']]
+            if param['Type'] == 'Categorical':
+                codes = np.array([param['Keys'].get(_category_key(v), -1) for v in df[param['Name']]],
+                                 dtype=np.int64)
+                hit = codes >= 0
+                out[np.nonzero(hit)[0], np.array(cols)[codes[hit]]] = 1.0
+            else:
+                out[:, cols[0]] = self.to_unit(param['Name'], pd.to_numeric(df[param['Name']], errors='coerce'))
+        return out
+
+    def sample(self, n, rng):
+        """n random encoded rows, uniform over every range and category.  Numeric values
+        are snapped to what decode() gives, so Integer hyperparameters are whole numbers.
+        :param rng: numpy RandomState
+        """
+        X = np.zeros((n, len(self.columns)))
+        for param in self.params:
+            cols = self.groups[param['Name']]
+            if param['Type'] == 'Categorical':
+                X[np.arange(n), np.array(cols)[rng.randint(len(cols), size=n)]] = 1.0
+            else:
+                X[:, cols[0]] = self.to_unit(param['Name'], self.from_unit(param['Name'], rng.uniform(size=n)))
+        return X
+
+    def decode(self, X):
+        """Turns encoded rows back into a DataFrame of hyperparameter values
+        """
+        X = np.atleast_2d(X)
+        out = OrderedDict()
+        for param in self.params:
+            cols = self.groups[param['Name']]
+            if param['Type'] == 'Categorical':
+                out[param['Name']] = [param['Values'][i] for i in X[:, cols].argmax(axis=1)]
+            else:
+                out[param['Name']] = self.from_unit(param['Name'], X[:, cols[0]])
+        return pd.DataFrame(out)
+
+
+class HistogramForest(object):
+    """Random forest regressor of histogram trees.
+
+    Features are bucketed into at most n_bins quantile bins once.  Each tree
+    is grown a whole level at a time: one bincount gives the split statistics
+    of every (node, feature, bin), and the best splits of the level are picked
+    with a single argmax.  Trees are stored in heap layout (children of node i
+    are 2i+1 and 2i+2), so prediction walks every row down every tree at once.
+    """
+
+    def __init__(self, n_trees=50, max_depth=8, n_bins=32, min_samples_leaf=3,
+                 max_features=0.7, max_samples=None, seed=None):
+        """
+        :param max_features: fraction of features considered for each split
+        :param max_samples: bootstrap sample size per tree, default the number of rows
+        """
+        self.n_trees = n_trees
+        self.max_depth = max_depth
+        self.n_bins = n_bins
+        self.min_samples_leaf = min_samples_leaf
+        self.max_features = max_features
+        self.max_samples = max_samples
+        self.seed = seed
+
+    def bin(self, X):
+        """Maps encoded values to bin numbers.  Missing values go in bin 0.
+        """
+        X = np.atleast_2d(X)
+        B = np.zeros(X.shape, dtype=np.int64)
+        for j, edges in enumerate(self.bin_edges):
+            col = X[:, j]
+            B[:, j] = np.where(np.isnan(col), 0, np.searchsorted(edges, col, side='right'))
+        return B
+
+    def fit(self, X, y):
+        X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        n, d = X.shape
+        self.n_features = d
+        self.bin_edges = []
+        self.bin_centers = []
+        quantiles = np.linspace(0, 100, self.n_bins + 1)[1:-1]
+        for j in range(d):
+            col = X[~np.isnan(X[:, j]), j]
+            edges = np.unique(np.percentile(col, quantiles)) if len(col) else np.array([])
+            self.bin_edges.append(edges)
+            # Representative encoded value of each bin, for evaluating the model per bin
+            bins = np.searchsorted(edges, col, side='right')
+            counts = np.bincount(bins, minlength=len(edges) + 1)
+            sums = np.bincount(bins, weights=col, minlength=len(edges) + 1)
+            with np.errstate(invalid='ignore'):
+                self.bin_centers.append(sums / counts)
+        B = self.bin(X)
+
+        n_nodes = 2 ** (self.max_depth + 1) - 1
+        self.feature = np.full((self.n_trees, n_nodes), -1, dtype=np.int64)
+        self.threshold = np.zeros((self.n_trees, n_nodes), dtype=np.int64)
+        self.value = np.zeros((self.n_trees, n_nodes))
+        rng = np.random.RandomState(self.seed)
+        m = self.max_samples or n
+        for t in range(self.n_trees):
+            rows = rng.randint(0, n, size=m)
+            self._grow(t, B[rows], y[rows], rng)
+        return self
+
+    def _grow(self, t, B, y, rng):
+        m, d = B.shape
+        nb = self.n_bins
+        node = np.zeros(m, dtype=np.int64)
+        feature_offsets = np.arange(d) * nb
+        for level in range(self.max_depth):
+            first = 2 ** level - 1
+            n_level = 2 ** level
+            # Rows that stopped at a leaf on an earlier level have smaller node numbers
+            cur = np.nonzero(node >= first)[0]
+            if len(cur) == 0:
+                break
+            local = node[cur] - first
+            keys = ((local * d * nb)[:, None] + feature_offsets[None, :] + B[cur]).ravel()
+            size = n_level * d * nb
+            cnt = np.bincount(keys, minlength=size).reshape(n_level, d, nb)
+            s1 = np.bincount(keys, weights=np.repeat(y[cur], d), minlength=size).reshape(n_level, d, nb)
+            left_n = np.cumsum(cnt, axis=2)
+            left_s = np.cumsum(s1, axis=2)
+            total_n = left_n[:, :1, -1:]
+            total_s = left_s[:, :1, -1:]
+            right_n = total_n - left_n
+            right_s = total_s - left_s
+            with np.errstate(invalid='ignore', divide='ignore'):
+                gain = left_s ** 2 / left_n + right_s ** 2 / right_n - total_s ** 2 / total_n
+            valid = (left_n >= self.min_samples_leaf) & (right_n >= self.min_samples_leaf)
+            if self.max_features < 1.0:
+                features = rng.rand(n_level, d) < self.max_features
+                features[np.arange(n_level), rng.randint(0, d, size=n_level)] = True
+                valid &= features[:, :, None]
+            gain = np.where(valid, gain, -np.inf).reshape(n_level, d * nb)
+            best = gain.argmax(axis=1)
+            split = gain[np.arange(n_level), best] > 1e-12 * np.maximum(1.0, np.abs(total_s[:, 0, 0]))
+            nodes = first + np.nonzero(split)[0]
+            self.feature[t, nodes] = best[split] // nb
+            self.threshold[t, nodes] = best[split] % nb
+
+            f = self.feature[t, node[cur]]
+            moving = f >= 0
+            rows = cur[moving]
+            right = B[rows, f[moving]] > self.threshold[t, node[rows]]
+            node[rows] = 2 * node[rows] + 1 + right
+        n_nodes = self.value.shape[1]
+        counts = np.bincount(node, minlength=n_nodes)
+        sums = np.bincount(node, weights=y, minlength=n_nodes)
+        with np.errstate(invalid='ignore'):
+            self.value[t] = np.where(counts > 0, sums / np.maximum(counts, 1), 0.0)
+
+    def predict_binned(self, B):
+        """Per-tree predictions for binned rows, an (n_trees, n) array
+        """
+        B = np.atleast_2d(B)
+        n = len(B)
+        trees = np.arange(self.n_trees)[:, None]
+        rows = np.arange(n)[None, :]
+        node = np.zeros((self.n_trees, n), dtype=np.int64)
+        for _ in range(self.max_depth):
+            f = self.feature[trees, node]
+            inner = f >= 0
+            if not inner.any():
+                break
+            right = B[rows, np.maximum(f, 0)] > self.threshold[trees, node]
+            node = np.where(inner, 2 * node + 1 + right, node)
+        return self.value[trees, node]
+
+    def predict(self, X, return_std=False):
+        """Mean prediction over the trees, and optionally the spread between trees
+        """
+        per_tree = self.predict_binned(self.bin(X))
+        if return_std:
+            return per_tree.mean(axis=0), per_tree.std(axis=0)
+        return per_tree.mean(axis=0)
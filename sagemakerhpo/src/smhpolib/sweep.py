@@ -0,0 +1,255 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+
+"""
+Launches a whole matrix of TuningJobs from a single launcher.
+Every request is built (and checked) before anything is submitted,
+submissions run concurrently, and progress is recorded in a manifest
+file so an interrupted sweep can be resumed.
+"""
+from __future__ import absolute_import
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import copy
+import datetime
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+import botocore
+
+from smhpolib.client import get_smhpo_client
+from smhpolib.util import serialize_helper
+
+
+class SweepLauncher(object):
+    """Builds and submits one CreateTuningJob request per combination of overrides.
+
+    The matrix is either a dict of {key: [values]} (the cartesian product is taken)
+    or an explicit list of {key: value} dicts.  Lower-case keys override the launcher's
+    command-line options (input_data_url, hyperparam_ranges_file, parallel_jobs,
+    total_jobs, ...), upper-case keys override class constants like INSTANCE_TYPE.
+    """
+
+    DEFAULT_MAX_IN_FLIGHT = 4
+
+    # Errors that mean "try again later" rather than "this request is broken".
+    # Account limits on concurrent tuning jobs surface as ResourceLimitExceeded.
+    RETRYABLE_ERROR_CODES = (
+        'ResourceLimitExceeded',
+        'LimitExceededException',
+        'Throttling',
+        'ThrottlingException',
+        'ServiceUnavailable',
+    )
+
+    # The tuning job already exists, e.g. a previous run died before recording it.
+    ALREADY_EXISTS_ERROR_CODES = (
+        'ResourceInUse',
+    )
+
+    STATUS_PENDING = 'Pending'
+    STATUS_QUEUED = 'Queued'
+    STATUS_SUBMITTED = 'Submitted'
+    STATUS_FAILED = 'Failed'
+
+    def __init__(self, launcher, matrix, manifest_file=None, max_in_flight=None,
+                 max_wait_seconds=6 * 3600, initial_backoff_seconds=30, max_backoff_seconds=600):
+        """
+        :param launcher: a configured BaseLauncher used as the template for every job
+        :param matrix: dict of lists, or list of dicts, of overrides
+        :param manifest_file: where to record sweep progress.  Reused to resume.
+        :param max_in_flight: cap on concurrent CreateTuningJob submissions
+        :param max_wait_seconds: how long one submission may wait out account limits
+        """
+        self.launcher = launcher
+        self.matrix = matrix
+        self.manifest_file = manifest_file
+        self.max_in_flight = max_in_flight or self.DEFAULT_MAX_IN_FLIGHT
+        self.max_wait_seconds = max_wait_seconds
+        self.initial_backoff_seconds = initial_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.entries = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, launcher, sweep_file, **kwargs):
+        """Loads the override matrix from a JSON file.
+        """
+        with open(sweep_file) as fh:
+            matrix = json.load(fh)
+        if kwargs.get('manifest_file') is None:
+            kwargs['manifest_file'] = os.path.splitext(sweep_file)[0] + ".manifest.json"
+        return cls(launcher, matrix, **kwargs)
+
+    def combinations(self):
+        """Returns the list of override dicts, one per TuningJob.
+        """
+        if isinstance(self.matrix, list):
+            combos = [dict(overrides) for overrides in self.matrix]
+        else:
+            keys = sorted(self.matrix.keys())
+            values = []
+            for key in keys:
+                val = self.matrix[key]
+                values.append(val if isinstance(val, list) else [val])
+            combos = [dict(zip(keys, combo)) for combo in itertools.product(*values)]
+        for overrides in combos:
+            self._check_overrides(overrides)
+        return combos
+
+    def _check_overrides(self, overrides):
+        option_names = vars(self.launcher.opts)
+        for key in overrides:
+            if key.isupper():
+                if not hasattr(self.launcher, key):
+                    raise ValueError("Sweep override %s is not an attribute of %s" %
+                                     (key, self.launcher.__class__.__name__))
+            elif key not in option_names:
+                raise ValueError("Sweep override %s is not a launcher option.  Choose from %s" %
+                                 (key, sorted(option_names)))
+
+    def launcher_for(self, overrides):
+        """Returns a copy of the template launcher with overrides applied.
+        """
+        launcher = copy.copy(self.launcher)
+        launcher.opts = argparse.Namespace(**vars(self.launcher.opts))
+        launcher.request_json = None
+        if 'hyperparam_ranges_file' in overrides:
+            # An explicit ranges file in the sweep wins over ranges set in code
+            launcher.hyperparam_ranges = None
+        for key, value in overrides.items():
+            if key.isupper():
+                setattr(launcher, key, value)
+            else:
+                setattr(launcher.opts, key, value)
+        return launcher
+
+    def build(self):
+        """Creates every CreateTuningJob request up front.
+        Resumes from the manifest file instead if there is one.
+        """
+        if self.manifest_file and os.path.exists(self.manifest_file):
+            self.entries = self._load_manifest()
+            return self.entries
+        entries = []
+        for index, overrides in enumerate(self.combinations()):
+            launcher = self.launcher_for(overrides)
+            request = launcher.create_tuning_job_request()
+            launcher.check_request(request)
+            entries.append({
+                "Index": index,
+                "Overrides": overrides,
+                "TuningJobName": request['TuningJobName'],
+                "Status": self.STATUS_PENDING,
+                "Request": request,
+            })
+        names = [e['TuningJobName'] for e in entries]
+        if len(set(names)) != len(names):
+            raise ValueError("Sweep generates duplicate TuningJob names.  Use a 'rand' name suffix.")
+        self.entries = entries
+        return entries
+
+    def _load_manifest(self):
+        logging.info("Resuming sweep from manifest %s" % self.manifest_file)
+        with open(self.manifest_file) as fh:
+            manifest = json.load(fh)
+        entries = manifest['Entries']
+        recorded = [e['Overrides'] for e in entries]
+        if recorded != self.combinations():
+            raise ValueError("Manifest %s was written for a different sweep matrix" % self.manifest_file)
+        return entries
+
+    def write_manifest(self):
+        if not self.manifest_file:
+            return
+        with self._lock:
+            manifest = {
+                "LauncherClass": self.launcher.__class__.__name__,
+                "UpdatedTime": datetime.datetime.now(),
+                "Entries": self.entries,
+            }
+            tmp_file = self.manifest_file + ".tmp"
+            with open(tmp_file, "w") as fh:
+                json.dump(manifest, fh, indent=2, sort_keys=True, default=serialize_helper)
+            os.replace(tmp_file, self.manifest_file)
+
+    def pending_entries(self):
+        return [e for e in self.entries if e['Status'] != self.STATUS_SUBMITTED]
+
+    def run(self):
+        """Submits every request that hasn't been submitted yet.
+        Returns the list of manifest entries.
+        """
+        if self.entries is None:
+            self.build()
+        pending = self.pending_entries()
+        print("Submitting %d of %d TuningJobs, at most %d at a time" %
+              (len(pending), len(self.entries), self.max_in_flight))
+        self.write_manifest()
+        smhpo = get_smhpo_client(self.launcher.get_region_context())
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            futures = [executor.submit(self._submit, smhpo, entry) for entry in pending]
+            for future in as_completed(futures):
+                future.result()
+        failed = [e for e in self.entries if e['Status'] == self.STATUS_FAILED]
+        print("Sweep done: %d submitted, %d failed.  Manifest: %s" %
+              (len(self.entries) - len(failed), len(failed), self.manifest_file))
+        return self.entries
+
+    def _submit(self, smhpo, entry):
+        name = entry['TuningJobName']
+        deadline = time.time() + self.max_wait_seconds
+        backoff = self.initial_backoff_seconds
+        while True:
+            try:
+                response = smhpo.create_tuning_job(**entry['Request'])
+                self._set_status(entry, self.STATUS_SUBMITTED, tuning_job_arn=response.get('TuningJobArn'))
+                print("Created Tuning job named %s" % name)
+                return
+            except botocore.exceptions.ClientError as e:
+                code = e.response.get('Error', {}).get('Code')
+                if code in self.ALREADY_EXISTS_ERROR_CODES:
+                    logging.warning("TuningJob %s already exists; recording it as submitted" % name)
+                    self._set_status(entry, self.STATUS_SUBMITTED)
+                    return
+                if code not in self.RETRYABLE_ERROR_CODES or time.time() + backoff > deadline:
+                    self._set_status(entry, self.STATUS_FAILED, error=str(e))
+                    logging.error("Failed to create TuningJob %s: %s" % (name, e))
+                    return
+                logging.info("%s for %s.  Queueing for %d seconds" % (code, name, backoff))
+                self._set_status(entry, self.STATUS_QUEUED, error=str(e))
+            except Exception as e:
+                self._set_status(entry, self.STATUS_FAILED, error=str(e))
+                logging.error("Failed to create TuningJob %s: %s" % (name, e))
+                return
+            # Jitter keeps queued submissions from retrying in lock-step
+            time.sleep(backoff * random.uniform(0.8, 1.2))
+            backoff = min(backoff * 2, self.max_backoff_seconds)
+
+    def _set_status(self, entry, status, error=None, tuning_job_arn=None):
+        # Entries are only changed under the lock, since write_manifest may be dumping them
+        with self._lock:
+            entry['Status'] = status
+            if tuning_job_arn is not None:
+                entry['TuningJobArn'] = tuning_job_arn
+            entry['Timestamp'] = datetime.datetime.now()
+            if error is None:
+                entry.pop('Error', None)
+            else:
+                entry['Error'] = error
+        self.write_manifest()
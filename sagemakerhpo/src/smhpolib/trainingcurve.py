@@ -16,11 +16,11 @@ training curves for SageMaker training jobs.
 """
 from __future__ import absolute_import
 
-import boto3
 import collections
 import pandas as pd
 
 from .analysis import TrainingJobMetricsFetcher
+from .region import get_region_context
 
 class TrainingCurveData(object):
     """Encapsulates storage & basic processing of
@@ -56,6 +56,18 @@ class TrainingCurveData(object):
         self._set_dirty()
         self.fire_callbacks()
 
+    def add_metrics(self, timestamp, metric_name, value, **kwargs):
+        """Adds many datapoints at once, and fires the callbacks once.
+        Every argument is a list of the same length.
+        """
+        self._data['timestamp'].extend(timestamp)
+        self._data['metric_name'].extend(metric_name)
+        self._data['value'].extend(value)
+        for k,v in kwargs.items():
+            self._data[k].extend(v)
+        self._set_dirty()
+        self.fire_callbacks()
+
     @property
     def df(self):
         if self._df is None:
@@ -91,24 +103,25 @@ class CloudWatchMetricFetcher(object):
 
     CLOUDWATCH_NAMESPACE = 'SageMakerHPO'
 
-    def __init__(self, cloudwatch_client=None):
+    def __init__(self, cloudwatch_client=None, region_context=None):
         self._data = TrainingCurveData()
+        self.region_context = get_region_context(region_context)
         if cloudwatch_client is None:
-            cloudwatch_client = boto3.client('cloudwatch')
+            cloudwatch_client = self.region_context.client('cloudwatch')
         self.cloudwatch = cloudwatch_client
 
     def fetch_metric(self, training_job_name, metric_name):
         """Fetches all the values of a named metric for a training job
         """
         #TODO: unwind this dependency
-        fetcher = TrainingJobMetricsFetcher(training_job_name)
+        fetcher = TrainingJobMetricsFetcher(training_job_name, self.region_context)
         #TODO: add absolute timestamp back in
         xy = fetcher.fetch_metric(metric_name)
         if len(xy[0]) == 0:
             print("Warning: No metrics called %s found" % metric_name)
-        for elapsed_seconds, value in zip(xy[0],xy[1]): #TODO: get rid of this loop
-            self._data.add_metric(elapsed_seconds, metric_name, value, 
-                    training_job_name=training_job_name)
+        n = len(xy[0])
+        self._data.add_metrics(xy[0], [metric_name] * n, xy[1],
+                training_job_name=[training_job_name] * n)
 
     def training_curve_data(self):
         """Returns a TrainingCurveData object
@@ -10,11 +10,12 @@
 # and limitations under the License.
 
 
-import boto3
 import datetime
 import os
 import sys
 
+from .region import get_region_context
+
 def serialize_helper(obj):
     """Serializes datetime objects with json.dumps
     """
@@ -22,8 +23,23 @@ def serialize_helper(obj):
         return obj.isoformat()
     raise TypeError("Object of type '%s' is still not JSON serializable" % type(obj))
 
-def current_aws_account():
+def current_aws_account(region_context=None):
     """Returns the 12-digit account id for the current boto client
     """
-    return boto3.client('sts').get_caller_identity()['Account']
+    return get_region_context(region_context).client('sts').get_caller_identity()['Account']
+
 
+def ranges_by_name(parameter_ranges):
+    """{name: range} from ParameterRanges grouped by type, as in a request or
+    DescribeHyperParameterTuningJob.  Each range gets the Type of its group
+    ("Integer", "Continuous" or "Categorical"), which the service model's
+    ranges don't carry themselves.
+    """
+    out = {}
+    for group, ranges in parameter_ranges.items():
+        for param in ranges:
+            param = dict(param)
+            if group.endswith('ParameterRanges'):
+                param.setdefault('Type', group[:-len('ParameterRanges')])
+            out[param['Name']] = param
+    return out
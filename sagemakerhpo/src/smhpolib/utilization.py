@@ -0,0 +1,189 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+
+"""
+How well did a tuning job keep its MaxParallelTrainingJobs slots busy?
+"""
+from __future__ import absolute_import
+
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from .jobindex import to_epoch
+
+
+def _count_active(starts, ends, at):
+    """Number of [start, end) intervals containing each time in `at`.
+    Sorting once turns this into two searchsorted calls.
+    """
+    return (np.searchsorted(np.sort(starts), at, side='right') -
+            np.searchsorted(np.sort(ends), at, side='right'))
+
+
+class SlotUtilization(object):
+    """Concurrency timeline of the training jobs of a tuning job.
+
+    A job holds a slot from its CreationTime until it ends, and is training
+    from TrainingStartTime until it ends; the difference is provisioning.
+    Jobs still running are treated as ending `now`.
+    """
+
+    def __init__(self, names, creation, start, end, max_parallel=None, now=None):
+        """
+        :param names: training job names
+        :param creation, start, end: epoch seconds per job, NaN if unknown
+        :param max_parallel: MaxParallelTrainingJobs.  Default: the highest concurrency seen.
+        """
+        if now is None:
+            now = time.time()
+        self.names = list(names)
+        self.creation = np.asarray(creation, dtype=float)
+        self.end = np.where(np.isnan(end), now, np.asarray(end, dtype=float))
+        # Jobs that failed before training started never trained
+        self.start = np.where(np.isnan(start), self.end, np.asarray(start, dtype=float))
+        self.start = np.clip(self.start, self.creation, self.end)
+        if len(self.names) == 0:
+            raise ValueError("No training jobs to analyze")
+        self.t0 = self.creation.min()
+        self.t1 = self.end.max()
+        if max_parallel is None:
+            max_parallel = int(_count_active(self.creation, self.end, self.creation).max())
+        self.max_parallel = max_parallel
+
+    @classmethod
+    def from_tuning_job(cls, tuning_job, use_describe=True, now=None):
+        """Reads the times from each training job's DescribeTrainingJob response, or with
+        use_describe=False from the tuning job's summaries only, which have no start times.
+        """
+        index = tuning_job.training_job_index()
+        creation = index.creation_time.copy()
+        start = index.start_time.copy()
+        end = index.end_time.copy()
+        if use_describe:
+            for i, name in enumerate(index.names):
+                description = index.describe(name)
+                creation[i] = to_epoch(description.get('CreationTime'))
+                start[i] = to_epoch(description.get('TrainingStartTime'))
+                # Jobs that failed early have no TrainingEndTime, but stopped changing when they failed
+                ended = description.get('TrainingEndTime')
+                if ended is None and description.get('TrainingJobStatus') in ('Failed', 'Stopped'):
+                    ended = description.get('LastModifiedTime')
+                end[i] = to_epoch(ended)
+        limits = tuning_job.describe()['HyperParameterTuningJobConfig'].get('ResourceLimits', {})
+        return cls(index.names, creation, start, end, max_parallel=limits.get('MaxParallelTrainingJobs'), now=now)
+
+    @property
+    def wall_clock_seconds(self):
+        return float(self.t1 - self.t0)
+
+    def timeline(self):
+        """DataFrame with a row at every creation, start and end: the Elapsed seconds since
+        the first creation, and the number of jobs Occupying a slot and Training from then on.
+        """
+        times = np.unique(np.concatenate([self.creation, self.start, self.end]))
+        return pd.DataFrame({
+            'Elapsed': times - self.t0,
+            'Occupied': _count_active(self.creation, self.end, times),
+            'Training': _count_active(self.start, self.end, times),
+        })
+
+    def concurrency_histogram(self):
+        """Seconds of wall clock spent with each number of slots occupied
+        """
+        times = np.unique(np.concatenate([self.creation, self.end]))
+        levels = _count_active(self.creation, self.end, times[:-1])
+        seconds = np.bincount(levels, weights=np.diff(times), minlength=self.max_parallel + 1)
+        total = seconds.sum()
+        return pd.DataFrame({
+            'Occupied': np.arange(len(seconds)),
+            'Seconds': seconds,
+            'Fraction': seconds / total if total > 0 else seconds,
+        })
+
+    def _refills(self):
+        """Pairs each freed slot with the job that reused it.  Once the first max_parallel
+        jobs are created, job number max_parallel + i (by creation) can only be created
+        after i + 1 jobs have ended, so it refills the slot freed by the (i + 1)th end.
+        Returns (creation order, end order, number of refills).
+        """
+        by_creation = np.argsort(self.creation, kind='stable')
+        by_end = np.argsort(self.end, kind='stable')
+        n_refills = max(0, len(self.names) - self.max_parallel)
+        return by_creation, by_end, n_refills
+
+    def gaps(self):
+        """One row per refilled slot: when it was freed, the job created in it and the
+        GapSeconds the slot sat idle in between.
+        """
+        by_creation, by_end, n = self._refills()
+        freed = by_end[:n]
+        refill = by_creation[self.max_parallel:self.max_parallel + n]
+        gap = self.creation[refill] - self.end[freed]
+        return pd.DataFrame({
+            'FreedBy': [self.names[i] for i in freed],
+            'FreedAt': self.end[freed] - self.t0,
+            'NextTrainingJob': [self.names[i] for i in refill],
+            'GapSeconds': np.maximum(gap, 0.0),
+        })
+
+    def critical_path(self):
+        """The chain of jobs that determined the wall clock time: the job that ended last,
+        the job whose end freed the slot it was created in, and so on back to one of the
+        first jobs created.  One row per job, first job first.
+        """
+        by_creation, by_end, n = self._refills()
+        predecessor = np.full(len(self.names), -1)
+        predecessor[by_creation[self.max_parallel:self.max_parallel + n]] = by_end[:n]
+        path = [int(np.argmax(self.end))]
+        while predecessor[path[-1]] >= 0:
+            path.append(int(predecessor[path[-1]]))
+        path = np.array(path[::-1])
+        gap_before = np.zeros(len(path))
+        gap_before[1:] = np.maximum(self.creation[path[1:]] - self.end[path[:-1]], 0.0)
+        gap_before[0] = self.creation[path[0]] - self.t0
+        return pd.DataFrame({
+            'TrainingJobName': [self.names[i] for i in path],
+            'GapBeforeSeconds': gap_before,
+            'ProvisioningSeconds': self.start[path] - self.creation[path],
+            'TrainingSeconds': self.end[path] - self.start[path],
+        })
+
+    def summary(self):
+        wall = self.wall_clock_seconds
+        available = self.max_parallel * wall
+        occupied = float(np.sum(self.end - self.creation))
+        training = float(np.sum(self.end - self.start))
+        histogram = self.concurrency_histogram()
+        gaps = self.gaps()['GapSeconds']
+        path = self.critical_path()
+        out = {
+            'TrainingJobs': len(self.names),
+            'MaxParallelTrainingJobs': self.max_parallel,
+            'WallClockSeconds': wall,
+            'MeanConcurrency': occupied / wall if wall > 0 else 0.0,
+            'SlotUtilization': occupied / available if available > 0 else 0.0,
+            'TrainingUtilization': training / available if available > 0 else 0.0,
+            'ProvisioningFraction': (occupied - training) / occupied if occupied > 0 else 0.0,
+            'FullParallelismFraction': float(histogram['Fraction'][histogram['Occupied'] >= self.max_parallel].sum()),
+            'IdleGapSlotSeconds': float(gaps.sum()),
+            'MedianGapSeconds': float(gaps.median()) if len(gaps) else 0.0,
+            'CriticalPathJobs': len(path),
+            'CriticalPathGapSeconds': float(path['GapBeforeSeconds'].sum()),
+            'CriticalPathProvisioningSeconds': float(path['ProvisioningSeconds'].sum()),
+            'CriticalPathTrainingSeconds': float(path['TrainingSeconds'].sum()),
+        }
+        if out['SlotUtilization'] < 0.5:
+            logging.warning("Parallel slots were occupied only %.0f%% of the time" % (100 * out['SlotUtilization']))
+        return out
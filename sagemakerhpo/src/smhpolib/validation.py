@@ -0,0 +1,265 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+
+"""
+Offline validation of API requests against the service models in awsmodel/.
+Each operation's input shape is compiled once into nested check functions,
+so large batches of generated requests can be checked before any network call.
+"""
+from __future__ import absolute_import
+
+import datetime
+import json
+import os
+import re
+
+AWSMODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))),
+                            "awsmodel")
+SMHPO_MODEL_FILE = os.path.join(AWSMODEL_DIR, "sagemakerhpo-2017-11-08.normal.json")
+SAGEMAKER_MODEL_FILE = os.path.join(AWSMODEL_DIR, "service-2.json")
+
+_STRING_TYPES = (str,)
+
+
+def _check_numeric_range(value, path, errors, parse):
+    try:
+        low = parse(value['MinValue'])
+        high = parse(value['MaxValue'])
+    except (KeyError, TypeError):
+        return  # Missing members are reported by the shape check
+    except ValueError:
+        errors.append("%s: MinValue '%s' and MaxValue '%s' must be %s values" %
+                      (path, value.get('MinValue'), value.get('MaxValue'), parse.__name__))
+        return
+    if low > high:
+        errors.append("%s: MinValue %s is greater than MaxValue %s" % (path, low, high))
+
+
+def _check_integer_range(value, path, errors):
+    _check_numeric_range(value, path, errors, int)
+
+
+def _check_continuous_range(value, path, errors):
+    _check_numeric_range(value, path, errors, float)
+
+
+class RequestValidator(object):
+    """Validates request dicts for one operation of a service model.
+
+    Checks required members, unknown members, types, enums, string lengths
+    and patterns, list/map sizes and numeric bounds.  Use `for_operation` to
+    get a cached, already-compiled validator.
+    """
+
+    # Checks the service does that aren't expressible in the model.
+    SEMANTIC_CHECKS = {
+        'IntegerParameterRange': _check_integer_range,
+        'ContinuousParameterRange': _check_continuous_range,
+    }
+
+    _cache = {}
+
+    def __init__(self, model, operation, ignore_required=(), shape_overrides=None):
+        """
+        :param model: the parsed service model JSON
+        :param operation: operation name, e.g. "CreateTuningJob"
+        :param ignore_required: top-level required members filled in elsewhere (e.g. AwsAccountId)
+        :param shape_overrides: {shape_name: {"max": 26, ...}} tighter constraints than the model
+        """
+        self.operation = operation
+        self._shapes = model['shapes']
+        self._shape_overrides = shape_overrides or {}
+        self._checkers = {}
+        input_shape = model['operations'][operation]['input']['shape']
+        self._check = self._compile_structure(input_shape, self._shape_def(input_shape),
+                                              ignore_required=set(ignore_required))
+
+    @classmethod
+    def for_operation(cls, operation, model_file=SMHPO_MODEL_FILE, ignore_required=(), shape_overrides=None):
+        """Returns a compiled validator, reusing one from an earlier call if possible.
+        """
+        key = (model_file, operation, tuple(sorted(ignore_required)),
+               json.dumps(shape_overrides, sort_keys=True))
+        if key not in cls._cache:
+            with open(model_file) as fh:
+                model = json.load(fh)
+            cls._cache[key] = cls(model, operation, ignore_required, shape_overrides)
+        return cls._cache[key]
+
+    def validate(self, request):
+        """Returns a list of error messages.  Empty if the request is valid.
+        """
+        errors = []
+        self._check(request, self.operation, errors)
+        return errors
+
+    def check(self, request):
+        """Raises ValueError listing every problem with the request.
+        """
+        errors = self.validate(request)
+        if errors:
+            raise ValueError("Invalid %s request:\n  %s" % (self.operation, "\n  ".join(errors)))
+
+    def _shape_def(self, shape_name):
+        shape = self._shapes[shape_name]
+        if shape_name in self._shape_overrides:
+            shape = dict(shape)
+            shape.update(self._shape_overrides[shape_name])
+        return shape
+
+    def _checker(self, shape_name):
+        """Returns the check function for a named shape.
+        Recursive shapes are resolved lazily when first called.
+        """
+        checker = self._checkers.get(shape_name)
+        if checker is None:
+            checkers = self._checkers
+
+            def deferred(value, path, errors):
+                return checkers[shape_name](value, path, errors)
+            checkers[shape_name] = deferred
+            checkers[shape_name] = checker = self._compile(shape_name)
+        return checker
+
+    def _compile(self, shape_name):
+        shape = self._shape_def(shape_name)
+        kind = shape['type']
+        if kind == 'structure':
+            check = self._compile_structure(shape_name, shape)
+        elif kind == 'list':
+            check = self._compile_list(shape)
+        elif kind == 'map':
+            check = self._compile_map(shape)
+        elif kind == 'string':
+            check = self._compile_string(shape)
+        elif kind in ('integer', 'long'):
+            check = self._compile_number(shape, (int,), "an integer")
+        elif kind in ('float', 'double'):
+            check = self._compile_number(shape, (int, float), "a number")
+        elif kind == 'boolean':
+            check = self._compile_type((bool,), "a boolean")
+        elif kind == 'timestamp':
+            check = self._compile_type((datetime.datetime,) + _STRING_TYPES + (int, float), "a timestamp")
+        elif kind == 'blob':
+            check = self._compile_type((bytes, bytearray) + _STRING_TYPES, "a blob")
+        else:
+            raise ValueError("Unsupported shape type %s for %s" % (kind, shape_name))
+        extra = self.SEMANTIC_CHECKS.get(shape_name)
+        if extra is None:
+            return check
+
+        def check_with_extra(value, path, errors):
+            n_errors = len(errors)
+            check(value, path, errors)
+            if len(errors) == n_errors:
+                extra(value, path, errors)
+        return check_with_extra
+
+    def _compile_structure(self, shape_name, shape, ignore_required=()):
+        members = {name: self._checker(member['shape']) for name, member in shape.get('members', {}).items()}
+        required = [name for name in shape.get('required', []) if name not in ignore_required]
+
+        def check_structure(value, path, errors):
+            if not isinstance(value, dict):
+                errors.append("%s: expected a %s structure, got %s" % (path, shape_name, type(value).__name__))
+                return
+            for name in required:
+                if name not in value:
+                    errors.append("%s: missing required member %s" % (path, name))
+            for name, member_value in value.items():
+                member_check = members.get(name)
+                if member_check is None:
+                    errors.append("%s: unknown member %s" % (path, name))
+                elif member_value is not None:
+                    member_check(member_value, path + "." + name, errors)
+        return check_structure
+
+    def _compile_list(self, shape):
+        member_check = self._checker(shape['member']['shape'])
+        size_check = self._compile_size(shape, "items")
+
+        def check_list(value, path, errors):
+            if not isinstance(value, (list, tuple)):
+                errors.append("%s: expected a list, got %s" % (path, type(value).__name__))
+                return
+            size_check(value, path, errors)
+            for i, item in enumerate(value):
+                member_check(item, "%s[%d]" % (path, i), errors)
+        return check_list
+
+    def _compile_map(self, shape):
+        key_check = self._checker(shape['key']['shape'])
+        value_check = self._checker(shape['value']['shape'])
+        size_check = self._compile_size(shape, "entries")
+
+        def check_map(value, path, errors):
+            if not isinstance(value, dict):
+                errors.append("%s: expected a map, got %s" % (path, type(value).__name__))
+                return
+            size_check(value, path, errors)
+            for k, v in value.items():
+                key_check(k, path + " key", errors)
+                value_check(v, "%s[%s]" % (path, k), errors)
+        return check_map
+
+    def _compile_size(self, shape, unit):
+        low = shape.get('min')
+        high = shape.get('max')
+
+        def check_size(value, path, errors):
+            n = len(value)
+            if low is not None and n < low:
+                errors.append("%s: has %d %s, fewer than the minimum %d" % (path, n, unit, low))
+            if high is not None and n > high:
+                errors.append("%s: has %d %s, more than the maximum %d" % (path, n, unit, high))
+        return check_size
+
+    def _compile_string(self, shape):
+        enum = frozenset(shape['enum']) if 'enum' in shape else None
+        size_check = self._compile_size(shape, "characters")
+        pattern = None
+        if 'pattern' in shape:
+            try:
+                pattern = re.compile(shape['pattern'])
+            except re.error:
+                pass  # e.g. \p{L} classes which python's re doesn't support
+
+        def check_string(value, path, errors):
+            if not isinstance(value, _STRING_TYPES):
+                errors.append("%s: expected a string, got %s" % (path, type(value).__name__))
+                return
+            if enum is not None and value not in enum:
+                errors.append("%s: '%s' is not one of %s" % (path, value, sorted(enum)))
+            size_check(value, path, errors)
+            if pattern is not None and not pattern.fullmatch(value):
+                errors.append("%s: '%s' does not match pattern %s" % (path, value, pattern.pattern))
+        return check_string
+
+    def _compile_number(self, shape, types, description):
+        low = shape.get('min')
+        high = shape.get('max')
+
+        def check_number(value, path, errors):
+            if isinstance(value, bool) or not isinstance(value, types):
+                errors.append("%s: expected %s, got %r" % (path, description, value))
+                return
+            if low is not None and value < low:
+                errors.append("%s: %s is less than the minimum %s" % (path, value, low))
+            if high is not None and value > high:
+                errors.append("%s: %s is more than the maximum %s" % (path, value, high))
+        return check_number
+
+    def _compile_type(self, types, description):
+        def check_type(value, path, errors):
+            if not isinstance(value, types):
+                errors.append("%s: expected %s, got %r" % (path, description, value))
+        return check_type
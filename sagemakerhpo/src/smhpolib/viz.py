@@ -16,8 +16,14 @@ Visualization library tools for training curve data
 
 import bokeh
 import bokeh.io
+import bokeh.layouts
+import bokeh.palettes
 import bokeh.plotting
-from bokeh.models import HoverTool
+from bokeh.models import ColorBar, ColumnDataSource, FixedTicker, HoverTool, LinearColorMapper
+import numpy as np
+import pandas as pd
+
+from .surrogate import HyperparamEncoder
 
 class BokehPlotter(object):
 
@@ -67,16 +73,187 @@ class SmhpoHover():
         self.tuning = tuning_job
 
     def hovertool(self):
+        return self.hovertool_for(self.tuning.hyperparam_ranges().keys())
+
+    def tools(self, standard_tools='pan,crosshair,wheel_zoom,zoom_in,zoom_out,undo,reset'):
+        return [self.hovertool(), standard_tools]
+
+    @staticmethod
+    def hovertool_for(hyperparam_names):
         tooltips = [
             ("FinalObjectiveValue", "@FinalObjectiveValue"),
             ("TrainingJobName", "@TrainingJobName"),
         ]
-        for k in self.tuning.hyperparam_ranges().keys():
+        for k in hyperparam_names:
             tooltips.append( (k, "@{%s}" % k) )
 
         ht = HoverTool(tooltips=tooltips)
         return ht
 
-    def tools(self, standard_tools='pan,crosshair,wheel_zoom,zoom_in,zoom_out,undo,reset'):
-        return [self.hovertool(), standard_tools]
+    @classmethod
+    def tools_for(cls, hyperparam_names, standard_tools):
+        return [cls.hovertool_for(hyperparam_names), standard_tools]
    
+
+
+class TuningJobExplorer(object):
+    """Scatter matrix and parallel coordinates views of a tuning job's results,
+    built to stay interactive with tens of thousands of training jobs.
+
+    Every plot is drawn with the WebGL backend, and all the point glyphs share
+    a single ColumnDataSource, so selecting jobs in one plot highlights them in
+    all the others.  The source only holds float32 numpy columns (categorical
+    hyperparameters as category codes), which bokeh sends to the browser as
+    binary arrays rather than JSON lists.
+    """
+
+    # Above this many jobs the hover tool costs more than it helps
+    HOVER_MAX_POINTS = 5000
+    PARALLEL_BANDS = 8
+    # Color range of the objective when no job has a value
+    DEFAULT_COLOR_RANGE = (0.0, 1.0)
+
+    def __init__(self, df, ranges, objective='FinalObjectiveValue', maximize=False, include_names=None):
+        """
+        :param df: hyperparam_dataframe() of a tuning job
+        :param ranges: TuningJob.hyperparam_ranges()
+        :param include_names: put TrainingJobName in the source for the hover tool.
+            Default: only when there are at most HOVER_MAX_POINTS jobs.
+        """
+        df = df[pd.to_numeric(df[objective], errors='coerce').notnull()]
+        self.objective = objective
+        self.maximize = maximize
+        self.encoder = HyperparamEncoder(ranges)
+        self.names = list(self.encoder.groups)
+        if include_names is None:
+            include_names = len(df) <= self.HOVER_MAX_POINTS
+        self.hover = include_names
+        X = self.encoder.encode(df)
+        data = {objective: pd.to_numeric(df[objective]).values.astype(np.float32)}
+        units = []
+        for param in self.encoder.params:
+            name = param['Name']
+            cols = self.encoder.groups[name]
+            if param['Type'] == 'Categorical':
+                onehot = X[:, cols]
+                data[name] = np.where(onehot.any(axis=1), onehot.argmax(axis=1), np.nan).astype(np.float32)
+                # Categories spread evenly over the unit interval
+                unit = data[name] / max(len(cols) - 1, 1)
+            else:
+                data[name] = pd.to_numeric(df[name], errors='coerce').values.astype(np.float32)
+                unit = X[:, cols[0]].astype(np.float32)
+            data[self._unit_column(name)] = unit
+            units.append(unit)
+        self._units = np.column_stack(units)
+        if include_names:
+            data['TrainingJobName'] = df['TrainingJobName'].values
+        self.source = ColumnDataSource(data=data)
+        objective_values = data[objective][np.isfinite(data[objective])]
+        if len(objective_values):
+            low, high = float(objective_values.min()), float(objective_values.max())
+        else:
+            # No finished jobs yet.  The plots are empty but still render.
+            low, high = self.DEFAULT_COLOR_RANGE
+        palette = bokeh.palettes.Plasma256 if maximize else bokeh.palettes.Plasma256[::-1]
+        self.color_mapper = LinearColorMapper(palette=palette, low=low, high=high)
+
+    @classmethod
+    def from_tuning_job(cls, tuning_job, objective='FinalObjectiveValue', **kwargs):
+        if 'maximize' not in kwargs:
+            config = tuning_job.describe()['HyperParameterTuningJobConfig']
+            kwargs['maximize'] = config['HyperParameterTuningJobObjective']['Type'] == 'Maximize'
+        df = tuning_job.hyperparam_dataframe(include_times=False)
+        return cls(df, tuning_job.hyperparam_ranges(), objective=objective, **kwargs)
+
+    def _unit_column(self, name):
+        return "%s__unit" % name
+
+    def _figure(self, **figure_opts):
+        tools = 'box_select,lasso_select,pan,wheel_zoom,reset'
+        if self.hover:
+            tools = SmhpoHover.tools_for(self.names, tools)
+        opts = {"output_backend": "webgl", "tools": tools}
+        opts.update(figure_opts)
+        return bokeh.plotting.figure(**opts)
+
+    def _points(self, p, x, y, size=4):
+        p.scatter(x, y, source=self.source, size=size, line_color=None, alpha=0.6,
+                 fill_color={'field': self.objective, 'transform': self.color_mapper},
+                 nonselection_alpha=0.05)
+
+    def _label_categories(self, axis, param):
+        axis.ticker = FixedTicker(ticks=list(range(len(param['Values']))))
+        axis.major_label_overrides = {i: str(v) for i, v in enumerate(param['Values'])}
+
+    def scatter_matrix(self, names=None, pairs=False, plot_size=250, ncols=4, show=None):
+        """Each hyperparameter against the objective.  With pairs=True, every pair of
+        hyperparameters too, as the lower triangle of a matrix with the objective on top.
+        """
+        names = names or self.names
+        figures = []
+        for name in names:
+            figures.append(self._scatter(name, self.objective, plot_size))
+        if pairs:
+            rows = [figures]
+            for j, y_name in enumerate(names[1:], 1):
+                rows.append([self._scatter(x_name, y_name, plot_size) if i < j else None
+                             for i, x_name in enumerate(names)])
+            grid = bokeh.layouts.gridplot(rows)
+        else:
+            grid = bokeh.layouts.gridplot(figures, ncols=ncols)
+        return self._show(grid, show)
+
+    def _scatter(self, x_name, y_name, plot_size):
+        axis_types = {}
+        for axis, name in (('x', x_name), ('y', y_name)):
+            if name in self.encoder.groups and self.encoder.param(name).get('Log'):
+                axis_types["%s_axis_type" % axis] = "log"
+        p = self._figure(width=plot_size, height=plot_size,
+                         x_axis_label=x_name, y_axis_label=y_name, **axis_types)
+        self._points(p, x_name, y_name)
+        for axis, name in ((p.xaxis[0], x_name), (p.yaxis[0], y_name)):
+            if name in self.encoder.groups and self.encoder.param(name)['Type'] == 'Categorical':
+                self._label_categories(axis, self.encoder.param(name))
+        return p
+
+    def parallel_coordinates(self, names=None, plot_width=900, plot_height=450, show=None):
+        """One vertical axis per hyperparameter, scaled to its range, and one line per job.
+
+        Lines are grouped into PARALLEL_BANDS bands of the objective, each band drawn
+        as a single NaN-separated line glyph.  The points on the axes come from the
+        shared source, so they can be selected and are linked to the scatter matrix.
+        """
+        names = names or self.names
+        idx = [self.names.index(name) for name in names]
+        units = self._units[:, idx]
+        objective = self.source.data[self.objective]
+        p = self._figure(width=plot_width, height=plot_height, x_range=(-0.5, len(names) - 0.5))
+        p.xaxis.ticker = FixedTicker(ticks=list(range(len(names))))
+        p.xaxis.major_label_overrides = {i: name for i, name in enumerate(names)}
+        p.yaxis.axis_label = "Position within range"
+
+        axis_x = np.append(np.arange(len(names), dtype=np.float32), np.nan)
+        bands = np.array_split(np.argsort(objective if self.maximize else -objective), self.PARALLEL_BANDS)
+        # Best jobs are drawn last, on top
+        for band in bands:
+            if len(band) == 0:
+                continue
+            ys = np.hstack([units[band], np.full((len(band), 1), np.nan, dtype=np.float32)]).ravel()
+            xs = np.tile(axis_x, len(band))
+            color = self.color_mapper.palette[int(np.clip(
+                (np.median(objective[band]) - self.color_mapper.low) /
+                max(self.color_mapper.high - self.color_mapper.low, 1e-12) * 255, 0, 255))]
+            p.line(xs, ys, line_color=color, line_alpha=max(0.02, min(0.5, 200.0 / len(band))))
+
+        for i, name in enumerate(names):
+            p.scatter(i, self._unit_column(name), source=self.source, size=3, line_color=None,
+                     fill_color={'field': self.objective, 'transform': self.color_mapper},
+                     nonselection_alpha=0.05)
+        p.add_layout(ColorBar(color_mapper=self.color_mapper, title=self.objective), 'right')
+        return self._show(p, show)
+
+    def _show(self, layout, show):
+        if show == 'notebook':
+            bokeh.io.output_notebook()
+            bokeh.plotting.show(layout)
+        return layout
@@ -0,0 +1,77 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+
+import numpy as np
+import pandas as pd
+
+from smhpolib.importance import HyperparamImportance
+from smhpolib.jobrecord import LRUCache
+from smhpolib.region import get_region_context
+
+RANGES = {
+    "max_depth": {"Name": "max_depth", "Type": "Integer", "MinValue": "3", "MaxValue": "20"},
+    "eta": {"Name": "eta", "Type": "Continuous", "MinValue": "0.01", "MaxValue": "0.5"},
+}
+
+
+class FakeIndex(object):
+    def __init__(self, objective):
+        self.objective = objective
+
+
+class FakeTuningJob(object):
+    """Just what HyperparamImportance.for_tuning_job reads, with n_finished of its jobs finished"""
+
+    def __init__(self, name, n_jobs=40, n_finished=20):
+        rng = np.random.RandomState(0)
+        self.tuning_job_name = name
+        self.region_context = get_region_context("us-west-2")
+        self.df = pd.DataFrame({"max_depth": rng.randint(3, 21, n_jobs).astype(float),
+                                "eta": rng.uniform(0.01, 0.5, n_jobs)})
+        self.objective = ((self.df.max_depth - 6) ** 2 + 10 * self.df.eta).values
+        self.finish(n_finished)
+
+    def finish(self, n_finished):
+        self.df["FinalObjectiveValue"] = np.where(np.arange(len(self.df)) < n_finished, self.objective, np.nan)
+
+    def training_job_index(self):
+        return FakeIndex(self.df["FinalObjectiveValue"].values)
+
+    def describe(self):
+        return {"HyperParameterTuningJobConfig": {"HyperParameterTuningJobObjective": {"Type": "Minimize"}}}
+
+    def hyperparam_dataframe(self, include_times=True):
+        return self.df.copy()
+
+    def hyperparam_ranges(self):
+        return RANGES
+
+
+def test_for_tuning_job_reuses_analysis_until_more_jobs_finish(monkeypatch):
+    monkeypatch.setattr(HyperparamImportance, "_cache", LRUCache(4))
+    tuning_job = FakeTuningJob("tj")
+    first = HyperparamImportance.for_tuning_job(tuning_job)
+    assert HyperparamImportance.for_tuning_job(tuning_job) is first
+    assert len(first.y) == 20
+
+    tuning_job.finish(30)
+    second = HyperparamImportance.for_tuning_job(tuning_job)
+    assert second is not first and len(second.y) == 30
+    # Only the latest analysis of a tuning job is kept
+    assert len(HyperparamImportance._cache) == 1
+
+
+def test_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(HyperparamImportance, "_cache", LRUCache(4))
+    for i in range(10):
+        HyperparamImportance.for_tuning_job(FakeTuningJob("tj-%d" % i, n_jobs=10, n_finished=10))
+    assert len(HyperparamImportance._cache) == 4
@@ -0,0 +1,58 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+import datetime
+
+from smhpolib.jobindex import TrainingJobIndex
+
+T0 = datetime.datetime(2018, 1, 1, tzinfo=datetime.timezone.utc)
+ARN = "arn:aws:sagemaker:us-west-2:123456789012:training-job/"
+
+
+def listed_summary(i, status="Completed", **extra):
+    summary = {
+        "TrainingJobName": "Job-%03d" % i,
+        "TrainingJobArn": ARN + "job-%03d" % i,
+        "CreationTime": T0,
+        "TrainingStartTime": T0 + datetime.timedelta(minutes=1),
+        "TrainingJobStatus": status,
+        "TunedHyperParameters": {"eta": "0.%d" % (i + 1), "max_depth": str(3 + i % 4)},
+    }
+    if status == "Completed":
+        summary["TrainingEndTime"] = T0 + datetime.timedelta(minutes=10 + i)
+        summary["ObjectiveStatus"] = "Succeeded"
+        summary["FinalHyperParameterTuningJobObjectiveMetric"] = {
+            "Type": "Minimize", "MetricName": "validation:rmse", "Value": 0.5 + i / 100.0}
+    summary.update(extra)
+    return summary
+
+
+def test_summaries_keep_every_listed_field():
+    summaries = [listed_summary(i) for i in range(5)]
+    summaries.append(listed_summary(5, status="Failed", FailureReason="AlgorithmError: out of memory",
+                                    ObjectiveStatus="Failed"))
+    index = TrainingJobIndex(summaries)
+    assert index.summaries() == summaries
+    assert index.summary("Job-005")["FailureReason"] == "AlgorithmError: out of memory"
+    assert index.summary("Job-001")["FinalHyperParameterTuningJobObjectiveMetric"]["Type"] == "Minimize"
+
+
+def test_jobs_with_the_same_extra_fields_share_them():
+    index = TrainingJobIndex([listed_summary(i) for i in range(100)])
+    assert len(set(id(extras) for extras in index._extras)) == 1
+
+
+def test_update_summaries_replaces_extra_fields():
+    index = TrainingJobIndex([listed_summary(0, status="InProgress")])
+    failed = listed_summary(0, status="Failed", FailureReason="ClientError: bad input")
+    assert index.update_summaries([failed]) == ["Job-000"]
+    assert index.summary("Job-000") == failed
+    assert index.update_summaries([failed]) == []
@@ -0,0 +1,109 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+
+import datetime
+
+import pytest
+
+from smhpolib.analysis import TrainingJobStatusFetcher
+from smhpolib.jobrecord import LRUCache, TrainingJobRecord
+from smhpolib.region import get_region_context
+
+START = datetime.datetime(2018, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def response(name, status='Completed'):
+    return {'TrainingJobName': name, 'TrainingJobStatus': status, 'CreationTime': START,
+            'HyperParameters': {'eta': '0.1'},
+            'ResourceConfig': {'InstanceType': 'ml.m4.xlarge', 'InstanceCount': 1, 'VolumeSizeInGB': 10,
+                               'VolumeKmsKeyId': 'key'},
+            'AlgorithmSpecification': {'TrainingImage': 'image', 'TrainingInputMode': 'File'},
+            'OutputDataConfig': {'S3OutputPath': 's3://bucket/output'},
+            'ResponseMetadata': {}}
+
+
+class FakeSageMaker(object):
+    def __init__(self):
+        self.described = []
+        self.status = 'InProgress'
+
+    def describe_training_job(self, TrainingJobName):
+        self.described.append(TrainingJobName)
+        return response(TrainingJobName, self.status)
+
+
+@pytest.fixture
+def sagemaker(monkeypatch):
+    sagemaker = FakeSageMaker()
+    region_context = get_region_context('us-west-2')
+    monkeypatch.setattr(region_context, 'client', lambda service_name: sagemaker)
+    monkeypatch.setattr(TrainingJobStatusFetcher, 'cache', {})
+    monkeypatch.setattr(TrainingJobStatusFetcher, 'full_cache', LRUCache(2))
+    return sagemaker
+
+
+def test_record_reads_like_the_response():
+    record = TrainingJobRecord(response('job-1'))
+    assert record['TrainingJobStatus'] == 'Completed'
+    assert record.get('TrainingEndTime') is None and 'TrainingEndTime' not in record
+    with pytest.raises(KeyError):
+        record['TrainingEndTime']
+    with pytest.raises(KeyError):
+        record['OutputDataConfig']
+    assert record['ResourceConfig'] == {'InstanceType': 'ml.m4.xlarge', 'InstanceCount': 1, 'VolumeSizeInGB': 10}
+    assert record['AlgorithmSpecification'] == {}
+    assert set(record.to_dict()) == {'TrainingJobName', 'TrainingJobStatus', 'CreationTime', 'HyperParameters',
+                                     'ResourceConfig', 'AlgorithmSpecification'}
+
+
+def test_lru_cache_drops_least_recently_used():
+    cache = LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert 'b' not in cache and cache.get('a') == 1 and cache.get('c') == 3
+    assert len(cache) == 2
+    assert cache.pop('a') == 1 and cache.pop('a') is None
+
+
+def test_fetch_describes_once(sagemaker):
+    record = TrainingJobStatusFetcher.fetch('job-1', 'us-west-2')
+    assert isinstance(record, TrainingJobRecord) and record['TrainingJobStatus'] == 'InProgress'
+    assert TrainingJobStatusFetcher.fetch('job-1', 'us-west-2') is record
+    assert TrainingJobStatusFetcher.fetch_full('job-1', 'us-west-2')['OutputDataConfig']
+    assert sagemaker.described == ['job-1']
+
+
+def test_fetch_after_cache_cleared_uses_full_response(sagemaker):
+    TrainingJobStatusFetcher.full_cache.put(('us-west-2', 'job-1'), response('job-1', 'Stopped'))
+    TrainingJobStatusFetcher.cache.clear()
+    assert TrainingJobStatusFetcher.fetch('job-1', 'us-west-2')['TrainingJobStatus'] == 'Stopped'
+    assert sagemaker.described == []
+
+
+def test_full_response_described_again_once_evicted(sagemaker):
+    for name in ['job-1', 'job-2', 'job-3']:
+        TrainingJobStatusFetcher.fetch(name, 'us-west-2')
+    assert ('us-west-2', 'job-1') not in TrainingJobStatusFetcher.full_cache
+    # The compact record is kept for every job
+    assert TrainingJobStatusFetcher.fetch('job-1', 'us-west-2')['TrainingJobName'] == 'job-1'
+    assert TrainingJobStatusFetcher.fetch_full('job-1', 'us-west-2')['OutputDataConfig']
+    assert sagemaker.described == ['job-1', 'job-2', 'job-3', 'job-1']
+
+
+def test_invalidate_describes_again(sagemaker):
+    TrainingJobStatusFetcher.fetch('job-1', 'us-west-2')
+    sagemaker.status = 'Completed'
+    TrainingJobStatusFetcher.invalidate('job-1', 'us-west-2')
+    assert TrainingJobStatusFetcher.fetch('job-1', 'us-west-2')['TrainingJobStatus'] == 'Completed'
+    assert sagemaker.described == ['job-1', 'job-1']
@@ -0,0 +1,82 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+
+import importlib.util
+import json
+import os
+
+from smhpolib.analysis import TrainingJobStatusFetcher
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "smhpo-list-training-jobs.py")
+
+
+def load_script():
+    spec = importlib.util.spec_from_file_location("smhpo_list_training_jobs", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeSageMaker(object):
+    def __init__(self, failing):
+        self.failing = failing
+
+    def describe_training_job(self, TrainingJobName):
+        if TrainingJobName in self.failing:
+            raise RuntimeError("ResourceNotFound: %s" % TrainingJobName)
+        return {'TrainingJobName': TrainingJobName, 'StoppingCondition': {'MaxRuntimeInSeconds': 3600},
+                'ResponseMetadata': {}}
+
+
+class FakeRegionContext(object):
+    region = 'us-west-2'
+
+    def __init__(self, sagemaker):
+        self.sagemaker = sagemaker
+
+    def client(self, service_name):
+        assert service_name == 'sagemaker'
+        return self.sagemaker
+
+
+class FakeSmhpoClient(object):
+    def __init__(self, pages, failing=()):
+        self.pages = pages
+        self.region_context = FakeRegionContext(FakeSageMaker(failing))
+
+    def paginate_training_jobs_for_tuning_job(self, **kwargs):
+        return iter(self.pages)
+
+
+def run(monkeypatch, capsys, client, *args):
+    script = load_script()
+    monkeypatch.setattr(script, 'get_smhpo_client', lambda region: client)
+    script.main(script.get_parser().parse_args(["-n", "tuning"] + list(args)))
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_describe_errors_are_reported_per_job(monkeypatch, capsys):
+    pages = [[{'TrainingJobName': 'job-1'}, {'TrainingJobName': 'job-2'}], [{'TrainingJobName': 'job-3'}]]
+    client = FakeSmhpoClient(pages, failing={'job-2'})
+    records = run(monkeypatch, capsys, client, "--describe", "--fields", "TrainingJobName,StoppingCondition")
+    assert [r['TrainingJobName'] for r in records] == ['job-1', 'job-2', 'job-3']
+    assert records[0] == {'TrainingJobName': 'job-1', 'StoppingCondition': {'MaxRuntimeInSeconds': 3600}}
+    assert records[1] == {'TrainingJobName': 'job-2', 'Error': 'ResourceNotFound: job-2'}
+    assert 'Error' not in records[2]
+
+
+def test_describe_leaves_fetcher_cache_alone(monkeypatch, capsys):
+    TrainingJobStatusFetcher.cache.clear()
+    client = FakeSmhpoClient([[{'TrainingJobName': 'job-%d' % i} for i in range(20)]])
+    records = run(monkeypatch, capsys, client, "--describe")
+    assert len(records) == 20 and all('ResponseMetadata' not in r for r in records)
+    assert TrainingJobStatusFetcher.cache == {}
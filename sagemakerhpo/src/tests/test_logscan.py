@@ -0,0 +1,37 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+import pytest
+
+from smhpolib.logscan import MetricLogScanner
+
+XGBOOST_DEFINITIONS = [
+    {"Name": "valid-auc", "Regex": "validation-[a-z]+:([0-9\\.]+)"},
+    {"Name": "train-auc", "Regex": "train-[a-z]+:([0-9\\.]+)"},
+]
+
+
+def test_scan_file_matches_every_line(tmp_path):
+    log = tmp_path / "training.log"
+    log.write_text("starting\n[0]\ttrain-auc:0.71\tvalidation-auc:0.65\nnoise\n[1]\ttrain-auc:0.8\tvalidation-auc:0.7\n")
+    out = MetricLogScanner(XGBOOST_DEFINITIONS).scan_file(str(log))
+    assert sorted(zip(out['timestamp'], out['metric_name'], out['value'])) == [
+        (1, 'train-auc', 0.71), (1, 'valid-auc', 0.65), (3, 'train-auc', 0.8), (3, 'valid-auc', 0.7)]
+
+
+def test_definition_without_capture_group_is_rejected():
+    with pytest.raises(ValueError, match="loss"):
+        MetricLogScanner([{"Name": "loss", "Regex": "loss = [0-9.]+"}])
+
+
+def test_definition_that_does_not_compile_is_rejected():
+    with pytest.raises(ValueError, match="broken"):
+        MetricLogScanner([{"Name": "broken", "Regex": "loss = ([0-9.]+"}])
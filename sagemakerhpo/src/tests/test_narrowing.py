@@ -0,0 +1,79 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from smhpolib.analysis import TuningJob
+from smhpolib.narrowing import RangeNarrower
+from smhpolib.surrogate import HyperparamEncoder
+
+# ParameterRanges as DescribeHyperParameterTuningJob returns them: no Type on the ranges
+DESCRIBE_PARAMETER_RANGES = {
+    "IntegerParameterRanges": [{"Name": "max_depth", "MinValue": "3", "MaxValue": "20"}],
+    "ContinuousParameterRanges": [{"Name": "eta", "MinValue": "0.01", "MaxValue": "0.5"}],
+    "CategoricalParameterRanges": [{"Name": "booster", "Values": ["gbtree", "dart"]}],
+}
+
+
+class DescribeOnlyClient(object):
+    def describe_hyper_parameter_tuning_job(self, HyperParameterTuningJobName):
+        return {
+            "HyperParameterTuningJobName": HyperParameterTuningJobName,
+            "HyperParameterTuningJobConfig": {
+                "Strategy": "Bayesian",
+                "HyperParameterTuningJobObjective": {"Type": "Minimize", "MetricName": "loss"},
+                "ParameterRanges": DESCRIBE_PARAMETER_RANGES,
+            },
+        }
+
+
+def results(n=400, seed=0):
+    rng = np.random.RandomState(seed)
+    df = pd.DataFrame({
+        "max_depth": rng.randint(3, 21, n).astype(float),
+        "eta": rng.uniform(0.01, 0.5, n),
+        "booster": rng.choice(["gbtree", "dart"], n),
+    })
+    df["FinalObjectiveValue"] = (df.max_depth - 6) ** 2 + 10 * df.eta + rng.randn(n)
+    return df
+
+
+def test_hyperparam_ranges_take_type_from_group():
+    ranges = TuningJob("tj", smhpo_client=DescribeOnlyClient()).hyperparam_ranges()
+    assert ranges["max_depth"]["Type"] == "Integer"
+    assert ranges["eta"]["Type"] == "Continuous"
+    assert ranges["booster"]["Type"] == "Categorical"
+    assert "Type" not in DESCRIBE_PARAMETER_RANGES["IntegerParameterRanges"][0]
+
+
+def test_recommended_integer_ranges_stay_integer():
+    ranges = TuningJob("tj", smhpo_client=DescribeOnlyClient()).hyperparam_ranges()
+    narrower = RangeNarrower.from_dataframe(results(), ranges, min_importance=0.0)
+    out = narrower.ranges_json()
+    assert [r["Name"] for r in out["IntegerParameterRanges"]] == ["max_depth"]
+    assert [r["Name"] for r in out["ContinuousParameterRanges"]] == ["eta"]
+    max_depth = out["IntegerParameterRanges"][0]
+    assert int(max_depth["MinValue"]) == float(max_depth["MinValue"])
+    assert int(max_depth["MaxValue"]) == float(max_depth["MaxValue"])
+
+
+def test_encoder_rejects_numeric_range_without_type():
+    with pytest.raises(ValueError, match="max_depth"):
+        HyperparamEncoder({"max_depth": DESCRIBE_PARAMETER_RANGES["IntegerParameterRanges"][0]})
+
+
+def test_encoder_encodes_empty_frame():
+    ranges = TuningJob("tj", smhpo_client=DescribeOnlyClient()).hyperparam_ranges()
+    encoder = HyperparamEncoder(ranges)
+    X = encoder.encode(results().iloc[:0])
+    assert X.shape == (0, len(encoder.columns))
@@ -0,0 +1,123 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+
+import datetime
+
+import pandas as pd
+import pytest
+
+from smhpolib.analysis import TrainingJobStatusFetcher, TuningJob
+from smhpolib.jobrecord import LRUCache, TrainingJobRecord
+
+START = datetime.datetime(2018, 1, 1, tzinfo=datetime.timezone.utc)
+END = START + datetime.timedelta(minutes=5)
+
+
+class FakeTuningJobClient(object):
+    """Lists and describes training jobs from `jobs`: {name: (status, objective or None)}"""
+
+    def __init__(self, jobs):
+        self.jobs = jobs
+
+    def list_training_jobs_for_hyper_parameter_tuning_job(self, HyperParameterTuningJobName, MaxResults,
+                                                          NextToken=None):
+        names = sorted(self.jobs)
+        start = int(NextToken or 0)
+        page = []
+        for name in names[start:start + MaxResults]:
+            status, objective = self.jobs[name]
+            summary = {'TrainingJobName': name, 'TrainingJobStatus': status, 'CreationTime': START}
+            if status == 'Completed':
+                summary['TrainingEndTime'] = END
+            if objective is not None:
+                summary['FinalHyperParameterTuningJobObjectiveMetric'] = {'MetricName': 'loss', 'Value': objective}
+            page.append(summary)
+        out = {'TrainingJobSummaries': page}
+        if start + MaxResults < len(names):
+            out['NextToken'] = str(start + MaxResults)
+        return out
+
+    def describe_training_job(self, TrainingJobName):
+        status, _ = self.jobs[TrainingJobName]
+        description = {'TrainingJobName': TrainingJobName, 'TrainingJobStatus': status, 'CreationTime': START,
+                       'HyperParameters': {'eta': str(0.01 * int(TrainingJobName[-1])),
+                                           'booster': 'dart' if int(TrainingJobName[-1]) % 2 else 'gbtree'}}
+        if status == 'Completed':
+            description['TrainingEndTime'] = END
+        return description
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeTuningJobClient({'job-1': ('Completed', 0.5), 'job-2': ('Completed', 0.25)})
+    monkeypatch.setattr(TrainingJobStatusFetcher, 'cache', {})
+    monkeypatch.setattr(TrainingJobStatusFetcher, 'full_cache', LRUCache())
+
+    def fetch_full(cls, training_job_name, region_context=None):
+        response = client.describe_training_job(TrainingJobName=training_job_name)
+        cls.cache[('us-west-2', training_job_name)] = TrainingJobRecord(response)
+        return response
+    monkeypatch.setattr(TrainingJobStatusFetcher, 'fetch_full', classmethod(fetch_full))
+    return client
+
+
+def tuning_job(client):
+    tuning_job = TuningJob('tj', smhpo_client=client, region_context='us-west-2')
+    # The final value of "loss" is the job's objective, 1.0 while it has none
+    tuning_job.metric_timeseries = lambda metric_name, name: (
+        [0, 1], [2.0, client.jobs[name][1] if client.jobs[name][1] is not None else 1.0])
+    return tuning_job
+
+
+def assert_same_as_fresh(refreshed, client, include_times=True):
+    TrainingJobStatusFetcher.cache.clear()
+    fresh = tuning_job(client)
+    for metric_name, aggregate in refreshed._added_metrics:
+        fresh.add_metric(metric_name, aggregate)
+    pd.testing.assert_frame_equal(refreshed.hyperparam_dataframe(include_times),
+                                  fresh.hyperparam_dataframe(include_times), check_like=True)
+
+
+@pytest.mark.parametrize('include_times', [True, False])
+def test_refresh_appends_new_in_progress_job(client, include_times):
+    tj = tuning_job(client)
+    assert tj.hyperparam_dataframe(include_times)['FinalObjectiveValue'].dtype == 'float64'
+    client.jobs['job-3'] = ('InProgress', None)
+    assert tj.refresh() == ['job-3']
+    df = tj.hyperparam_dataframe(include_times)
+    assert df['TrainingJobName'].tolist() == ['job-1', 'job-2', 'job-3']
+    assert pd.isnull(df['FinalObjectiveValue'][2])
+    assert_same_as_fresh(tj, client, include_times)
+
+
+def test_refresh_updates_job_that_failed(client):
+    client.jobs['job-3'] = ('InProgress', None)
+    tj = tuning_job(client)
+    tj.hyperparam_dataframe()
+    client.jobs['job-3'] = ('Failed', None)
+    client.jobs['job-4'] = ('Stopped', None)
+    assert tj.refresh() == ['job-3', 'job-4']
+    df = tj.hyperparam_dataframe()
+    assert df['TrainingJobStatus'].tolist() == ['Completed', 'Completed', 'Failed', 'Stopped']
+    assert_same_as_fresh(tj, client)
+
+
+def test_refresh_keeps_added_metric(client):
+    tj = tuning_job(client)
+    tj.hyperparam_dataframe()
+    tj.add_metric('loss')
+    client.jobs['job-3'] = ('InProgress', None)
+    client.jobs['job-1'] = ('Completed', 0.75)
+    assert tj.refresh() == ['job-1', 'job-3']
+    df = tj.hyperparam_dataframe()
+    assert df['final_loss'].tolist() == [0.75, 0.25, 1.0]
+    assert_same_as_fresh(tj, client)
@@ -0,0 +1,43 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+from smhpolib.launcher import XGBoostLauncher
+from smhpolib.region import RegionContext, get_region_context
+
+
+class Launcher(XGBoostLauncher):
+    TRAINING_ROLE = "arn:aws:iam::123456789012:role/SageMakerRole"
+    DEFAULT_NAME_PREFIX = "xgb"
+    DEFAULT_INPUT_DATA = "s3://bucket/input/"
+    DEFAULT_OUTPUT_LOCATION = "s3://bucket/output"
+
+
+def test_default_context_follows_aws_region(monkeypatch):
+    monkeypatch.setenv("AWS_REGION", "us-west-2")
+    assert get_region_context().region == "us-west-2"
+    monkeypatch.setenv("AWS_REGION", "us-east-1")
+    assert get_region_context().region == "us-east-1"
+    assert RegionContext.default() is get_region_context("us-east-1")
+
+
+def test_explicit_region_beats_environment(monkeypatch):
+    monkeypatch.setenv("AWS_REGION", "us-west-2")
+    assert get_region_context("eu-west-1").region == "eu-west-1"
+
+
+def test_ecr_image_and_api_use_the_same_region(monkeypatch):
+    monkeypatch.setenv("AWS_REGION", "us-west-2")
+    launcher = Launcher()
+    launcher.opts.aws_region = "us-east-1"
+    assert launcher.get_region_context().region == "us-east-1"
+    assert launcher.get_ecr_image() == Launcher.REGION_TO_ECR_IMAGE_MAP["us-east-1"]
+    launcher.opts.aws_region = None
+    assert launcher.get_ecr_image() == Launcher.REGION_TO_ECR_IMAGE_MAP["us-west-2"]
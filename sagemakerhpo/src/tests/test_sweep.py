@@ -0,0 +1,124 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+
+import json
+import os
+
+import botocore.session
+from botocore.stub import Stubber
+import pytest
+
+from smhpolib import sweep
+from smhpolib.client import SmhpoClient
+from smhpolib.launcher import XGBoostLauncher
+from smhpolib.validation import SMHPO_MODEL_FILE
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ACCOUNT = "123456789012"
+
+
+class Launcher(XGBoostLauncher):
+    TRAINING_ROLE = "arn:aws:iam::123456789012:role/SageMakerRole"
+    DEFAULT_NAME_PREFIX = "xgb"
+    DEFAULT_INPUT_DATA = "s3://bucket/input/"
+    DEFAULT_OUTPUT_LOCATION = "s3://bucket/output"
+    DEFAULT_HYPERPARAM_RANGES_FILE = os.path.join(SRC_DIR, "xgboost-ranges.json")
+
+    def get_ecr_image(self):
+        return "433757028032.dkr.ecr.us-west-2.amazonaws.com/xgboost:latest"
+
+
+@pytest.fixture
+def smhpo(tmp_path, monkeypatch):
+    """An SmhpoClient whose boto client is built from awsmodel/ and answered by a Stubber.
+    The names of the tuning jobs it was asked to create are in smhpo.created.
+    """
+    model_dir = tmp_path / "models" / "sagemakerhpo" / "2017-11-08"
+    model_dir.mkdir(parents=True)
+    with open(SMHPO_MODEL_FILE) as fh:
+        model = json.load(fh)
+    model['metadata']['serviceId'] = 'SageMakerHPO'  # Required by current botocore
+    (model_dir / "service-2.json").write_text(json.dumps(model))
+    session = botocore.session.Session()
+    session.get_component('data_loader').search_paths.insert(0, str(tmp_path / "models"))
+    boto_client = session.create_client('sagemakerhpo', region_name='us-west-2',
+                                        endpoint_url='https://smhpo.example.com',
+                                        aws_access_key_id='testing', aws_secret_access_key='testing')
+
+    smhpo = SmhpoClient.__new__(SmhpoClient)
+    smhpo._boto_client = boto_client
+    smhpo._aws_account_id = ACCOUNT
+    smhpo.created = []
+    boto_client.meta.events.register('before-parameter-build.sagemakerhpo.CreateTuningJob',
+                                     lambda params, **kwargs: smhpo.created.append(params['TuningJobName']))
+    monkeypatch.setattr(sweep, 'get_smhpo_client', lambda region_context: smhpo)
+    with Stubber(boto_client) as stubber:
+        smhpo.stubber = stubber
+        yield smhpo
+
+
+def sweep_launcher(tmp_path, **kwargs):
+    sweep_file = str(tmp_path / "sweep.json")
+    with open(sweep_file, "w") as fh:
+        json.dump({"total_jobs": [2, 3]}, fh)
+    return sweep.SweepLauncher.from_file(Launcher(), sweep_file, max_in_flight=1,
+                                         initial_backoff_seconds=0.01, **kwargs)
+
+
+def manifest_entries(launcher):
+    with open(launcher.manifest_file) as fh:
+        return json.load(fh)['Entries']
+
+
+def test_throttled_submission_is_retried(tmp_path, smhpo):
+    launcher = sweep_launcher(tmp_path)
+    names = [entry['TuningJobName'] for entry in launcher.build()]
+    smhpo.stubber.add_client_error('create_tuning_job', 'Throttling', http_status_code=400)
+    smhpo.stubber.add_response('create_tuning_job', {'TuningJobArn': 'arn:tuning-job/0'})
+    smhpo.stubber.add_response('create_tuning_job', {'TuningJobArn': 'arn:tuning-job/1'})
+    launcher.run()
+    smhpo.stubber.assert_no_pending_responses()
+    assert smhpo.created == [names[0], names[0], names[1]]
+    entries = manifest_entries(launcher)
+    assert [e['Status'] for e in entries] == ['Submitted', 'Submitted']
+    assert [e['TuningJobArn'] for e in entries] == ['arn:tuning-job/0', 'arn:tuning-job/1']
+    assert all('Error' not in e for e in entries)
+
+
+def test_existing_tuning_job_counts_as_submitted(tmp_path, smhpo):
+    launcher = sweep_launcher(tmp_path)
+    launcher.build()
+    smhpo.stubber.add_client_error('create_tuning_job', 'ResourceInUse', http_status_code=400)
+    smhpo.stubber.add_response('create_tuning_job', {'TuningJobArn': 'arn:tuning-job/1'})
+    launcher.run()
+    smhpo.stubber.assert_no_pending_responses()
+    assert [e['Status'] for e in manifest_entries(launcher)] == ['Submitted', 'Submitted']
+
+
+def test_resume_submits_only_unfinished_jobs(tmp_path, smhpo):
+    first = sweep_launcher(tmp_path)
+    names = [entry['TuningJobName'] for entry in first.build()]
+    smhpo.stubber.add_response('create_tuning_job', {'TuningJobArn': 'arn:tuning-job/0'})
+    smhpo.stubber.add_client_error('create_tuning_job', 'ValidationError', http_status_code=400)
+    first.run()
+    assert [e['Status'] for e in manifest_entries(first)] == ['Submitted', 'Failed']
+
+    del smhpo.created[:]
+    resumed = sweep_launcher(tmp_path)
+    assert [e['TuningJobName'] for e in resumed.build()] == names
+    smhpo.stubber.add_response('create_tuning_job', {'TuningJobArn': 'arn:tuning-job/1'})
+    resumed.run()
+    smhpo.stubber.assert_no_pending_responses()
+    assert smhpo.created == [names[1]]
+    entries = manifest_entries(resumed)
+    assert [e['Status'] for e in entries] == ['Submitted', 'Submitted']
+    assert [e['TuningJobArn'] for e in entries] == ['arn:tuning-job/0', 'arn:tuning-job/1']
@@ -0,0 +1,48 @@
+# Copyright 2017 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Amazon Software License (the "License"). You may not
+# use this file except in compliance with the License. A copy of the
+# License is located at:
+#    http://aws.amazon.com/asl/
+# or in the "license" file accompanying this file. This file is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, express
+# or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+
+import numpy as np
+import pandas as pd
+import pytest
+
+bokeh = pytest.importorskip("bokeh")
+import bokeh.embed
+import bokeh.layouts
+import bokeh.resources
+
+from smhpolib.viz import TuningJobExplorer
+
+RANGES = {
+    "max_depth": {"Name": "max_depth", "Type": "Integer", "MinValue": "3", "MaxValue": "20"},
+    "booster": {"Name": "booster", "Type": "Categorical", "Values": ["gbtree", "dart"]},
+}
+
+
+def frame(objective):
+    n = len(objective)
+    return pd.DataFrame({"TrainingJobName": ["job-%d" % i for i in range(n)],
+                         "max_depth": np.arange(n) % 18 + 3,
+                         "booster": ["gbtree"] * n,
+                         "FinalObjectiveValue": objective})
+
+
+@pytest.mark.parametrize("objective", [[], [np.nan, np.nan]])
+def test_explorer_renders_without_objective_values(objective):
+    explorer = TuningJobExplorer(frame(objective), RANGES)
+    assert (explorer.color_mapper.low, explorer.color_mapper.high) == TuningJobExplorer.DEFAULT_COLOR_RANGE
+    layout = bokeh.layouts.column(explorer.scatter_matrix(pairs=True), explorer.parallel_coordinates())
+    assert "<html" in bokeh.embed.file_html(layout, bokeh.resources.CDN)
+
+
+def test_color_range_spans_objective():
+    explorer = TuningJobExplorer(frame([3.0, np.nan, 1.0]), RANGES)
+    assert (explorer.color_mapper.low, explorer.color_mapper.high) == (1.0, 3.0)